@@ -7,7 +7,8 @@ from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
-from database import init_db
+from database import init_db, release_connections
+from tinystories_db import init_ts_db
 import logging
 
 # Configure Logging
@@ -29,11 +30,8 @@ app = Flask(__name__, static_folder='static', static_url_path='')
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
 CORS(app)
 
-# Initialize database
-init_db()
-
 # Import and Register blueprints
-from routes import stories, speech, quiz, chatmode, generator, recall, settings, images, tinystories, chatbot, achievements, dashboard
+from routes import stories, speech, quiz, chatmode, generator, recall, settings, images, tinystories, chatbot, achievements, dashboard, search, metrics
 
 app.register_blueprint(stories.bp, url_prefix='/api/stories')
 app.register_blueprint(speech.bp, url_prefix='/api/speech')
@@ -47,6 +45,30 @@ app.register_blueprint(tinystories.bp, url_prefix='/api/tinystories')
 app.register_blueprint(chatbot.bp, url_prefix='/api/chatbot')
 app.register_blueprint(achievements.bp, url_prefix='/api/achievements')
 app.register_blueprint(dashboard.bp, url_prefix='/api/dashboard')
+app.register_blueprint(search.bp, url_prefix='/api/search')
+app.register_blueprint(metrics.bp, url_prefix='/api/metrics')
+
+@app.teardown_appcontext
+def return_db_connections(exc):
+    # A connection taken outside a context manager goes back to the pool with the request
+    release_connections()
+
+# Opt-in (TINYSTORIES_PRELOAD): load the local TinyStories model in the background
+from routes import tinystories_engine
+tinystories_engine.preload()
+
+# Opt-in (STORY_POOL_WARM): start pre-building "surprise me" stories right away
+from routes import story_pool
+story_pool.warm()
+
+# Schema setup runs lazily on the first database access in each process;
+# `flask --app app init-db` does it up front (e.g. in a deploy step).
+@app.cli.command('init-db')
+def init_db_command():
+    """Create or upgrade ost.db and tinystories.db"""
+    init_ts_db()
+    init_db()
+    print("Databases initialized successfully!")
 
 # Serve frontend
 @app.route('/')
@@ -55,11 +77,14 @@ def index():
 
 @app.route('/health')
 def health():
-    """Health check endpoint"""
+    """Health check endpoint (503 while a preloaded local model is still warming up)"""
+    engine = tinystories_engine.engine.status()
+    starting = tinystories_engine.PRELOAD and engine['enabled'] and engine['state'] in ('loading', 'warming')
     return jsonify({
-        'status': 'healthy',
-        'message': 'OST is running!'
-    })
+        'status': 'starting' if starting else 'healthy',
+        'message': 'OST is running!',
+        'tinystories': engine
+    }), 503 if starting else 200
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
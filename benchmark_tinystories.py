@@ -0,0 +1,137 @@
+"""
+Benchmark the local TinyStories-33M backends (stock fp32 pipeline, int8, ONNX)
+
+    python benchmark_tinystories.py [--backends pipeline,int8,onnx] [--tokens 128] [--runs 3]
+
+Each backend runs in its own process so peak RSS is measured in isolation.
+Reports load time, tokens/sec and peak RSS, and exits non-zero if a backend's
+greedy output is degenerate (empty, not continuing the prompt, or looping).
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROMPTS = [
+    "Once upon a time, there was a friendly dog.",
+    "Once upon a time, there was a little red car.",
+    "Once upon a time, there was a brave little mouse.",
+]
+
+# Quality floor: share of distinct words in the continuation, and its minimum length
+MIN_DISTINCT_RATIO = 0.3
+MIN_WORDS = 20
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    except ImportError:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return round(getattr(info, 'peak_wset', info.rss) / (1024 * 1024), 1)
+        except ImportError:
+            return None
+
+
+def run_worker(backend, tokens, runs):
+    """Load one backend and time greedy generation over PROMPTS"""
+    from routes.tinystories_engine import MODEL_NAME, WARMUP_PROMPT, load_pipeline, resolve_backend
+
+    started = time.monotonic()
+    pipe = load_pipeline(MODEL_NAME, backend)
+    load_sec = time.monotonic() - started
+    pipe(WARMUP_PROMPT, max_new_tokens=16, do_sample=False)
+
+    generated_tokens = 0
+    elapsed = 0.0
+    outputs = []
+    for run in range(runs):
+        for prompt in PROMPTS:
+            started = time.monotonic()
+            text = pipe(prompt, max_new_tokens=tokens, do_sample=False)[0]['generated_text']
+            elapsed += time.monotonic() - started
+            generated_tokens += len(pipe.tokenizer(text)['input_ids']) - len(pipe.tokenizer(prompt)['input_ids'])
+            if run == 0:
+                outputs.append(text)
+
+    print(json.dumps({
+        'backend': resolve_backend(backend),
+        'load_sec': round(load_sec, 2),
+        'tokens_per_sec': round(generated_tokens / elapsed, 1) if elapsed else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'outputs': outputs
+    }))
+
+
+def check_quality(outputs):
+    """Problems with a backend's greedy continuations; empty when they look sane"""
+    problems = []
+    for prompt, text in zip(PROMPTS, outputs):
+        if not text.startswith(prompt):
+            problems.append(f"does not continue the prompt: {prompt!r}")
+            continue
+        words = text[len(prompt):].split()
+        if len(words) < MIN_WORDS:
+            problems.append(f"only {len(words)} words after {prompt!r}")
+        elif len(set(words)) / len(words) < MIN_DISTINCT_RATIO:
+            problems.append(f"repetitive output after {prompt!r}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backends', default='pipeline,int8,onnx')
+    parser.add_argument('--tokens', type=int, default=128)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.tokens, args.runs)
+        return 0
+
+    results = []
+    for backend in args.backends.split(','):
+        print(f"--- {backend} ---")
+        proc = subprocess.run([sys.executable, __file__, '--worker', backend,
+                               '--tokens', str(args.tokens), '--runs', str(args.runs)],
+                              capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        lines = [line for line in proc.stdout.splitlines() if line.startswith('{')]
+        if proc.returncode != 0 or not lines:
+            print(f"❌ {backend} failed:\n{proc.stderr[-2000:]}")
+            results.append({'backend': backend, 'failed': True})
+            continue
+        results.append(json.loads(lines[-1]))
+
+    baseline = next((r for r in results if r.get('backend') == 'pipeline' and not r.get('failed')), None)
+    failed = False
+    print(f"\n{'backend':<10}{'load s':>8}{'tok/s':>9}{'speedup':>9}{'peak MB':>9}  quality")
+    for result in results:
+        if result.get('failed'):
+            failed = True
+            print(f"{result['backend']:<10}{'-':>8}{'-':>9}{'-':>9}{'-':>9}  failed to run")
+            continue
+        speedup = (f"{result['tokens_per_sec'] / baseline['tokens_per_sec']:.2f}x"
+                   if baseline and baseline['tokens_per_sec'] else '-')
+        problems = check_quality(result['outputs'])
+        failed = failed or bool(problems)
+        print(f"{result['backend']:<10}{result['load_sec']:>8}{result['tokens_per_sec']:>9}{speedup:>9}"
+              f"{result['peak_rss_mb'] if result['peak_rss_mb'] is not None else '-':>9}  "
+              f"{'ok' if not problems else '; '.join(problems)}")
+
+    for result in results:
+        if not result.get('failed'):
+            print(f"\n[{result['backend']}] {result['outputs'][0][:300]}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
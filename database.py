@@ -5,217 +5,688 @@ Using SQLite for simplicity
 
 import sqlite3
 import json
+import os
+import threading
 from datetime import datetime
 from contextlib import contextmanager
+from pathlib import Path
 
 DATABASE = 'ost.db'
 
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE)
+# TinyStories and vocabulary_progress live in their own file. Every ost.db
+# connection ATTACHes it as `ts`, so cross-file aggregations are plain SQL
+# (e.g. SELECT COUNT(*) FROM ts.vocabulary_progress).
+TS_DATABASE = os.getenv('TINYSTORIES_DB', 'tinystories.db')
+
+# 'attach' (default): TinyStories code shares the ost.db connection, so work on
+#   both files can run in one transaction. Under WAL the commit is atomic per
+#   file, not across the pair.
+# 'separate': TinyStories code gets its own connection to tinystories.db.
+DB_MODE = os.getenv('OST_DB_MODE', 'attach')
+
+# Connection tuning applied to every pooled connection.
+# WAL lets readers run while a background asset thread is writing,
+# NORMAL sync is safe under WAL and avoids an fsync per commit.
+BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 16384))
+MMAP_SIZE_BYTES = int(os.getenv('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))
+
+# Connections are shared by all threads through a bounded pool of idle ones
+# per database file. A thread holds a connection only while it is inside a
+# connection/read context (nested scopes reuse it), then hands it back, so the
+# threaded dev server (a new thread per request) still reuses connections and
+# no connection - or its WAL read snapshot - stays with a thread that has
+# finished. Beyond POOL_SIZE idle connections per file, extras are closed.
+POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', 8))
+_idle = {}
+_pool_lock = threading.Lock()
+_pool_pid = os.getpid()
+_local = threading.local()
+
+# Database files whose schema is known to be current in this process
+_bootstrapped = set()
+_bootstrap_lock = threading.Lock()
+
+
+def _configure_connection(conn, readonly=False):
+    """Apply the performance PRAGMAs to a freshly opened connection"""
     conn.row_factory = sqlite3.Row
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    if readonly:
+        conn.execute('PRAGMA query_only = ON')
+    else:
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE_BYTES}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+
+
+def open_connection(path):
+    """
+    Open a new, unpooled connection with the standard tuning and no attached
+    databases. Migrations use this so unqualified names can only mean `main`.
+    """
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000)
+    _configure_connection(conn)
+    return conn
+
+
+def _attach(conn, alias, path):
+    conn.execute('ATTACH DATABASE ? AS ' + alias, (path,))
+    conn.execute(f'PRAGMA {alias}.journal_mode = WAL')
+    conn.execute(f'PRAGMA {alias}.synchronous = NORMAL')
+
+
+def _held():
+    """Connections the current thread is using, keyed like the idle pool"""
+    held = getattr(_local, 'held', None)
+    if held is None or _local.pid != os.getpid():
+        held = _local.held = {}
+        _local.pid = os.getpid()
+        _local.depth = {}
+        _local.pinned = set()
+    return held
+
+
+def _checkout(key, opener, pin=False):
+    """
+    The thread's connection for `key`: the one it holds, an idle one, or a new
+    one. A pinned connection was handed out bare, so only release_connections()
+    returns it to the pool; contexts that reuse it leave it with the thread.
+    """
+    global _pool_pid
+    held = _held()
+    conn = held.get(key)
+    if conn is None:
+        with _pool_lock:
+            if _pool_pid != os.getpid():
+                # Forked: the parent's connections are not ours to use or close
+                _idle.clear()
+                _pool_pid = os.getpid()
+            idle = _idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            conn = opener()
+        held[key] = conn
+        _local.depth[key] = 0
+    if pin:
+        _local.pinned.add(key)
+    return conn
+
+
+def _release(key):
+    """Hand the thread's connection for `key` back to the idle pool (or close it when the pool is full)"""
+    conn = _held().pop(key, None)
+    _local.depth.pop(key, None)
+    _local.pinned.discard(key)
+    if conn is None:
+        return
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except sqlite3.Error:
+        conn.close()
+        return
+    with _pool_lock:
+        idle = _idle.setdefault(key, [])
+        if len(idle) < POOL_SIZE:
+            idle.append(conn)
+            return
+    conn.close()
+
+
+def _open_pooled(path):
+    if path == DATABASE:
+        ensure_schema(TS_DATABASE)
+    ensure_schema(path)
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    _configure_connection(conn)
+    if path == DATABASE:
+        _attach(conn, 'ts', TS_DATABASE)
     return conn
 
+
+def get_connection(path):
+    """
+    Get a pooled connection for `path` for the current thread. Inside a
+    connection_context it is the context's connection; otherwise the thread
+    keeps it until release_connections() (run at the end of every request).
+    Connections are reopened after a fork so worker processes never share a
+    file handle.
+    """
+    return _checkout(path, lambda: _open_pooled(path), pin=True)
+
+
 @contextmanager
-def get_db_context():
-    """Context manager for database connections"""
-    conn = get_db()
+def connection_context(path):
+    """
+    Transaction scope on the pooled connection for `path`.
+    The outermost scope commits or rolls back; nested scopes (a settings
+    lookup inside a write, for example) use a savepoint so a failure inside
+    them does not discard the caller's work.
+    """
+    conn = _checkout(path, lambda: _open_pooled(path))
+    depth = _local.depth[path]
+    _local.depth[path] = depth + 1
+    savepoint = f'sp_{depth}'
     try:
+        if depth:
+            conn.execute(f'SAVEPOINT {savepoint}')
         yield conn
-        conn.commit()
+        if depth:
+            conn.execute(f'RELEASE SAVEPOINT {savepoint}')
+        else:
+            conn.commit()
     except Exception as e:
-        conn.rollback()
+        if depth:
+            conn.execute(f'ROLLBACK TO SAVEPOINT {savepoint}')
+            conn.execute(f'RELEASE SAVEPOINT {savepoint}')
+        else:
+            conn.rollback()
         raise e
     finally:
-        conn.close()
+        _local.depth[path] = depth
+        if not depth and path not in _local.pinned:
+            _release(path)
 
-def init_db():
-    """Initialize database with required tables"""
-    with get_db_context() as conn:
-        cursor = conn.cursor()
-        
-        # Stories table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS stories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                content TEXT NOT NULL,
-                theme TEXT,
-                difficulty_level TEXT DEFAULT 'easy',
-                image_category TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_read TIMESTAMP
-            )
-        ''')
-        
-        # Story sentences table (for highlighting sync)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS story_sentences (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                story_id INTEGER NOT NULL,
-                sentence_order INTEGER NOT NULL,
-                sentence_text TEXT NOT NULL,
-                FOREIGN KEY (story_id) REFERENCES stories (id)
-            )
-        ''')
-        
-        # Quiz questions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS quiz_questions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                story_id INTEGER NOT NULL,
-                question TEXT NOT NULL,
-                options TEXT,
-                correct_answer TEXT NOT NULL,
-                question_type TEXT DEFAULT 'mcq',
-                FOREIGN KEY (story_id) REFERENCES stories (id)
-            )
-        ''')
-        
-        # User progress table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_progress (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                story_id INTEGER NOT NULL,
-                activity_type TEXT NOT NULL,
-                score REAL DEFAULT 0,
-                points_earned INTEGER DEFAULT 0,
-                points_possible INTEGER DEFAULT 0,
-                session_duration_sec INTEGER DEFAULT 0,
-                notes TEXT,
-                details TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (story_id) REFERENCES stories (id)
-            )
-        ''')
 
-        # Quiz attempts table (for tracking retries per question)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS quiz_attempts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                story_id INTEGER NOT NULL,
-                question_id INTEGER NOT NULL,
-                attempt_number INTEGER NOT NULL,
-                is_correct BOOLEAN NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (story_id) REFERENCES stories (id),
-                FOREIGN KEY (question_id) REFERENCES quiz_questions (id)
-            )
-        ''')
+def _read_only_uri(path):
+    return Path(path).resolve().as_uri() + '?mode=ro'
 
-        # Daily logs table (Parent Journal)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_logs (
-                date TEXT PRIMARY KEY,
-                mood TEXT,
-                sleep TEXT,
-                appetite TEXT,
-                focus TEXT,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # ChatMode history table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chatmode_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                prompt TEXT NOT NULL,
-                category TEXT,
-                image_path TEXT,
-                explanation TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Chatbot messages table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chatbot_messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT DEFAULT 'omar_session',
-                role TEXT NOT NULL,
-                content TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
 
-        # Chatbot memory state (for summaries)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chatbot_memory_state (
-                session_id TEXT PRIMARY KEY,
-                summary TEXT,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+def _open_read_only(path):
+    if path == DATABASE:
+        ensure_schema(TS_DATABASE)
+    ensure_schema(path)
+    conn = sqlite3.connect(_read_only_uri(path), uri=True, timeout=BUSY_TIMEOUT_MS / 1000,
+                           check_same_thread=False)
+    _configure_connection(conn, readonly=True)
+    if path == DATABASE:
+        conn.execute('ATTACH DATABASE ? AS ts', (_read_only_uri(TS_DATABASE),))
+    return conn
 
-        # Settings table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            )
-        ''')
-        
-        # Default settings if none exist
-        cursor.execute("SELECT COUNT(*) FROM settings")
-        if cursor.fetchone()[0] == 0:
-            cursor.execute("INSERT INTO settings (key, value) VALUES ('llm_provider', 'abacus:abacus-chat-v1')")
-            cursor.execute("INSERT INTO settings (key, value) VALUES ('story_tone', 'default')")
-            cursor.execute("INSERT INTO settings (key, value) VALUES ('tts_provider', 'default')")
-            cursor.execute("INSERT INTO settings (key, value) VALUES ('voice_preset', 'default')")
-            cursor.execute("INSERT INTO settings (key, value) VALUES ('reader_layout', 'classic')")
-
-        # Achievements Definitions
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS achievements (
-                id TEXT PRIMARY KEY,
-                title TEXT NOT NULL,
-                description TEXT NOT NULL,
-                icon_url TEXT,
-                emoji TEXT NOT NULL,
-                condition_type TEXT NOT NULL,
-                condition_threshold INTEGER NOT NULL DEFAULT 1,
-                category TEXT DEFAULT 'short'
-            )
-        ''')
-        
-        # User Unlocked Achievements
+
+def get_read_connection(path):
+    """
+    Get a pooled read-only connection (mode=ro, query_only) for `path`.
+    Under WAL it reads the last committed snapshot without ever taking a
+    write lock, so GET handlers do not queue behind background writers.
+    """
+    return _checkout(('ro', path), lambda: _open_read_only(path), pin=True)
+
+
+@contextmanager
+def read_context(path):
+    """Scope for pure reads: nothing to commit, any stray transaction is rolled back"""
+    key = ('ro', path)
+    conn = _checkout(key, lambda: _open_read_only(path))
+    depth = _local.depth[key]
+    _local.depth[key] = depth + 1
+    try:
+        yield conn
+    finally:
+        _local.depth[key] = depth
+        if not depth and key not in _local.pinned:
+            # Ends the read snapshot before the connection goes back to the pool
+            _release(key)
+
+
+def release_connections():
+    """Return every connection the current thread holds to the pool (Flask teardown, worker threads)"""
+    for key in list(_held()):
+        _release(key)
+
+
+def close_connections():
+    """Release the current thread's connections and close every idle pooled connection"""
+    release_connections()
+    with _pool_lock:
+        idle = [conn for conns in _idle.values() for conn in conns]
+        _idle.clear()
+    for conn in idle:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def get_db():
+    """Get database connection"""
+    return get_connection(DATABASE)
+
+@contextmanager
+def get_db_context():
+    """Context manager for database connections"""
+    with connection_context(DATABASE) as conn:
+        yield conn
+
+@contextmanager
+def get_db_read_context():
+    """Read-only counterpart of get_db_context for GET handlers"""
+    with read_context(DATABASE) as conn:
+        yield conn
+
+# Secondary indexes for the hot route queries. Each entry is (name, table, columns);
+# tests/test_query_plans.py checks the route queries actually pick them up.
+INDEXES = [
+    ('idx_stories_created_at', 'stories', 'created_at'),
+    ('idx_stories_last_read', 'stories', 'last_read'),
+    ('idx_story_sentences_story_order', 'story_sentences', 'story_id, sentence_order'),
+    ('idx_quiz_questions_story', 'quiz_questions', 'story_id'),
+    ('idx_quiz_attempts_story', 'quiz_attempts', 'story_id'),
+    ('idx_user_progress_activity_created', 'user_progress', 'activity_type, created_at'),
+    ('idx_user_progress_created', 'user_progress', 'created_at'),
+    ('idx_user_progress_score_story', 'user_progress', 'score, story_id'),
+    ('idx_chatbot_messages_session', 'chatbot_messages', 'session_id, id'),
+    ('idx_chatbot_messages_role_created', 'chatbot_messages', 'role, created_at'),
+    ('idx_chatmode_history_created', 'chatmode_history', 'created_at'),
+]
+
+def create_indexes(cursor, indexes=INDEXES):
+    """Create any missing indexes from the managed index set"""
+    for name, table, columns in indexes:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})')
+
+def add_column(cursor, table, column, definition):
+    """Add a column unless it is already there (older databases got some via ad-hoc scripts)"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def fts5_available(cursor):
+    """True if this SQLite build ships the FTS5 extension"""
+    cursor.execute('PRAGMA compile_options')
+    return 'ENABLE_FTS5' in [row[0] for row in cursor.fetchall()]
+
+def create_fts_index(cursor, fts_table, table, columns):
+    """
+    External-content FTS5 index over table(columns), kept in sync by triggers
+    and backfilled from the existing rows. Only changes to the indexed columns
+    touch the index, so bookkeeping updates (last_read etc.) stay cheap.
+    """
+    if not fts5_available(cursor):
+        print(f"FTS5 not available - skipping {fts_table}")
+        return
+    cols = ', '.join(columns)
+    new_vals = ', '.join(f'new.{c}' for c in columns)
+    old_vals = ', '.join(f'old.{c}' for c in columns)
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {cols}, content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts_table} (rowid, {cols}) VALUES (new.id, {new_vals});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+            INSERT INTO {fts_table} (rowid, {cols}) VALUES (new.id, {new_vals});
+        END
+    ''')
+    cursor.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('rebuild')")
+
+def run_migrations(conn, migrations):
+    """
+    Bring a database up to the latest schema version.
+    Pending steps run once each, in order, inside a single transaction and are
+    recorded in the schema_version table. Returns the number of steps applied.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'")
+    if cursor.fetchone():
+        cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+        if cursor.fetchone()[0] >= migrations[-1][0]:
+            return 0
+
+    # IMMEDIATE takes the write lock up front so concurrent workers migrate one at a time
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_achievements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                achievement_id TEXT NOT NULL,
-                unlocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (achievement_id) REFERENCES achievements (id),
-                UNIQUE(achievement_id)
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        cursor.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version')
+        current = cursor.fetchone()[0]
 
-        # Safely add scoring columns if missing
-        try:
-            cursor.execute("ALTER TABLE user_progress ADD COLUMN points_earned INTEGER DEFAULT 0")
-        except Exception: pass
-        try:
-            cursor.execute("ALTER TABLE user_progress ADD COLUMN points_possible INTEGER DEFAULT 0")
-        except Exception: pass
-        try:
-            cursor.execute("ALTER TABLE user_progress ADD COLUMN session_duration_sec INTEGER DEFAULT 0")
-        except Exception: pass
-            
-        # Safely add details column if missing
-        try:
-            cursor.execute("ALTER TABLE user_progress ADD COLUMN details TEXT")
-        except Exception:
-            pass  # Column already exists
-
-        # Insert sample stories if table is empty
-        cursor.execute('SELECT COUNT(*) FROM stories')
-        if cursor.fetchone()[0] == 0:
-            insert_sample_stories(cursor)
-            
-        # Always run - uses INSERT OR IGNORE so existing badges are safe
-        insert_default_achievements(cursor)
-        
+        applied = 0
+        for version, description, step in migrations:
+            if version <= current:
+                continue
+            step(cursor)
+            cursor.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                           (version, description))
+            applied += 1
         conn.commit()
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
+
+def _create_base_tables(cursor):
+    """Tables as originally shipped"""
+    # Stories table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            theme TEXT,
+            difficulty_level TEXT DEFAULT 'easy',
+            image_category TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_read TIMESTAMP
+        )
+    ''')
+    
+    # Story sentences table (for highlighting sync)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS story_sentences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            story_id INTEGER NOT NULL,
+            sentence_order INTEGER NOT NULL,
+            sentence_text TEXT NOT NULL,
+            FOREIGN KEY (story_id) REFERENCES stories (id)
+        )
+    ''')
+    
+    # Quiz questions table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            story_id INTEGER NOT NULL,
+            question TEXT NOT NULL,
+            options TEXT,
+            correct_answer TEXT NOT NULL,
+            question_type TEXT DEFAULT 'mcq',
+            FOREIGN KEY (story_id) REFERENCES stories (id)
+        )
+    ''')
+    
+    # User progress table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_progress (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            story_id INTEGER NOT NULL,
+            activity_type TEXT NOT NULL,
+            score REAL DEFAULT 0,
+            points_earned INTEGER DEFAULT 0,
+            points_possible INTEGER DEFAULT 0,
+            session_duration_sec INTEGER DEFAULT 0,
+            notes TEXT,
+            details TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (story_id) REFERENCES stories (id)
+        )
+    ''')
+
+    # Quiz attempts table (for tracking retries per question)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS quiz_attempts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            story_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            attempt_number INTEGER NOT NULL,
+            is_correct BOOLEAN NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (story_id) REFERENCES stories (id),
+            FOREIGN KEY (question_id) REFERENCES quiz_questions (id)
+        )
+    ''')
+
+    # Daily logs table (Parent Journal)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_logs (
+            date TEXT PRIMARY KEY,
+            mood TEXT,
+            sleep TEXT,
+            appetite TEXT,
+            focus TEXT,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # ChatMode history table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chatmode_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            prompt TEXT NOT NULL,
+            category TEXT,
+            image_path TEXT,
+            explanation TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Chatbot messages table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chatbot_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT DEFAULT 'omar_session',
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Chatbot memory state (for summaries)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS chatbot_memory_state (
+            session_id TEXT PRIMARY KEY,
+            summary TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Settings table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+    
+    # Achievements Definitions
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS achievements (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            icon_url TEXT,
+            emoji TEXT NOT NULL,
+            condition_type TEXT NOT NULL,
+            condition_threshold INTEGER NOT NULL DEFAULT 1,
+            category TEXT DEFAULT 'short'
+        )
+    ''')
+    
+    # User Unlocked Achievements
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_achievements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            achievement_id TEXT NOT NULL,
+            unlocked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (achievement_id) REFERENCES achievements (id),
+            UNIQUE(achievement_id)
+        )
+    ''')
+
+def _add_progress_scoring_columns(cursor):
+    add_column(cursor, 'user_progress', 'points_earned', 'INTEGER DEFAULT 0')
+    add_column(cursor, 'user_progress', 'points_possible', 'INTEGER DEFAULT 0')
+    add_column(cursor, 'user_progress', 'session_duration_sec', 'INTEGER DEFAULT 0')
+    add_column(cursor, 'user_progress', 'details', 'TEXT')
+
+def _add_story_moral_columns(cursor):
+    add_column(cursor, 'stories', 'moral', 'TEXT')
+    add_column(cursor, 'stories', 'vocab_json', 'TEXT')
+
+def _add_bilingual_columns(cursor):
+    add_column(cursor, 'stories', 'target_language', "TEXT DEFAULT 'en'")
+    add_column(cursor, 'stories', 'translated_title', 'TEXT')
+    add_column(cursor, 'story_sentences', 'translated_text', 'TEXT')
+
+def _add_story_audio_speed(cursor):
+    add_column(cursor, 'stories', 'audio_speed', 'REAL DEFAULT 0.8')
+
+def _add_quiz_hint_columns(cursor):
+    add_column(cursor, 'quiz_questions', 'hint', 'TEXT')
+    add_column(cursor, 'quiz_questions', 'explanation', 'TEXT')
+
+def _add_achievement_category(cursor):
+    add_column(cursor, 'achievements', 'category', "TEXT DEFAULT 'short'")
+
+def _create_settings_version(cursor):
+    # Single-row counter bumped on every settings write so each worker
+    # process can tell cheaply whether its cached settings are stale
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS settings_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO settings_version (id, version) VALUES (1, 0)')
+
+def _create_search_index(cursor):
+    create_fts_index(cursor, 'stories_fts', 'stories', ['title', 'content', 'moral'])
+    create_fts_index(cursor, 'story_sentences_fts', 'story_sentences', ['sentence_text', 'translated_text'])
+
+def _seed_defaults(cursor):
+    # Default settings if none exist
+    cursor.execute("SELECT COUNT(*) FROM settings")
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("INSERT INTO settings (key, value) VALUES ('llm_provider', 'abacus:abacus-chat-v1')")
+        cursor.execute("INSERT INTO settings (key, value) VALUES ('story_tone', 'default')")
+        cursor.execute("INSERT INTO settings (key, value) VALUES ('tts_provider', 'default')")
+        cursor.execute("INSERT INTO settings (key, value) VALUES ('voice_preset', 'default')")
+        cursor.execute("INSERT INTO settings (key, value) VALUES ('reader_layout', 'classic')")
+
+    # Sample stories if the table is empty
+    cursor.execute('SELECT COUNT(*) FROM stories')
+    if cursor.fetchone()[0] == 0:
+        insert_sample_stories(cursor)
+
+    # INSERT OR IGNORE, so existing badges are safe. New badges need a new
+    # migration step that calls this again.
+    insert_default_achievements(cursor)
+
+def _create_llm_cache(cursor):
+    # Persistent tier of routes/llm_cache.py: responses keyed by a content hash
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            provider TEXT NOT NULL,
+            model TEXT,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at)')
+
+def _create_story_pool(cursor):
+    # Pre-built /random stories (routes/story_pool.py). A story listed here is
+    # hidden from the library until it is claimed; ready_at is set once its
+    # audio and images exist.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS story_pool (
+            story_id INTEGER PRIMARY KEY,
+            pool_key TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            ready_at REAL,
+            FOREIGN KEY (story_id) REFERENCES stories (id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_story_pool_key_ready ON story_pool(pool_key, ready_at)')
+
+def _create_llm_calls(cursor):
+    # Per-call LLM telemetry (routes/llm_telemetry.py), swept after LLM_TELEMETRY_RETENTION_DAYS
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS llm_calls (
+            id INTEGER PRIMARY KEY,
+            created_at REAL NOT NULL,
+            provider TEXT NOT NULL,
+            model TEXT,
+            call_site TEXT NOT NULL,
+            latency_ms INTEGER NOT NULL,
+            ttft_ms INTEGER,
+            prompt_tokens INTEGER,
+            completion_tokens INTEGER,
+            estimated INTEGER NOT NULL DEFAULT 0,
+            outcome TEXT NOT NULL,
+            cost_usd REAL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_calls_created ON llm_calls(created_at)')
+
+def _create_story_pool_builds(cursor):
+    # One row per pool key while a process is building a story for it, so
+    # several workers never refill the same combination at once
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS story_pool_builds (
+            pool_key TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            started_at REAL NOT NULL
+        )
+    ''')
+
+# Ordered schema history for ost.db. Never edit a shipped step - append a new one.
+MIGRATIONS = [
+    (1, 'base tables', _create_base_tables),
+    (2, 'user_progress scoring and details columns', _add_progress_scoring_columns),
+    (3, 'stories moral and vocab columns', _add_story_moral_columns),
+    (4, 'bilingual story columns', _add_bilingual_columns),
+    (5, 'stories audio_speed column', _add_story_audio_speed),
+    (6, 'quiz hint and explanation columns', _add_quiz_hint_columns),
+    (7, 'achievements category column', _add_achievement_category),
+    (8, 'managed index set', create_indexes),
+    (9, 'settings version counter', _create_settings_version),
+    (10, 'full-text search index', _create_search_index),
+    (11, 'default settings, sample stories and achievements', _seed_defaults),
+    (12, 'LLM response cache', _create_llm_cache),
+    (13, 'ready-story pool', _create_story_pool),
+    (14, 'LLM call telemetry', _create_llm_calls),
+    (15, 'story pool build slots', _create_story_pool_builds),
+]
+
+def init_db():
+    """Create or upgrade ost.db to the latest schema version"""
+    conn = open_connection(DATABASE)
+    try:
+        run_migrations(conn, MIGRATIONS)
+    finally:
+        conn.close()
+    _bootstrapped.add(DATABASE)
+
+def ensure_schema(path):
+    """
+    Once per process, bring `path` up to date before its first pooled
+    connection is handed out. After that this is a set lookup, so importing
+    modules or starting a worker does no disk I/O until a request needs it.
+    """
+    if path in _bootstrapped:
+        return
+    with _bootstrap_lock:
+        if path in _bootstrapped:
+            return
+        if path == TS_DATABASE:
+            from tinystories_db import init_ts_db
+            init_ts_db()
+        elif path == DATABASE:
+            init_db()
 
 def insert_default_achievements(cursor):
     """Insert default achievements - uses INSERT OR IGNORE to preserve existing data"""
@@ -296,5 +767,7 @@ def insert_sample_stories(cursor):
             ''', (story_id, idx, sentence))
 
 if __name__ == '__main__':
+    from tinystories_db import init_ts_db
+    init_ts_db()
     init_db()
     print("Database initialized successfully!")
@@ -1,6 +1,7 @@
 import os
 from flask import Blueprint, jsonify, request
-from database import get_db_context
+from database import get_db_context, get_db_read_context
+from write_behind import ost_writer
 
 bp = Blueprint('achievements', __name__)
 
@@ -13,6 +14,8 @@ def check_achievements():
         score = data.get('score', 0)
         
         newly_unlocked = []
+        # Practice and chat rows go through the write-behind queue; count them too
+        ost_writer.flush()
         
         with get_db_context() as conn:
             cursor = conn.cursor()
@@ -22,6 +25,9 @@ def check_achievements():
                 cursor.execute("SELECT COUNT(*) FROM user_progress WHERE activity_type = 'quiz' AND score = 100")
             elif activity_type == 'chat':
                 cursor.execute("SELECT COUNT(*) FROM chatbot_messages WHERE role = 'user'")
+            elif activity_type == 'vocab_new':
+                # Words are tracked in tinystories.db, attached as `ts`
+                cursor.execute("SELECT COUNT(*) FROM ts.vocabulary_progress")
             else:
                 cursor.execute("SELECT COUNT(*) FROM user_progress WHERE activity_type = ?", (activity_type,))
                 
@@ -66,7 +72,7 @@ def check_achievements():
 def list_achievements():
     """Get all achievements, denoting which ones are unlocked"""
     try:
-        with get_db_context() as conn:
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
@@ -0,0 +1,170 @@
+"""
+Async Provider Layer
+One asyncio event loop on a background thread owns the async clients
+(httpx.AsyncClient, AsyncOpenAI) and runs edge_tts natively. Flask routes stay
+synchronous and use the facade: run() waits for one coroutine, fan_out() runs
+independent jobs concurrently under a limit and returns once the slowest is
+done. Plain callables (SDKs without async support, gTTS, SQLite) are moved to
+worker threads from inside the loop, so they overlap with the async calls.
+Coroutines run with a copy of the caller's context, so the request deadline
+and the LLM call site carry over.
+"""
+
+import asyncio
+import contextvars
+import importlib.util
+import logging
+import os
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from routes import deadline
+
+logger = logging.getLogger(__name__)
+
+# Independent asset jobs (TTS clips, images) in flight at once per fan_out
+ASSET_CONCURRENCY = int(os.getenv('ASSET_CONCURRENCY', 6))
+# Keep-alive connections held by the shared httpx.AsyncClient
+HTTP_MAX_CONNECTIONS = 20
+
+
+class _ProviderLoop:
+    """The background loop and the async clients bound to it (rebuilt after a fork)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._pid = None
+        self._clients = {}
+
+    def loop(self):
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._clients = {}
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._loop.run_forever, name='async-providers', daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def in_loop_thread(self):
+        return self._thread is threading.current_thread()
+
+    def client(self, key, factory):
+        """Async clients are tied to the loop they were created on, so they live here"""
+        client = self._clients.get(key)
+        if client is None:
+            client = self._clients[key] = factory()
+        return client
+
+
+_provider_loop = _ProviderLoop()
+
+
+async def _in_context(ctx, coro):
+    # The task starts from the loop thread's context; copy the caller's values in
+    for var, value in ctx.items():
+        var.set(value)
+    return await coro
+
+
+def run(coro, timeout=None):
+    """
+    Run a coroutine on the provider loop and wait for its result. Waits at
+    most `timeout` seconds, clipped to the request deadline; on expiry the
+    coroutine is cancelled and DeadlineExceeded is raised.
+    """
+    if _provider_loop.in_loop_thread():
+        coro.close()
+        raise RuntimeError('async_providers.run() called from the provider loop; await the coroutine instead')
+    future = asyncio.run_coroutine_threadsafe(_in_context(contextvars.copy_context(), coro), _provider_loop.loop())
+    left = deadline.remaining()
+    if left is not None:
+        timeout = left if timeout is None else min(timeout, left)
+    try:
+        return future.result(timeout=None if timeout is None else max(0.0, timeout))
+    except FutureTimeout:
+        future.cancel()
+        raise deadline.DeadlineExceeded('async provider call did not finish in time')
+
+
+async def gather_limited(jobs, limit=ASSET_CONCURRENCY):
+    """
+    Run jobs concurrently, at most `limit` at a time. A job is a coroutine
+    function or a plain callable (run on a worker thread). Results come back
+    in order; a job that raised yields its exception instead.
+    """
+    gate = asyncio.Semaphore(max(1, limit))
+
+    async def one(job):
+        async with gate:
+            if asyncio.iscoroutinefunction(job):
+                return await job()
+            return await asyncio.to_thread(job)
+
+    return await asyncio.gather(*(one(job) for job in jobs), return_exceptions=True)
+
+
+def fan_out(jobs, limit=ASSET_CONCURRENCY):
+    """Sync facade for gather_limited: returns when every job has finished (or the deadline passes)"""
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    results = run(gather_limited(jobs, limit))
+    for job, result in zip(jobs, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Async job {getattr(job, '__name__', job)} failed: {result}")
+    return results
+
+
+def http_client():
+    """Shared httpx.AsyncClient (call on the provider loop)"""
+    import httpx
+    return _provider_loop.client(('httpx',), lambda: httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS)))
+
+
+def http_timeout():
+    """httpx timeout from the request deadline, like deadline.timeout() for requests"""
+    import httpx
+    connect, read = deadline.timeout()
+    return httpx.Timeout(read, connect=connect)
+
+
+def openai_available():
+    """True when the openai SDK is installed (without importing it)"""
+    return importlib.util.find_spec('openai') is not None
+
+
+def openai_async_client(api_key=None):
+    """AsyncOpenAI client (call on the provider loop); api_key=None reads OPENAI_API_KEY"""
+    from openai import AsyncOpenAI
+    from routes.llm_clients import _fingerprint
+    return _provider_loop.client(('openai', _fingerprint(api_key)),
+                                 lambda: AsyncOpenAI(api_key=api_key) if api_key else AsyncOpenAI())
+
+
+async def edge_tts_save(text, voice, outfile, rate):
+    """Synthesize with edge_tts straight on the loop; bounded by the request deadline"""
+    import edge_tts
+    # Rate string: "+0%" or "-10%"
+    rate_str = f"{int((rate - 1.0) * 100):+d}%"
+    communicate = edge_tts.Communicate(text, voice, rate=rate_str)
+    await asyncio.wait_for(communicate.save(outfile), deadline.seconds())
+
+
+async def openai_speech(text, voice, outfile, speed, api_key=None):
+    client = openai_async_client(api_key).with_options(timeout=deadline.seconds())
+    response = await client.audio.speech.create(model="tts-1", voice=voice, input=text, speed=speed)
+    with open(outfile, 'wb') as f:
+        f.write(response.content)
+
+
+async def http_post_to_file(url, outfile, headers=None, json=None):
+    """POST and save the body to outfile; returns the httpx response (the file is written only on 200)"""
+    response = await http_client().post(url, headers=headers, json=json, timeout=http_timeout())
+    if response.status_code == 200:
+        with open(outfile, 'wb') as f:
+            f.write(response.content)
+    return response
@@ -4,7 +4,14 @@ Personalized AI Companion using LangChain
 """
 
 from flask import Blueprint, jsonify, request
-from database import get_db_context
+from database import get_db_context, get_db_read_context
+from write_behind import ost_writer
+from routes.llm_clients import abacus_client, langchain_chat
+from routes.settings import get_setting
+from routes.provider_router import router
+from routes import deadline
+from routes import llm_telemetry
+from routes.pagination import PaginationError, fetch_page, parse_fields, wants_all
 import os
 import json
 import logging
@@ -42,8 +49,7 @@ class AbacusLLM:
 
     def _call(self, prompt: str, stop=None) -> str:
         try:
-            from abacusai import ApiClient
-            client = ApiClient(api_key=self.api_key)
+            client = abacus_client(self.api_key)
             resp = client.evaluate_prompt(
                 prompt=prompt,
                 system_message="You are Buddy, Omar's friendly AI companion. Keep it simple and short.",
@@ -62,13 +68,7 @@ def get_llm():
     """Get LLM based on settings, preferring Gemini if available to avoid quota issues"""
     provider_val = 'gemini' # Default to Gemini
     try:
-        with get_db_context() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT value FROM settings WHERE key='llm_provider'")
-            row = cursor.fetchone()
-            if row:
-                provider_val = row[0]
-                
+        provider_val = get_setting('llm_provider', provider_val)
     except:
         pass
 
@@ -81,39 +81,41 @@ def get_llm():
         provider = provider_val
         model_id = None
 
-    # Check for Abacus FIRST
+    # Same preference as before (Abacus, the configured provider, OpenAI, then
+    # Gemini), but a provider whose circuit is open is passed over while it cools down
+    google_key = os.environ.get('GOOGLE_API_KEY')
+    openai_key = os.environ.get('OPENAI_API_KEY')
     abacus_key = os.environ.get('ABACUS_API_KEY') or os.environ.get('ABACUS_AI_API_KEY')
+    candidates = []
     if (provider == 'abacus' or not provider) and abacus_key:
-        return AbacusLLM(api_key=abacus_key, model_id=model_id or "abacus-chat-v1")
-
-    # If Gemini is requested and we have the key, use it
-    if provider == 'gemini' and os.environ.get('GOOGLE_API_KEY'):
-        from langchain_google_genai import ChatGoogleGenerativeAI
-        return ChatGoogleGenerativeAI(
-            model=model_id if model_id else "gemini-2.0-flash",
-            google_api_key=os.environ.get('GOOGLE_API_KEY'),
-            temperature=0.7
-        )
-    
-    # If OpenAI is requested or fallback
-    if (provider == 'openai' or provider == 'abacus') and os.environ.get('OPENAI_API_KEY'):
-        from langchain_openai import ChatOpenAI
-        return ChatOpenAI(
-            model=model_id if (model_id and provider=='openai') else "gpt-4o-mini",
-            openai_api_key=os.environ.get('OPENAI_API_KEY'),
-            temperature=0.7
-        )
-    
-    # Final fallback to Gemini if OpenAI key missing but Gemini key exists
-    if os.environ.get('GOOGLE_API_KEY'):
-         from langchain_google_genai import ChatGoogleGenerativeAI
-         return ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            google_api_key=os.environ.get('GOOGLE_API_KEY'),
-            temperature=0.7
-        )
+        candidates.append(('abacus', lambda: AbacusLLM(api_key=abacus_key, model_id=model_id or "abacus-chat-v1")))
+    if provider == 'gemini' and google_key:
+        candidates.append(('gemini', lambda: langchain_chat('gemini', model_id if model_id else "gemini-2.0-flash", google_key)))
+    if (provider == 'openai' or provider == 'abacus') and openai_key:
+        candidates.append(('openai', lambda: langchain_chat('openai', model_id if (model_id and provider=='openai') else "gpt-4o-mini",
+                                                            openai_key)))
+    if google_key and not any(name == 'gemini' for name, _ in candidates):
+        candidates.append(('gemini', lambda: langchain_chat('gemini', "gemini-2.0-flash", google_key)))
+
+    if not candidates:
+        return None
+    factories = dict(candidates)
+    ordered = router.order([name for name, _ in candidates])
+    name = next((n for n in ordered if router.available(n)), ordered[0])
+    return factories[name]()
+
+
+def chat_model_name(llm):
+    """Model id of a chat model returned by get_llm, for the telemetry ledger"""
+    name = getattr(llm, 'model_id', None) or getattr(llm, 'model_name', None) or getattr(llm, 'model', None)
+    return str(name).removeprefix('models/') if name else None
 
-    return None
+
+def llm_provider_name(llm):
+    """Router key for a chat model returned by get_llm"""
+    if isinstance(llm, AbacusLLM):
+        return 'abacus'
+    return 'gemini' if 'Google' in type(llm).__name__ else 'openai'
 
 
 def get_buddy_memory(session_id, llm):
@@ -180,6 +182,7 @@ def get_buddy_memory(session_id, llm):
 
 
 @bp.route('/ask', methods=['POST'])
+@deadline.with_deadline(deadline.INTERACTIVE_DEADLINE_SEC)
 def ask():
     """Send a message to Buddy"""
     try:
@@ -202,7 +205,10 @@ def ask():
                     history_text += f"{role}: {msg['content']}\n"
 
             prompt = BUDDY_TEMPLATE.format(history=history_text, input=user_input)
-            buddy_response = llm._call(prompt)
+            with router.attempt('abacus'), \
+                    llm_telemetry.track('abacus', llm.model_id, prompt, site=llm_telemetry.CHATBOT) as call:
+                buddy_response = deadline.call(llm._call, prompt)
+                call.finish(buddy_response)
 
             # Update in-memory history
             if isinstance(memory, dict):
@@ -232,36 +238,38 @@ def ask():
                 verbose=True
             )
 
-            # Generate Response
+            # Generate Response (the memory's history is not counted in the prompt estimate)
+            prompt_text = BUDDY_TEMPLATE.format(history='', input=user_input)
             try:
-                buddy_response = conversation.predict(input=user_input)
+                with router.attempt(llm_provider_name(llm)), \
+                        llm_telemetry.track(llm_provider_name(llm), chat_model_name(llm), prompt_text,
+                                            site=llm_telemetry.CHATBOT) as call:
+                    buddy_response = deadline.call(conversation.predict, input=user_input)
+                    call.finish(buddy_response)
             except Exception as e:
                 # Automatic fallback to Gemini if OpenAI fails (likely quota)
                 if "insufficient_quota" in str(e) or "429" in str(e):
                     logger.warning("OpenAI quota hit, falling back to Gemini for this message...")
-                    from langchain_google_genai import ChatGoogleGenerativeAI
-                    fallback_llm = ChatGoogleGenerativeAI(
-                        model="gemini-2.0-flash",
-                        google_api_key=os.environ.get('GOOGLE_API_KEY'),
-                        temperature=0.7
-                    )
+                    fallback_llm = langchain_chat('gemini', "gemini-2.0-flash", os.environ.get('GOOGLE_API_KEY'))
                     conversation.llm = fallback_llm
-                    buddy_response = conversation.predict(input=user_input)
+                    with router.attempt('gemini'), \
+                            llm_telemetry.track('gemini', "gemini-2.0-flash", prompt_text,
+                                                site=llm_telemetry.CHATBOT) as call:
+                        buddy_response = deadline.call(conversation.predict, input=user_input)
+                        call.finish(buddy_response)
                 else:
                     raise e
 
-        # Persist to DB
+        # Persist to DB (write-behind: the reply does not wait on the commit)
         try:
-            with get_db_context() as conn:
-                cursor = conn.cursor()
-                # Save Messages
-                cursor.execute("INSERT INTO chatbot_messages (session_id, role, content) VALUES (?, ?, ?)", (session_id, 'user', user_input))
-                cursor.execute("INSERT INTO chatbot_messages (session_id, role, content) VALUES (?, ?, ?)", (session_id, 'buddy', buddy_response))
-                
-                # Save Summary if LangChain memory
-                if hasattr(memory, 'moving_summary_buffer'):
-                    summary = memory.moving_summary_buffer
-                    cursor.execute("INSERT OR REPLACE INTO chatbot_memory_state (session_id, summary, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)", (session_id, summary))
+            # Save Messages
+            ost_writer.submit("INSERT INTO chatbot_messages (session_id, role, content) VALUES (?, ?, ?)", (session_id, 'user', user_input))
+            ost_writer.submit("INSERT INTO chatbot_messages (session_id, role, content) VALUES (?, ?, ?)", (session_id, 'buddy', buddy_response))
+
+            # Save Summary if LangChain memory
+            if hasattr(memory, 'moving_summary_buffer'):
+                summary = memory.moving_summary_buffer
+                ost_writer.submit("INSERT OR REPLACE INTO chatbot_memory_state (session_id, summary, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)", (session_id, summary))
         except Exception as e:
             logger.error(f"Error persisting chat to DB: {e}")
 
@@ -275,16 +283,26 @@ def ask():
         logger.error(f"Chatbot Error: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+HISTORY_FIELDS = ['id', 'role', 'content', 'created_at']
+
 @bp.route('/history', methods=['GET'])
 def get_history():
-    """Get chat history for UI"""
+    """Get chat history for UI, oldest first (keyset paginated; ?all=1 for everything)"""
     session_id = request.args.get('session_id', 'omar_default')
     try:
-        with get_db_context() as conn:
+        fields = parse_fields(HISTORY_FIELDS, default=['role', 'content', 'created_at'])
+        ost_writer.flush()  # include messages still waiting in the write-behind queue
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT role, content, created_at FROM chatbot_messages WHERE session_id = ? ORDER BY id ASC", (session_id,))
-            messages = [dict(row) for row in cursor.fetchall()]
-        return jsonify({"success": True, "messages": messages})
+            if wants_all():
+                cursor.execute(f"SELECT {', '.join(fields)} FROM chatbot_messages WHERE session_id = ? ORDER BY id ASC", (session_id,))
+                return jsonify({"success": True, "messages": [dict(row) for row in cursor.fetchall()]})
+            messages, next_cursor, has_more = fetch_page(
+                cursor, 'chatbot_messages', fields, ('id',), descending=False,
+                where='session_id = ?', params=(session_id,))
+        return jsonify({"success": True, "messages": messages, "next_cursor": next_cursor, "has_more": has_more})
+    except PaginationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -295,7 +313,9 @@ def reset_chat():
     try:
         if session_id in _memory_cache:
             del _memory_cache[session_id]
-            
+
+        # Queued inserts must land before the delete or they would resurrect the chat
+        ost_writer.flush()
         with get_db_context() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM chatbot_messages WHERE session_id = ?", (session_id,))
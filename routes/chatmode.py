@@ -7,6 +7,8 @@ from flask import Blueprint, jsonify, request
 from database import get_db_context
 import os
 import json
+from routes.llm_clients import openai_client, http_session
+from routes import deadline
 
 bp = Blueprint('chatmode', __name__)
 
@@ -78,9 +80,7 @@ def get_or_generate_image(category, item):
     try:
         openai_key = os.environ.get('OPENAI_API_KEY', '')
         if openai_key and 'sk-' in openai_key:
-            from openai import OpenAI
-            import requests as req
-            client = OpenAI(api_key=openai_key)
+            client = openai_client(openai_key).with_options(timeout=deadline.seconds())
             response = client.images.generate(
                 model="dall-e-2",
                 prompt=prompt,
@@ -88,7 +88,7 @@ def get_or_generate_image(category, item):
                 n=1,
             )
             image_url = response.data[0].url
-            img_data = req.get(image_url).content
+            img_data = http_session().get(image_url, timeout=deadline.timeout()).content
             with open(filepath, 'wb') as f:
                 f.write(img_data)
             print(f"ChatMode: Generated DALL-E image for {item}")
@@ -99,7 +99,6 @@ def get_or_generate_image(category, item):
     # 2. Try Google Imagen 3
     try:
         import base64
-        import requests as req
         api_key = os.environ.get('GOOGLE_API_KEY', '')
         if api_key:
             url = f"https://generativelanguage.googleapis.com/v1beta/models/imagen-3.0-generate-001:predict?key={api_key}"
@@ -107,7 +106,8 @@ def get_or_generate_image(category, item):
                 "instances": [{"prompt": f"Children's cartoon illustration: {prompt}"}],
                 "parameters": {"sampleCount": 1, "aspectRatio": "1:1"}
             }
-            response = req.post(url, headers={'Content-Type': 'application/json'}, json=data)
+            response = http_session().post(url, headers={'Content-Type': 'application/json'}, json=data,
+                                           timeout=deadline.timeout())
             if response.status_code == 200:
                 result = response.json()
                 b64_data = result['predictions'][0]['bytesBase64Encoded']
@@ -120,13 +120,12 @@ def get_or_generate_image(category, item):
 
     # 3. Try HuggingFace FLUX.1-schnell
     try:
-        import requests as req
         hf_token = os.environ.get('HF_TOKEN') or os.environ.get('HUGGINGFACE_API_KEY')
         api_url = "https://router.huggingface.co/hf-inference/models/black-forest-labs/FLUX.1-schnell"
         headers = {}
         if hf_token:
             headers["Authorization"] = f"Bearer {hf_token}"
-        response = req.post(api_url, headers=headers, json={"inputs": prompt})
+        response = http_session().post(api_url, headers=headers, json={"inputs": prompt}, timeout=deadline.timeout())
         if response.status_code == 200:
             with open(filepath, 'wb') as f:
                 f.write(response.content)
@@ -157,6 +156,7 @@ def get_explanation(category, item):
 
 
 @bp.route('/ask', methods=['POST'])
+@deadline.with_deadline(deadline.INTERACTIVE_DEADLINE_SEC)
 def ask():
     """Process ChatMode request"""
     try:
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request
-from database import get_db_context
+from database import get_db_context, get_db_read_context
+from routes.story_pool import unpooled
 import logging
 from datetime import datetime, timedelta
 
@@ -11,21 +12,29 @@ bp = Blueprint('dashboard', __name__)
 def get_dashboard_summary():
     """Get high-level stats for the dashboard cards"""
     try:
-        with get_db_context() as conn:
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
             
             # Total stories mastered
-            cursor.execute("SELECT COUNT(DISTINCT story_id) FROM user_progress WHERE score >= 80")
+            cursor.execute(f"SELECT COUNT(DISTINCT story_id) FROM user_progress "
+                           f"WHERE score >= 80 AND {unpooled('user_progress', 'story_id')}")
             stories_mastered = cursor.fetchone()[0]
             
             # Total points earned
             cursor.execute("SELECT SUM(points_earned) FROM user_progress")
             total_points = cursor.fetchone()[0] or 0
             
-            # Words learned (vocab count from stories)
-            # This is an estimate based on progress
             cursor.execute("SELECT COUNT(*) FROM user_progress WHERE activity_type = 'quiz'")
             sessions_count = cursor.fetchone()[0]
+
+            # Words learned vs stories read - vocabulary lives in the attached tinystories.db
+            cursor.execute(f'''
+                SELECT (SELECT COUNT(*) FROM ts.vocabulary_progress WHERE status = 'mastered') AS words_learned,
+                       (SELECT COUNT(*) FROM ts.vocabulary_progress) AS words_seen,
+                       (SELECT COUNT(DISTINCT story_id) FROM user_progress
+                        WHERE activity_type = 'story_read' AND {unpooled('user_progress', 'story_id')}) AS stories_read
+            ''')
+            vocab = dict(cursor.fetchone())
             
             # Accuracy trend (average score of last 5 sessions)
             cursor.execute("SELECT AVG(score) FROM user_progress WHERE activity_type = 'quiz' ORDER BY created_at DESC LIMIT 5")
@@ -37,7 +46,10 @@ def get_dashboard_summary():
                     'stories_mastered': stories_mastered,
                     'total_points': total_points,
                     'sessions_completed': sessions_count,
-                    'avg_accuracy': round(avg_accuracy, 1)
+                    'avg_accuracy': round(avg_accuracy, 1),
+                    'words_learned': vocab['words_learned'],
+                    'words_seen': vocab['words_seen'],
+                    'stories_read': vocab['stories_read']
                 }
             })
     except Exception as e:
@@ -52,26 +64,29 @@ def get_chart_data():
         accuracy_data = []
         completion_data = []
         
-        with get_db_context() as conn:
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
             
             for i in range(6, -1, -1):
-                date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
+                day = datetime.now() - timedelta(days=i)
+                date = day.strftime('%Y-%m-%d')
+                next_date = (day + timedelta(days=1)).strftime('%Y-%m-%d')
                 days.append(date)
                 
                 # Avg accuracy for that day
+                # (range on created_at instead of date(created_at) so the index is usable)
                 cursor.execute("""
                     SELECT AVG(score) FROM user_progress 
-                    WHERE date(created_at) = ? AND activity_type = 'quiz'
-                """, (date,))
+                    WHERE activity_type = 'quiz' AND created_at >= ? AND created_at < ?
+                """, (date, next_date))
                 acc = cursor.fetchone()[0] or 0
                 accuracy_data.append(round(acc, 1))
                 
                 # Count completions
                 cursor.execute("""
                     SELECT COUNT(*) FROM user_progress 
-                    WHERE date(created_at) = ?
-                """, (date,))
+                    WHERE created_at >= ? AND created_at < ?
+                """, (date, next_date))
                 comp = cursor.fetchone()[0] or 0
                 completion_data.append(comp)
                 
@@ -88,12 +103,13 @@ def get_chart_data():
 def get_session_history():
     """Get detailed session history for the table"""
     try:
-        with get_db_context() as conn:
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT p.created_at, s.title, p.activity_type, p.score, p.points_earned, p.points_possible
                 FROM user_progress p
                 JOIN stories s ON p.story_id = s.id
+                WHERE {unpooled('s')}
                 ORDER BY p.created_at DESC
                 LIMIT 20
             """)
@@ -129,7 +145,7 @@ def submit_journal():
 def get_journal(date):
     """Get journal entry for a specific date"""
     try:
-        with get_db_context() as conn:
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM daily_logs WHERE date = ?", (date,))
             row = cursor.fetchone()
@@ -0,0 +1,107 @@
+"""
+Request Deadlines
+A route handler sets a time budget once; every outbound call below it (LLM,
+TTS, image and plain HTTP) derives its connect/read timeout from what is left,
+so one hung socket can no longer pin a worker thread. The deadline lives in a
+contextvar, so nested scopes only ever tighten it and worker threads started
+with propagate() inherit it.
+"""
+
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+# Route budgets
+STORY_DEADLINE_SEC = float(os.getenv('STORY_DEADLINE_SEC', 120))
+STORY_TEXT_DEADLINE_SEC = float(os.getenv('STORY_TEXT_DEADLINE_SEC', 45))
+INTERACTIVE_DEADLINE_SEC = float(os.getenv('INTERACTIVE_DEADLINE_SEC', 30))
+
+# Per-call ceilings, used as-is when no deadline is set
+CONNECT_TIMEOUT_SEC = float(os.getenv('HTTP_CONNECT_TIMEOUT_SEC', 5))
+READ_TIMEOUT_SEC = float(os.getenv('HTTP_READ_TIMEOUT_SEC', 60))
+
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+# For SDK calls that take no timeout argument (Abacus, LangChain)
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv('DEADLINE_WORKERS', 8)),
+                               thread_name_prefix='deadline-call')
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before (or during) an outbound call"""
+
+
+@contextmanager
+def deadline(seconds):
+    """Run the block with at most `seconds` left; an enclosing tighter deadline wins"""
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def with_deadline(seconds):
+    """Route decorator: the whole handler runs under one deadline"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with deadline(seconds):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def remaining():
+    """Seconds left, or None when no deadline is set"""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def expired():
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def seconds(limit=READ_TIMEOUT_SEC):
+    """Timeout for one SDK call: `limit` clipped to the budget left; raises once it is spent"""
+    left = remaining()
+    if left is None:
+        return limit
+    if left <= 0:
+        raise DeadlineExceeded('request deadline exceeded')
+    return min(limit, left)
+
+
+def timeout(read=READ_TIMEOUT_SEC, connect=CONNECT_TIMEOUT_SEC):
+    """(connect, read) timeout tuple for requests, clipped to the budget left"""
+    read = seconds(read)
+    return min(connect, read), read
+
+
+def call(fn, *args, limit=READ_TIMEOUT_SEC, **kwargs):
+    """
+    Run a blocking SDK call that has no timeout of its own and give up after
+    seconds(limit). The call itself cannot be interrupted; it finishes on a
+    helper thread and its result is dropped.
+    """
+    future = _executor.submit(propagate(fn), *args, **kwargs)
+    try:
+        return future.result(timeout=seconds(limit))
+    except FutureTimeout:
+        raise DeadlineExceeded(f'{getattr(fn, "__name__", "call")} did not finish in time')
+
+
+def propagate(fn):
+    """Bind fn to a copy of the current context so a worker thread keeps the deadline"""
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        return ctx.run(fn, *args, **kwargs)
+    return run
@@ -3,72 +3,155 @@ Story Generation API Routes
 Using simple template-based generation (can be enhanced with LLM later)
 """
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from database import get_db_context
+from routes.settings import current_settings
+from routes import deadline
+from routes import async_providers
+from routes.story_pool import story_pool, add_pending, mark_ready
+from routes.quiz import MIN_QUESTIONS, save_questions
+import functools
+import json
+import queue
 import random
 import threading
 import logging
-import sqlite3
 
 bp = Blueprint('generator', __name__)
 logger = logging.getLogger(__name__)
 
 
 def _generate_story_assets(story_id, title, content, full_text_en, full_text_translated,
-                           sentences_for_images, target_language, speed):
-    """Run audio and image generation in background. Does not block."""
+                           sentences_for_images, target_language, speed, on_event=None):
+    """
+    Generate story audio and images; returns when all are done.
+    Every clip and image is independent, so they run concurrently (up to
+    ASSET_CONCURRENCY at a time) and the story is ready about when its slowest
+    asset is. on_event(name, data), if given, is called as each asset is ready
+    (from a worker thread) so a streaming response can forward it.
+    """
+    def emit(kind, ok=True, url=None, **extra):
+        if on_event:
+            on_event('asset', {'type': kind, 'ok': bool(ok), 'url': url, **extra})
+
     try:
-        from routes.speech import generate_audio_file, pregenerate_sentence_audio
+        from routes.speech import generate_audio_file, sentence_audio_jobs
         from routes.images import generate_and_save_image, generate_and_save_sentence_image
 
-        def story_cover_task(sid, t, txt):
-            log_prompt = f"Children's story illustration: {t}. Scene: {txt[:200]}"
-            generate_and_save_image(sid, log_prompt)
+        def story_cover_task():
+            log_prompt = f"Children's story illustration: {title}. Scene: {content[:200]}"
+            ok, url = generate_and_save_image(story_id, log_prompt)
+            emit('cover', ok, url if ok else None)
 
-        def all_sentence_images_task(sid, story_title, sentence_texts):
-            for idx, sent in enumerate(sentence_texts):
-                try:
-                    generate_and_save_sentence_image(sid, idx, (sent or '')[:200], story_title=story_title)
-                except Exception as e:
-                    logger.error("Sentence image %s failed: %s", idx, e)
+        def sentence_image_task(idx, sent):
+            try:
+                ok, url = generate_and_save_sentence_image(story_id, idx, (sent or '')[:200], story_title=title)
+                emit('sentence_image', ok, url if ok else None, index=idx)
+            except Exception as e:
+                logger.error("Sentence image %s failed: %s", idx, e)
+
+        def audio_task(text, language):
+            ok, url = generate_audio_file(story_id, text, speed, language=language)
+            emit('audio', ok, url if ok else None, language=language)
 
         def get_reader_layout():
             try:
-                with get_db_context() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT value FROM settings WHERE key = 'reader_layout'")
-                    row = cursor.fetchone()
-                    if row: return row['value']
+                return current_settings().reader_layout
             except Exception as e:
                 logger.error("Error reading layout: %s", e)
             return 'classic'
 
         layout = get_reader_layout()
-        
-        img_thread = None
-        sent_img_thread = None
 
+        jobs = []
         if layout == 'classic':
             logger.info("Layout is classic: Generating single cover image")
-            img_thread = threading.Thread(target=story_cover_task, args=(story_id, title, content))
-            img_thread.start()
+            jobs.append(story_cover_task)
         else:
             logger.info("Layout is step_by_step: Generating one image per sentence")
-            sent_img_thread = threading.Thread(target=all_sentence_images_task,
-                                               args=(story_id, title, sentences_for_images))
-            sent_img_thread.start()
+            jobs.extend(functools.partial(sentence_image_task, idx, sent)
+                        for idx, sent in enumerate(sentences_for_images))
 
-        generate_audio_file(story_id, full_text_en, speed, language='en')
+        jobs.append(functools.partial(audio_task, full_text_en, 'en'))
         if target_language != 'en' and full_text_translated:
-            generate_audio_file(story_id, full_text_translated, speed, language=target_language)
-        pregenerate_sentence_audio(story_id, speed)
+            jobs.append(functools.partial(audio_task, full_text_translated, target_language))
 
-        if sent_img_thread: sent_img_thread.join()
-        if img_thread: img_thread.join()
+        # 'sentence_audio' is announced once, when the last clip is written
+        segments = sentence_audio_jobs(story_id, speed)
+        if segments:
+            left = [len(segments)]
+            left_lock = threading.Lock()
+
+            def counted(segment):
+                try:
+                    segment()
+                finally:
+                    with left_lock:
+                        left[0] -= 1
+                        last = left[0] == 0
+                    if last:
+                        emit('sentence_audio')
+            jobs.extend(functools.partial(counted, segment) for segment in segments)
+        else:
+            emit('sentence_audio')
+
+        async_providers.fan_out(jobs)
         logger.info("Background asset generation finished for story %s", story_id)
     except Exception as e:
         logger.exception("Background audio/image generation failed for story %s: %s", story_id, e)
 
+def _split_sentences(content):
+    return [s.strip() + '.' for s in content.split('.') if s.strip()]
+
+def _save_story(title, content, moral, vocab, translation_data, theme, target_language, speed, pool_key=None,
+                quiz_questions=None):
+    """
+    Insert a generated story and its sentences. With pool_key the story goes
+    into the ready-story pool (hidden from the library until claimed).
+    quiz_questions from a combined generation are saved with the story, so
+    opening its quiz is a plain read.
+    Returns (story_id, full_text_en, full_text_translated, sentences_for_images)
+    for _generate_story_assets.
+    """
+    import json
+    vocab_json = json.dumps(vocab)
+    translated_title = translation_data.get('translated_title') if translation_data else None
+
+    with get_db_context() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO stories (title, content, moral, theme, difficulty_level, image_category, vocab_json, translated_title, target_language, audio_speed)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (title, content, moral, theme, 'easy', theme, vocab_json, translated_title, target_language, speed))
+        story_id = cursor.lastrowid
+        if pool_key:
+            add_pending(cursor, story_id, pool_key)
+
+        # With translation_data, use its structured sentences directly to keep the 1:1 mapping
+        if translation_data and translation_data.get('sentences'):
+            cursor.executemany('''
+                INSERT INTO story_sentences (story_id, sentence_order, sentence_text, translated_text)
+                VALUES (?, ?, ?, ?)
+            ''', [(story_id, idx, item.get('text', ''), item.get('translation', ''))
+                  for idx, item in enumerate(translation_data['sentences'])])
+        else:
+            cursor.executemany('''
+                INSERT INTO story_sentences (story_id, sentence_order, sentence_text)
+                VALUES (?, ?, ?)
+            ''', [(story_id, idx, sentence) for idx, sentence in enumerate(_split_sentences(content))])
+
+        # Too few usable questions: leave it to the quiz route, which pads with templates
+        if quiz_questions and len(quiz_questions) >= MIN_QUESTIONS:
+            save_questions(cursor, story_id, quiz_questions)
+
+    # Text/sentence lists for background asset generation
+    if translation_data and translation_data.get('sentences'):
+        sentences = translation_data['sentences']
+        full_text_en = " ".join([s['text'] for s in sentences])
+        full_text_translated = " ".join([s['translation'] for s in sentences])
+        return story_id, full_text_en, full_text_translated, [s['text'] for s in sentences]
+    return story_id, content, "", _split_sentences(content)
+
 # Kid-friendly topics for random generation
 RANDOM_TOPICS = [
     'a friendly dog','a small dog','a brown dog','a playful puppy','a brave cat','a white cat','a sleepy cat','a soft kitten',
@@ -305,7 +388,11 @@ from routes import llm
 # ... (Previous constants like ADJECTIVES, templates etc remain, just imports added above)
 
 def generate_story_content(topic, length='short', target_language='en'):
-    """Generate story content, title, and moral based on topic and length"""
+    """
+    Generate story content, title, and moral based on topic and length.
+    Returns (title, content, moral, vocab, translation_data, quiz_questions);
+    the last two are None for template stories.
+    """
     
     # Try LLM first
     try:
@@ -313,19 +400,21 @@ def generate_story_content(topic, length='short', target_language='en'):
         provider = get_llm_provider()
         print(f"DEBUG: Generating story for topic '{topic}' using provider: {provider}")
         
-        # Now passing target_language
-        llm_result = llm.generate_story_text(topic, length, target_language)
+        # Text gets part of the request budget; the rest is kept for audio and images.
+        # If it runs out, generate_story_text returns None and the templates below take over.
+        with deadline.deadline(deadline.STORY_TEXT_DEADLINE_SEC):
+            llm_result = llm.generate_story_text(topic, length, target_language)
         if llm_result:
             print("DEBUG: LLM generation successful")
-            # Unpack result (now includes translation_data)
-            if len(llm_result) == 5:
-                # (title, content, moral, vocab, translation_data)
-                return llm_result 
-            elif len(llm_result) == 4:
-                # Backwards compatibility
+            # Unpack result (now includes translation_data and the quiz)
+            if len(llm_result) == 6:
+                # (title, content, moral, vocab, translation_data, quiz_questions)
+                return llm_result
+            elif len(llm_result) == 5:
                 return (*llm_result, None)
             else:
-                 return (*llm_result, None) 
+                # Backwards compatibility
+                return (*llm_result, None, None)
         else:
             print("DEBUG: LLM generation returned None (falling back)")
     except Exception as e:
@@ -347,12 +436,13 @@ def generate_story_content(topic, length='short', target_language='en'):
     moral = generate_moral(topic)
     title = generate_story_title(topic)
     
-    # Fallback returns None for translation_data
-    return title, content, moral, {}, None
+    # Fallback returns None for translation_data and the quiz (built when the quiz is opened)
+    return title, content, moral, {}, None, None
 
 # ... (keep helper functions like is_abstract_concept, generate_moral, etc.)
 
 @bp.route('/random', methods=['POST'])
+@deadline.with_deadline(deadline.STORY_DEADLINE_SEC)
 def generate_random_story():
     """Generate a random story"""
     try:
@@ -361,6 +451,17 @@ def generate_random_story():
         speed = float(data.get('speed', 1.0)) # Speed selection
         target_language = data.get('language', 'en')
         
+        # A pre-built story for this combination answers without any generation
+        pooled = story_pool.claim(target_language, length, speed)
+        if pooled:
+            return jsonify({
+                'success': True,
+                'story_id': pooled['id'],
+                'title': pooled['title'],
+                'vocab': json.loads(pooled['vocab_json'] or '{}'),
+                'message': 'Story created! Audio and images are ready.'
+            }), 201
+
         # Pick a random topic
         topic = random.choice(RANDOM_TOPICS)
         
@@ -369,60 +470,13 @@ def generate_random_story():
         logger.info(f"DEBUG: generate_random_story called. Topic: {topic}, Lang: {target_language}")
 
         # Generate story (Refactored to get title from tuple)
-        title, content, moral, vocab, translation_data = generate_story_content(topic, length, target_language)
+        title, content, moral, vocab, translation_data, quiz_questions = generate_story_content(
+            topic, length, target_language)
         theme = determine_theme(topic)
         
-        # Save to database
-        import json
-        vocab_json = json.dumps(vocab)
-        
-        # Extract translated fields
-        translated_title = None
-        if translation_data:
-            translated_title = translation_data.get('translated_title')
-
-        with get_db_context() as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute('''
-                    INSERT INTO stories (title, content, moral, theme, difficulty_level, image_category, vocab_json, translated_title, target_language, audio_speed)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (title, content, moral, theme, 'easy', theme, vocab_json, translated_title, target_language, speed))
-            except sqlite3.OperationalError:
-                cursor.execute('''
-                    INSERT INTO stories (title, content, moral, theme, difficulty_level, image_category, vocab_json, translated_title, target_language)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (title, content, moral, theme, 'easy', theme, vocab_json, translated_title, target_language))
-            story_id = cursor.lastrowid
-            
-            # Split into sentences
-            if translation_data and translation_data.get('sentences'):
-                 sentences_data = translation_data.get('sentences')
-                 for idx, item in enumerate(sentences_data):
-                     eng_text = item.get('text', '')
-                     trans_text = item.get('translation', '')
-                     cursor.execute('''
-                        INSERT INTO story_sentences (story_id, sentence_order, sentence_text, translated_text)
-                        VALUES (?, ?, ?, ?)
-                    ''', (story_id, idx, eng_text, trans_text))
-            else:
-                sentences = [s.strip() + '.' for s in content.split('.') if s.strip()]
-                for idx, sentence in enumerate(sentences):
-                    cursor.execute('''
-                        INSERT INTO story_sentences (story_id, sentence_order, sentence_text)
-                        VALUES (?, ?, ?)
-                    ''', (story_id, idx, sentence))
-        
-        # Build text/sentence lists for background asset generation
-        full_text_en = content
-        full_text_translated = ""
-        sentences_for_images = []
-        if translation_data and translation_data.get('sentences'):
-            full_text_en = " ".join([s['text'] for s in translation_data['sentences']])
-            full_text_translated = " ".join([s['translation'] for s in translation_data['sentences']])
-            sentences_for_images = [s['text'] for s in translation_data['sentences']]
-        else:
-            sentences_for_images = [s.strip() + '.' for s in content.split('.') if s.strip()]
+        story_id, full_text_en, full_text_translated, sentences_for_images = _save_story(
+            title, content, moral, vocab, translation_data, theme, target_language, speed,
+            quiz_questions=quiz_questions)
 
         # Generate all audio and images before returning (no runtime generation)
         try:
@@ -447,7 +501,21 @@ def generate_random_story():
             'error': str(e)
         }), 500
 
+def build_pooled_story(target_language, length, speed, pool_key):
+    """Story pool builder: a full /random story whose assets exist before it can be claimed"""
+    topic = random.choice(RANDOM_TOPICS)
+    title, content, moral, vocab, translation_data, quiz_questions = generate_story_content(
+        topic, length, target_language)
+    story_id, full_text_en, full_text_translated, sentences_for_images = _save_story(
+        title, content, moral, vocab, translation_data, determine_theme(topic), target_language, speed,
+        pool_key=pool_key, quiz_questions=quiz_questions)
+    _generate_story_assets(story_id, title, content, full_text_en, full_text_translated,
+                           sentences_for_images, target_language, speed)
+    mark_ready(story_id)
+    return story_id
+
 @bp.route('/topic', methods=['POST'])
+@deadline.with_deadline(deadline.STORY_DEADLINE_SEC)
 def generate_topic_story():
     """Generate a story on a specific topic"""
     try:
@@ -469,71 +537,19 @@ def generate_topic_story():
         logger.info(f"DEBUG: generate_topic_story called. Topic: {topic}, Lang: {target_language} (Type: {type(target_language)})")
         
         # Generate story
-        # Now returns 5 items
-        title, content, moral, vocab, translation_data = generate_story_content(topic, length, target_language)
+        # Now returns 6 items (the quiz is saved with the story)
+        title, content, moral, vocab, translation_data, quiz_questions = generate_story_content(
+            topic, length, target_language)
         theme = determine_theme(topic)
         
-        # Save to database
-        import json
-        vocab_json = json.dumps(vocab)
-        
-        # Extract translated fields
-        translated_title = None
-        translated_sentences_map = {} # Order -> text
-        
         if translation_data:
             logger.info("DEBUG: Translation data found, processing...")
-            translated_title = translation_data.get('translated_title')
-            # Create a map for easy lookup by index since order matches
-            for idx, item in enumerate(translation_data.get('sentences', [])):
-                translated_sentences_map[idx] = item.get('translation', '')
         else:
              logger.info("DEBUG: No translation_data returned from generate_story_content")
 
-        with get_db_context() as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute('''
-                    INSERT INTO stories (title, content, moral, theme, difficulty_level, image_category, vocab_json, translated_title, target_language, audio_speed)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (title, content, moral, theme, 'easy', theme, vocab_json, translated_title, target_language, speed))
-            except sqlite3.OperationalError:
-                cursor.execute('''
-                    INSERT INTO stories (title, content, moral, theme, difficulty_level, image_category, vocab_json, translated_title, target_language)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (title, content, moral, theme, 'easy', theme, vocab_json, translated_title, target_language))
-            story_id = cursor.lastrowid
-            
-            # Split into sentences
-            # If we have translation_data, use the structured sentenes from it directly to ensure 1:1 mapping
-            if translation_data and translation_data.get('sentences'):
-                 sentences_data = translation_data.get('sentences')
-                 for idx, item in enumerate(sentences_data):
-                     eng_text = item.get('text', '')
-                     trans_text = item.get('translation', '')
-                     cursor.execute('''
-                        INSERT INTO story_sentences (story_id, sentence_order, sentence_text, translated_text)
-                        VALUES (?, ?, ?, ?)
-                    ''', (story_id, idx, eng_text, trans_text))
-            else:
-                # Fallback purely English
-                sentences = [s.strip() + '.' for s in content.split('.') if s.strip()]
-                for idx, sentence in enumerate(sentences):
-                    cursor.execute('''
-                        INSERT INTO story_sentences (story_id, sentence_order, sentence_text)
-                        VALUES (?, ?, ?)
-                    ''', (story_id, idx, sentence))
-        
-        # Build text/sentence lists for background asset generation
-        full_text_en = content
-        full_text_translated = ""
-        sentences_for_images = []
-        if translation_data and translation_data.get('sentences'):
-            full_text_en = " ".join([s['text'] for s in translation_data['sentences']])
-            full_text_translated = " ".join([s['translation'] for s in translation_data['sentences']])
-            sentences_for_images = [s['text'] for s in translation_data['sentences']]
-        else:
-            sentences_for_images = [s.strip() + '.' for s in content.split('.') if s.strip()]
+        story_id, full_text_en, full_text_translated, sentences_for_images = _save_story(
+            title, content, moral, vocab, translation_data, theme, target_language, speed,
+            quiz_questions=quiz_questions)
 
         # Generate all audio and images before returning (no runtime generation)
         try:
@@ -557,6 +573,110 @@ def generate_topic_story():
             'error': str(e)
         }), 500
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@bp.route('/topic/stream', methods=['GET', 'POST'])
+def stream_topic_story():
+    """
+    Server-Sent Events variant of /topic. Emits `title`, then a `sentence` per
+    sentence as the provider streams it, `meta` (moral, vocab), `saved`
+    (story_id), an `asset` event as each audio/image file is ready, and
+    finally `done` - or `error`. Accepts a JSON body or query parameters.
+    """
+    data = request.get_json(silent=True) or request.args
+    topic = (data.get('topic') or '').strip()
+    length = data.get('length', 'short')
+    target_language = data.get('language', 'en')
+    try:
+        speed = float(data.get('speed', 1.0))
+    except (TypeError, ValueError):
+        speed = 1.0
+
+    if not topic:
+        return jsonify({
+            'success': False,
+            'error': 'Topic is required'
+        }), 400
+
+    def generate():
+        with deadline.deadline(deadline.STORY_DEADLINE_SEC):
+            yield from generate_events()
+
+    def generate_events():
+        try:
+            sentence_count = 0
+            result = None
+
+            # Only the English TITLE:/CONTENT: format can be parsed as it streams
+            events = llm.stream_story_text(topic, length) if target_language == 'en' else None
+            if events is not None:
+                for kind, value in events:
+                    if kind == 'title':
+                        yield _sse('title', {'title': value})
+                    elif kind == 'sentence':
+                        yield _sse('sentence', {'index': sentence_count, 'text': value})
+                        sentence_count += 1
+                    elif kind == 'result':
+                        result = value
+
+            if result is None:
+                # Non-streaming provider, bilingual JSON or a failed stream: generate in one go
+                result = generate_story_content(topic, length, target_language)
+                title, content, _, _, translation_data, _ = result
+                yield _sse('title', {'title': title})
+                if translation_data and translation_data.get('sentences'):
+                    for idx, item in enumerate(translation_data['sentences']):
+                        yield _sse('sentence', {'index': idx, 'text': item.get('text', ''),
+                                                'translation': item.get('translation', '')})
+                else:
+                    for idx, sentence in enumerate(_split_sentences(content)):
+                        yield _sse('sentence', {'index': idx, 'text': sentence})
+
+            title, content, moral, vocab, translation_data, quiz_questions = result
+            yield _sse('meta', {
+                'moral': moral,
+                'vocab': vocab,
+                'translated_title': translation_data.get('translated_title') if translation_data else None
+            })
+
+            story_id, full_text_en, full_text_translated, sentences_for_images = _save_story(
+                title, content, moral, vocab, translation_data, determine_theme(topic), target_language, speed,
+                quiz_questions=quiz_questions)
+            yield _sse('saved', {'story_id': story_id})
+
+            # Assets are produced on a worker thread; forward its events as they arrive
+            asset_events = queue.Queue()
+
+            def run_assets():
+                try:
+                    _generate_story_assets(story_id, title, content, full_text_en, full_text_translated,
+                                           sentences_for_images, target_language, speed,
+                                           on_event=lambda name, payload: asset_events.put((name, payload)))
+                finally:
+                    asset_events.put(None)
+
+            threading.Thread(target=deadline.propagate(run_assets), daemon=True).start()
+            while True:
+                item = asset_events.get()
+                if item is None:
+                    break
+                yield _sse(*item)
+
+            yield _sse('done', {
+                'success': True,
+                'story_id': story_id,
+                'title': title,
+                'vocab': vocab,
+                'message': 'Story created! Audio and images are ready.'
+            })
+        except Exception as e:
+            logger.exception("Streaming story generation failed for topic %s", topic)
+            yield _sse('error', {'success': False, 'error': str(e)})
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 def generate_concept_story(concept, length='short'):
     """Generate educational story about a concept like good manners, kindness, etc."""
     character = create_character_name(concept)
@@ -0,0 +1,111 @@
+"""
+Hedged LLM Requests
+Race providers for one answer: start the preferred provider, start the next
+one if no valid answer has arrived after a p95-ish delay (or as soon as one
+fails), and return the first response that parses. Losers are left to finish
+in the background; their results are ignored.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from routes import deadline as request_deadline
+
+logger = logging.getLogger(__name__)
+
+# Launch the next provider if nothing valid arrived within this many seconds
+HEDGE_DELAY_SEC = float(os.getenv('LLM_HEDGE_DELAY_SEC', 4.0))
+# Per-call budget: calls in flight at once, and calls started in total
+HEDGE_MAX_PARALLEL = int(os.getenv('LLM_HEDGE_MAX_PARALLEL', 2))
+HEDGE_MAX_ATTEMPTS = int(os.getenv('LLM_HEDGE_MAX_ATTEMPTS', 3))
+HEDGE_TIMEOUT_SEC = float(os.getenv('LLM_HEDGE_TIMEOUT_SEC', 60))
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv('LLM_HEDGE_WORKERS', 8)),
+                               thread_name_prefix='llm-hedge')
+_stats_lock = threading.Lock()
+stats = {'calls': 0, 'attempts': 0, 'hedges': 0, 'failovers': 0, 'wins_first': 0, 'wins_hedged': 0,
+         'exhausted': 0, 'timeouts': 0}
+
+
+def _count(**deltas):
+    with _stats_lock:
+        for name, delta in deltas.items():
+            stats[name] += delta
+
+
+def hedged_first(candidates, parse, delay=HEDGE_DELAY_SEC, max_parallel=HEDGE_MAX_PARALLEL,
+                 max_attempts=HEDGE_MAX_ATTEMPTS, timeout=HEDGE_TIMEOUT_SEC):
+    """
+    candidates: ordered list of (name, fn); fn() returns raw provider text.
+    parse(text) returns the parsed value, or None if the answer is unusable.
+    Returns (name, value) for the first valid answer, or (None, None).
+    max_parallel=1 turns this into plain sequential failover.
+    """
+    queue = list(candidates)[:max(1, max_attempts)]
+    if not queue:
+        return None, None
+
+    _count(calls=1)
+    pending = {}
+    started = 0
+    # Never wait past the request's own deadline
+    left = request_deadline.remaining()
+    if left is not None:
+        timeout = max(0.0, min(timeout, left))
+    deadline = time.monotonic() + timeout
+
+    def launch(reason):
+        nonlocal started
+        name, fn = queue.pop(0)
+        # Workers inherit the request deadline so the provider call is bounded by it
+        pending[_executor.submit(request_deadline.propagate(fn))] = (name, started)
+        started += 1
+        _count(attempts=1, **({reason: 1} if reason else {}))
+        if reason:
+            logger.info(f"LLM hedge: starting {name} ({reason})")
+
+    launch(None)
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            _count(timeouts=1)
+            logger.warning(f"LLM hedge: no valid answer within {timeout}s")
+            break
+        done, _ = wait(pending, timeout=min(delay, remaining), return_when=FIRST_COMPLETED)
+
+        if not done:
+            # Slow, not failed: hedge with the next provider if the budget allows
+            if queue and len(pending) < max_parallel:
+                launch('hedges')
+            continue
+
+        for future in done:
+            name, position = pending.pop(future)
+            try:
+                value = parse(future.result())
+            except Exception as e:
+                logger.warning(f"LLM hedge: {name} failed: {e}")
+                value = None
+            if value is not None:
+                for loser in pending:
+                    loser.cancel()
+                _count(**{'wins_first' if position == 0 else 'wins_hedged': 1})
+                return name, value
+            if queue:
+                launch('failovers')
+
+    for loser in pending:
+        loser.cancel()
+    if not pending:
+        _count(exhausted=1)
+    return None, None
+
+
+def snapshot():
+    with _stats_lock:
+        current = dict(stats)
+    current.update(delay_sec=HEDGE_DELAY_SEC, max_parallel=HEDGE_MAX_PARALLEL, max_attempts=HEDGE_MAX_ATTEMPTS)
+    return current
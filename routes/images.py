@@ -1,11 +1,14 @@
 
 import os
-import requests
 import json
 import base64
 from flask import Blueprint, jsonify, request
 from database import get_db_context
 from routes.llm import get_llm_provider
+from routes.llm_clients import openai_client, http_session
+from routes.provider_router import router
+from routes import deadline
+from routes import async_providers
 
 bp = Blueprint('images', __name__, url_prefix='/api/images')
 
@@ -49,7 +52,7 @@ def generate_image_google(prompt, output_path):
     # NOTE: The public API for Imagen might not be enabled for all keys. 
     # If this fails, we will fallback to OpenAI.
     
-    response = requests.post(url, headers=headers, json=data)
+    response = http_session().post(url, headers=headers, json=data, timeout=deadline.timeout())
     
     if response.status_code == 200:
         result = response.json()
@@ -68,8 +71,7 @@ def generate_image_google(prompt, output_path):
         raise Exception(f"Google Image API Error: {response.status_code}")
 
 def generate_image_openai(prompt, output_path):
-    from openai import OpenAI
-    client = OpenAI() # Uses env var
+    client = openai_client().with_options(timeout=deadline.seconds()) # Uses env var
     
     response = client.images.generate(
         model="dall-e-3",
@@ -81,13 +83,12 @@ def generate_image_openai(prompt, output_path):
     
     image_url = response.data[0].url
     # Download
-    img_data = requests.get(image_url).content
+    img_data = http_session().get(image_url, timeout=deadline.timeout()).content
     with open(output_path, 'wb') as f:
         f.write(img_data)
     return True
 
 def generate_image_hf(prompt, output_path):
-    import requests
     import os
     
     api_url = "https://router.huggingface.co/hf-inference/models/black-forest-labs/FLUX.1-schnell"
@@ -100,10 +101,10 @@ def generate_image_hf(prompt, output_path):
     # Since this is an image model, the prompt helps shape the style.
     full_prompt = f"Children's story book illustration, gentle, colorful, simple: {prompt}"
     
-    response = requests.post(api_url, headers=headers, json={"inputs": full_prompt})
+    # httpx on the shared provider loop; the file is written only on success
+    response = async_providers.run(
+        async_providers.http_post_to_file(api_url, output_path, headers=headers, json={"inputs": full_prompt}))
     if response.status_code == 200:
-        with open(output_path, 'wb') as f:
-            f.write(response.content)
         return True
     else:
         # Check for model loading error
@@ -127,8 +128,7 @@ def _sentence_image_prompt(scene_text, story_title=None):
 
 def generate_sentence_image_openai(prompt, output_path, story_title=None):
     """Cost-saving: DALL-E 2, small size. Prompt preserves story context and characters."""
-    from openai import OpenAI
-    client = OpenAI()
+    client = openai_client().with_options(timeout=deadline.seconds())
     full_prompt = _sentence_image_prompt(prompt, story_title) if story_title else f"Simple children's book illustration, gentle, colorful. Same characters throughout. Scene: {prompt[:150]}"
     response = client.images.generate(
         model="dall-e-2",
@@ -137,7 +137,7 @@ def generate_sentence_image_openai(prompt, output_path, story_title=None):
         n=1,
     )
     image_url = response.data[0].url
-    img_data = requests.get(image_url).content
+    img_data = http_session().get(image_url, timeout=deadline.timeout()).content
     with open(output_path, 'wb') as f:
         f.write(img_data)
     return True
@@ -157,17 +157,18 @@ def generate_and_save_sentence_image(story_id, sentence_order, prompt, story_tit
         if os.path.exists(filepath):
             return True, public_url
 
-        provider = get_llm_provider()
+        provider, _ = get_llm_provider()
         
         # 0. Try Hugging Face first if TinyStories
-        if provider == 'tinystories':
+        if provider == 'tinystories' and router.allow('hf_image'):
             try:
                 # Add context for HF prompt
                 hf_prompt = prompt
                 if story_title:
                     hf_prompt = f"Scene from {story_title}: {prompt}"
                 print(f"Attempting HF FLUX.1-schnell for Sentence {sentence_order}...")
-                generate_image_hf(hf_prompt, filepath)
+                with router.attempt('hf_image'):
+                    generate_image_hf(hf_prompt, filepath)
                 return True, public_url
             except Exception as e:
                 print(f"HF Sentence Image Gen failed: {e}")
@@ -176,9 +177,12 @@ def generate_and_save_sentence_image(story_id, sentence_order, prompt, story_tit
         openai_key = os.environ.get('OPENAI_API_KEY')
         if not openai_key or 'sk-' not in openai_key:
             return False, 'OpenAI API key required for sentence images if not using HF.'
+        if not router.allow('openai_image'):
+            return False, 'OpenAI image generation is temporarily unavailable (circuit open).'
 
         try:
-            generate_sentence_image_openai(prompt, filepath, story_title=story_title)
+            with router.attempt('openai_image'):
+                generate_sentence_image_openai(prompt, filepath, story_title=story_title)
             return True, public_url
         except Exception as e:
             print(f"Sentence image gen failed: {e}")
@@ -203,40 +207,33 @@ def generate_and_save_image(story_id, prompt):
         if os.path.exists(filepath):
              return True, public_url
         
-        # Priority: Check if OpenAI is available (more reliable for images currently)
-        # Google Imagen is often gated.
-        from openai import OpenAI
+        # Priority: OpenAI (more reliable for images currently), then Google Imagen,
+        # which is often gated. TinyStories tries Hugging Face FLUX first.
         openai_key = os.environ.get('OPENAI_API_KEY')
-        
-        success = False
-        provider = get_llm_provider()
-        
-        # 0. If TinyStories, Try Hugging Face model first
+        provider, _ = get_llm_provider()
+        candidates = []
         if provider == 'tinystories':
-             try:
-                 print(f"Attempting HF FLUX.1-schnell for Story {story_id}...")
-                 generate_image_hf(prompt, filepath)
-                 success = True
-             except Exception as e:
-                 print(f"HF Image Failed: {e}")
-        
-        # 1. Try OpenAI DALL-E 3 first if key exists AND (not successful yet)
-        if not success and openai_key and 'sk-' in openai_key:
-             try:
-                 print(f"Attempting OpenAI Image Gen for Story {story_id}...")
-                 generate_image_openai(prompt, filepath)
-                 success = True
-             except Exception as e:
-                 print(f"OpenAI Failed: {e}")
-                 
-        # 2. If OpenAI failed or no key, try Google Imagen
-        if not success:
-             try:
-                 print(f"Attempting Google Imagen for Story {story_id}...")
-                 generate_image_google(prompt, filepath)
-                 success = True
-             except Exception as e:
-                 print(f"Google Imagen Failed: {e}")
+            candidates.append(('hf_image', 'HF FLUX.1-schnell', generate_image_hf))
+        if openai_key and 'sk-' in openai_key:
+            candidates.append(('openai_image', 'OpenAI Image Gen', generate_image_openai))
+        candidates.append(('imagen', 'Google Imagen', generate_image_google))
+
+        # Providers whose circuit is open are tried last, and only once cooled down
+        generators = {name: (label, fn) for name, label, fn in candidates}
+        success = False
+        for name in router.order([name for name, _, _ in candidates]):
+            label, generate_fn = generators[name]
+            if not router.allow(name):
+                print(f"Skipping {label}: circuit open")
+                continue
+            try:
+                print(f"Attempting {label} for Story {story_id}...")
+                with router.attempt(name):
+                    generate_fn(prompt, filepath)
+                success = True
+                break
+            except Exception as e:
+                print(f"{label} Failed: {e}")
                  
         if success:
             # Update DB (Connection logic needs to be careful in threads, use new connection)
@@ -254,6 +251,7 @@ def generate_and_save_image(story_id, prompt):
         return False, str(e)
 
 @bp.route('/generate', methods=['POST'])
+@deadline.with_deadline(deadline.INTERACTIVE_DEADLINE_SEC)
 def generate_story_image():
     try:
         data = request.json
@@ -275,6 +273,7 @@ def generate_story_image():
 
 
 @bp.route('/generate-sentence', methods=['POST'])
+@deadline.with_deadline(deadline.INTERACTIVE_DEADLINE_SEC)
 def generate_sentence_image():
     """Generate one basic (cost-saving) image for a sentence. story_title keeps characters consistent."""
     try:
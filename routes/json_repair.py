@@ -0,0 +1,369 @@
+"""
+Tolerant JSON Parsing for LLM Output
+A character-level scanner that pulls the first JSON object/array out of a
+response and repairs the usual damage on the way: code fences and chatter
+around it, // and /* */ comments, trailing or missing commas, raw newlines
+inside strings, and truncation (the open string is closed, a cut-off scalar
+or a key without its value becomes null, and the open brackets are closed).
+The scanner can be fed chunk by chunk. Brackets in the chatter ("[see
+below]") are skipped by rescanning from the next opening bracket when a
+candidate does not parse, is not the expected type, or only parses by
+quoting bare words. validate_items then keeps only the list entries that have the shape
+the caller needs, so a partly broken answer is still usable.
+"""
+
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_CLOSERS = {'{': '}', '[': ']'}
+_NUMBER_RE = re.compile(r'-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?$')
+# Python-style literals some models emit
+_LITERALS = {'true': 'true', 'false': 'false', 'null': 'null', 'True': 'true', 'False': 'false', 'None': 'null'}
+# A number cut off mid-way: "-", "1.", "2e", "2e+"
+_PARTIAL_NUMBER_RE = re.compile(r'-?(0|[1-9]\d*)?(\.\d*)?([eE][+-]?\d*)?$')
+# Start positions tried before giving up on a response
+MAX_CANDIDATES = 8
+
+
+class JSONRepairer:
+    """Incremental scanner: feed() chunks, then result() for the repaired value (or None)"""
+
+    def __init__(self, openers='{['):
+        self._openers = openers
+        self.junk = False           # bare words were quoted to make the text parse
+        self._out = []
+        self._stack = []
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._token = None          # start index in _out of a bare number/literal
+        self._expect_key = False
+        self._after_value = False
+        self._pending_key = False   # a key has been read but its value has not started
+        self._comment = None        # '//' or '/*' while skipping a comment
+        self._slash = False         # a '/' that may open a comment
+        self._star = False          # a '*' that may close a block comment
+        # Where the text could be cut and closed cleanly: (len(_out), stack)
+        self._safe = (0, [])
+
+    def feed(self, chunk):
+        for ch in chunk:
+            if self._done:
+                return
+            self._step(ch)
+
+    def _mark_safe(self):
+        self._safe = (len(self._out), list(self._stack))
+
+    def _step(self, ch):
+        if self._in_string:
+            self._string_char(ch)
+            return
+        if self._comment:
+            self._comment_char(ch)
+            return
+        if not self._started:
+            # Skip fences and chatter up to the first opening bracket
+            if ch in self._openers:
+                self._started = True
+                self._open(ch)
+            return
+        if self._slash:
+            self._slash = False
+            if ch == '/':
+                self._comment = '//'
+                return
+            if ch == '*':
+                self._comment = '/*'
+                return
+        if ch == '/':
+            self._finish_token()
+            self._slash = True
+            return
+
+        if ch in ' \t\r\n':
+            self._finish_token()
+        elif ch in _CLOSERS:
+            self._finish_token()
+            self._value_start()
+            self._open(ch)
+        elif ch in '}]':
+            self._finish_token()
+            self._close(ch)
+        elif ch == ',':
+            self._finish_token()
+            # Drop doubled commas and commas right after an opening bracket
+            if self._out and self._out[-1] not in '{[,':
+                self._out.append(',')
+            self._expect_key = bool(self._stack) and self._stack[-1] == '{'
+            self._after_value = False
+        elif ch == ':':
+            self._finish_token()
+            self._out.append(':')
+            self._expect_key = False
+            self._after_value = False
+        elif ch == '"':
+            self._finish_token()
+            self._value_start()
+            self._in_string = True
+            self._string_is_key = self._expect_key
+            if not self._string_is_key:
+                self._pending_key = False
+            self._out.append('"')
+        elif self._token is None:
+            self._value_start()
+            self._pending_key = False
+            self._token = len(self._out)
+            self._out.append(ch)
+        else:
+            self._out.append(ch)
+
+    def _value_start(self):
+        # Two values in a row: the model forgot a comma
+        if self._after_value:
+            self._out.append(',')
+            self._after_value = False
+            self._expect_key = self._stack[-1] == '{'
+
+    def _open(self, ch):
+        self._pending_key = False
+        self._stack.append(ch)
+        self._out.append(ch)
+        self._expect_key = ch == '{'
+        self._after_value = False
+        self._mark_safe()
+
+    def _close(self, ch):
+        if not self._stack:
+            return
+        # A mismatched closer still closes the innermost container
+        while self._out and self._out[-1] == ',':
+            self._out.pop()
+        if self._out and self._out[-1] == ':':
+            self._out.pop()
+            self._drop_dangling_key()
+        elif self._pending_key:
+            self._drop_dangling_key()
+        self._pending_key = False
+        self._out.append(_CLOSERS[self._stack.pop()])
+        self._value_end()
+
+    def _drop_dangling_key(self):
+        """Remove a "key" whose value never came (the colon is already gone)"""
+        if self._out and self._out[-1] == '"':
+            start = len(self._out) - 2
+            while start >= 0 and not (self._out[start] == '"' and (start == 0 or self._out[start - 1] != '\\')):
+                start -= 1
+            del self._out[max(start, 0):]
+            if self._out and self._out[-1] == ',':
+                self._out.pop()
+
+    def _value_end(self):
+        self._after_value = True
+        self._expect_key = False
+        if not self._stack:
+            self._done = True
+        self._mark_safe()
+
+    def _finish_token(self):
+        if self._token is None:
+            return
+        text = ''.join(self._out[self._token:])
+        del self._out[self._token:]
+        self._token = None
+        if text in _LITERALS:
+            self._out.append(_LITERALS[text])
+        elif _NUMBER_RE.match(text):
+            self._out.append(text)
+        else:
+            # Unquoted junk: keep it as a string rather than fail the whole parse
+            self.junk = True
+            self._out.append(json.dumps(text))
+        self._value_end()
+
+    def _string_char(self, ch):
+        if self._escape:
+            self._out.append(ch)
+            self._escape = False
+        elif ch == '\\':
+            self._out.append(ch)
+            self._escape = True
+        elif ch == '"':
+            self._out.append('"')
+            self._in_string = False
+            if self._string_is_key:
+                self._after_value = False
+                self._pending_key = True
+            else:
+                self._value_end()
+        elif ch == '\n':
+            self._out.append('\\n')
+        elif ch == '\r':
+            self._out.append('\\r')
+        elif ch == '\t':
+            self._out.append('\\t')
+        elif ord(ch) < 0x20:
+            self._out.append(f'\\u{ord(ch):04x}')
+        else:
+            self._out.append(ch)
+
+    def _comment_char(self, ch):
+        if self._comment == '//':
+            if ch == '\n':
+                self._comment = None
+        elif self._star and ch == '/':
+            self._comment = None
+            self._star = False
+        else:
+            self._star = ch == '*'
+
+    def repaired(self):
+        """The repaired JSON text so far, closed as if the input ended here; None if no bracket was seen"""
+        if not self._started:
+            return None
+        if self._done:
+            return ''.join(self._out)
+
+        out, stack = list(self._out), list(self._stack)
+        complete = True
+        if self._in_string:
+            if self._string_is_key:
+                complete = False
+            else:
+                # Truncated inside a value: keep what arrived
+                if self._escape:
+                    out.pop()
+                out.append('"')
+        elif self._token is not None:
+            token = ''.join(out[self._token:])
+            if token in _LITERALS or _NUMBER_RE.match(token):
+                out[self._token:] = [_LITERALS.get(token, token)]
+            else:
+                # Cut off mid-scalar: keep the key, with no value
+                if not (_PARTIAL_NUMBER_RE.match(token) or any(lit.startswith(token) for lit in _LITERALS)):
+                    self.junk = True
+                out[self._token:] = ['null']
+        elif self._pending_key:
+            # A key without its value
+            if out[-1] != ':':
+                out.append(':')
+            out.append('null')
+
+        if not complete:
+            out, stack = out[:self._safe[0]], list(self._safe[1])
+        while out and out[-1] == ',':
+            out = out[:-1]
+        return ''.join(out) + ''.join(_CLOSERS[c] for c in reversed(stack))
+
+    def result(self):
+        text = self.repaired()
+        if text is None:
+            return None
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            logger.warning(f"JSON repair could not recover the response: {e}")
+            return None
+
+
+def _openers(expect):
+    types = expect if isinstance(expect, tuple) else (expect,)
+    return ''.join(ch for ch, t in (('{', dict), ('[', list)) if t in types) or '{['
+
+
+def _scan(text, expect):
+    """
+    (repairer, value) for the first `expect` value in text. Each opening
+    bracket is tried in turn; a value that only parsed by quoting bare words
+    is kept as a fallback in case no cleaner one follows.
+    """
+    openers = _openers(expect)
+    fallback = (None, None)
+    pos = 0
+    for _ in range(MAX_CANDIDATES):
+        starts = [i for i in (text.find(ch, pos) for ch in openers) if i >= 0]
+        if not starts:
+            break
+        start = min(starts)
+        repairer = JSONRepairer(openers)
+        repairer.feed(text[start:])
+        value = repairer.result()
+        if isinstance(value, expect):
+            if not repairer.junk:
+                return repairer, value
+            if fallback[0] is None:
+                fallback = (repairer, value)
+        pos = start + 1
+    return fallback
+
+
+def repair_json(text, expect=dict):
+    """Repaired JSON text for the first `expect` value in text (an object by default), or None"""
+    repairer, _ = _scan(text or '', expect)
+    return repairer.repaired() if repairer else None
+
+
+def parse_json(text, expect=dict):
+    """First JSON value in an LLM response, repaired; None unless it is an `expect`"""
+    if not text:
+        return None
+    return _scan(text, expect)[1]
+
+
+def _has_text(item, key):
+    value = item.get(key)
+    return isinstance(value, str) and value.strip() != ''
+
+
+def _choice_item(answer_key, text_key):
+    def check(item):
+        options = item.get('options')
+        return (_has_text(item, text_key) and _has_text(item, answer_key)
+                and isinstance(options, list) and len(options) >= 2 and item[answer_key] in options)
+    return check
+
+
+# Item checks for the list fields the prompts ask for
+SHAPES = {
+    'sentences': lambda item: _has_text(item, 'text') and isinstance(item.get('translation'), str),
+    'mcqs': _choice_item('correct_answer', 'question'),
+    'moral_questions': _choice_item('correct_answer', 'question'),
+    'questions': _choice_item('correct_answer', 'question'),
+    'fill_in_blanks': _choice_item('answer', 'sentence'),
+    'vocab': lambda item: _has_text(item, 'word') and _has_text(item, 'meaning'),
+}
+
+
+def validate_items(data, field):
+    """Keep the well-formed entries of data[field] (in place); returns them"""
+    items = data.get(field)
+    if not isinstance(items, list):
+        if field in data:
+            data[field] = []
+        return []
+    check = SHAPES[field]
+    valid = [item for item in items if isinstance(item, dict) and check(item)]
+    if len(valid) != len(items):
+        logger.info(f"JSON repair: kept {len(valid)} of {len(items)} {field}")
+    data[field] = valid
+    return valid
+
+
+def parse_llm_json(text, lists=(), required=()):
+    """
+    parse_json for a dict, then validate_items for each of `lists`. Returns
+    None if any `required` list ends up empty, so the caller can try
+    another provider only when the answer is really unusable.
+    """
+    data = parse_json(text)
+    if data is None:
+        return None
+    for field in lists:
+        if not validate_items(data, field) and field in required:
+            return None
+    return data
@@ -4,51 +4,52 @@ Handles interaction with Gemini, OpenAI, etc.
 """
 
 import os
+import functools
 from flask import current_app
-from database import get_db_context
+from routes.settings import current_settings
+from routes.llm_clients import gemini_client, openai_client, abacus_client, http_session
+from routes.llm_cache import cached, TTL_METADATA, TTL_TINYSTORIES
+from routes.hedging import hedged_first
+from routes.provider_router import router, routed
+from routes import deadline
+from routes import tinystories_engine
+from routes.json_repair import parse_llm_json
+from routes import llm_telemetry
+from routes.llm_telemetry import metered, metered_stream
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Global variable to cache the local model in memory
-tinystories_pipe = None
-
 def get_tinystories():
-    global tinystories_pipe
-    if tinystories_pipe is None:
-        # Check if we should use Cloud Fallback (recommended for Python 3.14 stability)
-        if os.environ.get('USE_CLOUD_TINYSTORIES', 'true').lower() == 'true':
-            print("Using Cloud TinyStories (Gemini/OpenAI) for better stability.")
-            tinystories_pipe = CloudTinyStories()
-            return tinystories_pipe
+    """
+    The local TinyStories engine once it is loaded and warmed up. Until then
+    (or when USE_CLOUD_TINYSTORIES is on) the cloud stand-in, so no request
+    ever waits for the model to load.
+    """
+    if not tinystories_engine.LOCAL_ENABLED:
+        return CloudTinyStories()
 
-        try:
-            # ONLY attempt local import if Cloud Fallback is disabled
-            from transformers import pipeline
-            print("Loading TinyStories-33M locally...")
-            tinystories_pipe = pipeline("text-generation", model="roneneldan/TinyStories-33M", device="cpu")
-            print("TinyStories-33M loaded successfully.")
-        except Exception as e:
-            print(f"Failed to load local TinyStories: {e}. Falling back to Cloud version.")
-            tinystories_pipe = CloudTinyStories()
-    return tinystories_pipe
+    engine = tinystories_engine.engine
+    if not engine.ready:
+        if engine.start():
+            print("TinyStories-33M not preloaded; loading in the background, using Cloud TinyStories meanwhile.")
+        return CloudTinyStories()
+    return engine
 
 class CloudTinyStories:
     """Mock pipe that uses Cloud LLM but mimics the TinyStories API"""
+    @llm_telemetry.call_site(llm_telemetry.CLOUD_TINYSTORIES)
     def __call__(self, prompt, max_new_tokens=400, **kwargs):
         print(f"CloudTinyStories generating for prompt: {prompt}")
         system_prompt = "You are a TinyStories model. Generate a very simple, short story for a 3-5 year old child. Keep it extremely simple, like the TinyStories dataset (basic vocabulary, simple sentences). Output only the story text, starting with the prompt provided."
         
         # Use existing cloud generation
         story_text = ""
-        key = os.environ.get('GOOGLE_API_KEY')
-        if key:
-            story_text = generate_with_gemini(system_prompt, prompt, key)
-        
-        if not story_text:
-            key = os.environ.get('OPENAI_API_KEY')
-            if key:
-                story_text = generate_with_openai(system_prompt, prompt, key)
+        for name in configured_providers(candidates=['gemini', 'openai']):
+            generate_fn, key = provider_generator(name)
+            story_text = generate_fn(system_prompt, prompt, key, cache_ttl=TTL_TINYSTORIES)
+            if story_text:
+                break
                 
         if not story_text:
             story_text = prompt + " woke up feeling very happy. It was a beautiful sunny day outside. They went to the park and had a wonderful time playing with friends."
@@ -62,15 +63,7 @@ class CloudTinyStories:
 def get_llm_provider():
     """Get current LLM provider from settings. Returns (provider, model) or (provider, None)"""
     try:
-        with get_db_context() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT value FROM settings WHERE key='llm_provider'")
-            result = cursor.fetchone()
-            val = result[0] if result else 'default'
-            if ':' in val:
-                parts = val.split(':', 1)
-                return parts[0], parts[1]
-            return val, None
+        return current_settings().llm
     except Exception as e:
         print(f"Error getting LLM provider: {e}")
         return 'default', None
@@ -78,14 +71,26 @@ def get_llm_provider():
 def get_story_tone():
     """Get story tone from settings"""
     try:
-        with get_db_context() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT value FROM settings WHERE key='story_tone'")
-            result = cursor.fetchone()
-            return result[0] if result else 'default'
+        return current_settings().story_tone
     except:
         return 'default'
 
+# Fallback order for Gemini when no model is pinned
+GEMINI_MODELS = ['gemini-2.0-flash', 'gemini-1.5-flash', 'gemini-1.5-pro']
+
+def _gemini_http_options(genai):
+    # google-genai takes its timeout in milliseconds
+    return genai.types.HttpOptions(timeout=int(deadline.seconds() * 1000))
+
+def _report_gemini_usage(model_name, response):
+    usage = getattr(response, 'usage_metadata', None)
+    llm_telemetry.report(model=model_name,
+                         prompt_tokens=getattr(usage, 'prompt_token_count', None),
+                         completion_tokens=getattr(usage, 'candidates_token_count', None))
+
+@cached('gemini')
+@routed('gemini')
+@metered('gemini')
 def generate_with_gemini(system_prompt, user_prompt, api_key, model_id=None):
     try:
         from google import genai
@@ -94,35 +99,44 @@ def generate_with_gemini(system_prompt, user_prompt, api_key, model_id=None):
         return None
         
     try:    
-        client = genai.Client(api_key=api_key)
+        client = gemini_client(api_key)
     except Exception as e:
         print(f"DEBUG: Failed to initialize Gemini Client: {e}")
         return None
     
-    # List of models to try in order of preference if model_id is None
-    models_to_try = [model_id] if model_id else [
-        'gemini-2.0-flash',
-        'gemini-1.5-flash',
-        'gemini-1.5-pro'
-    ]
+    # The model that last worked goes first; models with an open circuit are skipped
+    models_to_try = [model_id] if model_id else router.model_order('gemini', GEMINI_MODELS)
     
     for model_name in [m for m in models_to_try if m]:
+        if deadline.expired():
+            print("DEBUG: Skipping remaining Gemini models: request deadline exceeded")
+            break
+        if not router.allow('gemini', model_name):
+            print(f"DEBUG: Skipping {model_name}: circuit open")
+            continue
         try:
             print(f"DEBUG: Attempting generation with model: {model_name}")
             
             # Check if JSON generation is requested based on system prompt content
-            config = None
+            mime_type = None
             if "VALID JSON" in system_prompt or "JSON Schema" in system_prompt:
+                mime_type = "application/json"
+                
+            # Everything after allow() runs inside attempt(), so a half-open probe is always recorded
+            with router.attempt('gemini', model_name) as call:
                 config = genai.types.GenerateContentConfig(
-                    response_mime_type="application/json"
+                    response_mime_type=mime_type,
+                    http_options=_gemini_http_options(genai)
                 )
-                
-            response = client.models.generate_content(
-                model=model_name,
-                contents=f"{system_prompt}\n\nTask: {user_prompt}",
-                config=config
-            )
-            return response.text
+                response = client.models.generate_content(
+                    model=model_name,
+                    contents=f"{system_prompt}\n\nTask: {user_prompt}",
+                    config=config
+                )
+                call.ok = bool(response.text)
+            _report_gemini_usage(model_name, response)
+            if response.text:
+                return response.text
         except Exception as e:
             print(f"DEBUG: Failed with {model_name}: {e}")
             continue
@@ -130,10 +144,12 @@ def generate_with_gemini(system_prompt, user_prompt, api_key, model_id=None):
     print("DEBUG: All Gemini models failed.")
     return None
 
+@cached('openai')
+@routed('openai')
+@metered('openai')
 def generate_with_openai(system_prompt, user_prompt, api_key, model_id=None):
     try:
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
+        client = openai_client(api_key).with_options(timeout=deadline.seconds())
         completion = client.chat.completions.create(
             model=model_id if model_id else "gpt-4o-mini",
             messages=[
@@ -141,6 +157,10 @@ def generate_with_openai(system_prompt, user_prompt, api_key, model_id=None):
                 {"role": "user", "content": user_prompt}
             ]
         )
+        usage = completion.usage
+        llm_telemetry.report(model=model_id or "gpt-4o-mini",
+                             prompt_tokens=usage.prompt_tokens if usage else None,
+                             completion_tokens=usage.completion_tokens if usage else None)
         return completion.choices[0].message.content
     except ImportError:
         return None
@@ -148,9 +168,11 @@ def generate_with_openai(system_prompt, user_prompt, api_key, model_id=None):
         print(f"OpenAI Error: {e}")
         return None
 
+@cached('groq')
+@routed('groq')
+@metered('groq')
 def generate_with_groq(system_prompt, user_prompt, api_key, model_id=None):
     try:
-        import requests
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
@@ -163,23 +185,33 @@ def generate_with_groq(system_prompt, user_prompt, api_key, model_id=None):
             ],
             "temperature": 0.7
         }
-        res = requests.post("https://api.groq.com/openai/v1/chat/completions", headers=headers, json=payload)
+        res = http_session().post("https://api.groq.com/openai/v1/chat/completions", headers=headers, json=payload,
+                                  timeout=deadline.timeout())
         res.raise_for_status()
-        return res.json()["choices"][0]["message"]["content"]
+        body = res.json()
+        usage = body.get("usage") or {}
+        llm_telemetry.report(model=payload["model"], prompt_tokens=usage.get("prompt_tokens"),
+                             completion_tokens=usage.get("completion_tokens"))
+        return body["choices"][0]["message"]["content"]
     except Exception as e:
         print(f"Groq Error: {e}")
         return None
 
+@cached('abacus')
+@routed('abacus')
+@metered('abacus')
 def generate_with_abacus(system_prompt, user_prompt, api_key, model_id=None):
     try:
-        from abacusai import ApiClient
-        client = ApiClient(api_key=api_key)
+        client = abacus_client(api_key)
         
         # Abacus evaluate_prompt uses system_message and llm_name
         # Defaulting to some common model if not specified
         llm_name = model_id if model_id else 'abacus-chat-v1'
+        llm_telemetry.report(model=llm_name)
         
-        response = client.evaluate_prompt(
+        # The Abacus SDK has no timeout of its own
+        response = deadline.call(
+            client.evaluate_prompt,
             prompt=user_prompt,
             system_message=system_prompt,
             llm_name=llm_name
@@ -190,28 +222,121 @@ def generate_with_abacus(system_prompt, user_prompt, api_key, model_id=None):
         print(f"Abacus AI Error: {e}")
         return None
 
-def generate_story_text(topic, length='short', target_language='en'):
-    """
-    Generate story text using configured provider.
-    Returns (title, content, moral, vocab, translation_data) or None.
-    translation_data is a dict or None if english only.
-    """
-    provider, model_id = get_llm_provider()
-    tone = get_story_tone()
-    
-    if provider == 'default':
-        return None
+@metered_stream('gemini')
+def stream_with_gemini(system_prompt, user_prompt, api_key, model_id=None):
+    """Yield text chunks from Gemini's streaming API (tries the fallback models until one starts)"""
+    try:
+        client = gemini_client(api_key)
+    except Exception as e:
+        print(f"DEBUG: Failed to initialize Gemini Client: {e}")
+        return
 
-    # Detect mismatch: TinyStories can't do translated text properly
-    if provider == 'tinystories' and target_language and target_language != 'en':
-        print("TinyStories requested but doesn't support bilingual. Falling back to Abacus.")
-        provider = 'abacus' 
+    from google import genai
+    models_to_try = [model_id] if model_id else router.model_order('gemini', GEMINI_MODELS)
+    for model_name in models_to_try:
+        started = False
+        try:
+            for chunk in client.models.generate_content_stream(
+                model=model_name,
+                contents=f"{system_prompt}\n\nTask: {user_prompt}",
+                config=genai.types.GenerateContentConfig(http_options=_gemini_http_options(genai))
+            ):
+                # The last chunk carries the usage totals
+                if getattr(chunk, 'usage_metadata', None):
+                    _report_gemini_usage(model_name, chunk)
+                if chunk.text:
+                    started = True
+                    yield chunk.text
+            return
+        except Exception as e:
+            print(f"DEBUG: Gemini stream failed with {model_name}: {e}")
+            if started:
+                return
+
+@metered_stream('openai')
+def stream_with_openai(system_prompt, user_prompt, api_key, model_id=None):
+    """Yield text chunks from an OpenAI streaming chat completion"""
+    client = openai_client(api_key).with_options(timeout=deadline.seconds())
+    model = model_id if model_id else "gpt-4o-mini"
+    stream = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    llm_telemetry.report(model=model)
+    for chunk in stream:
+        # With include_usage the final chunk has no choices, only the token totals
+        if getattr(chunk, 'usage', None):
+            llm_telemetry.report(prompt_tokens=chunk.usage.prompt_tokens,
+                                 completion_tokens=chunk.usage.completion_tokens)
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+@metered_stream('groq')
+def stream_with_groq(system_prompt, user_prompt, api_key, model_id=None):
+    """Yield text chunks from Groq's OpenAI-compatible SSE stream"""
+    import json
+    payload = {
+        "model": model_id if model_id else "llama3-8b-8192",
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": 0.7,
+        "stream": True
+    }
+    llm_telemetry.report(model=payload["model"])
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    with http_session().post("https://api.groq.com/openai/v1/chat/completions",
+                             headers=headers, json=payload, stream=True, timeout=deadline.timeout()) as res:
+        res.raise_for_status()
+        for line in res.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data: '):
+                continue
+            data = line[len('data: '):]
+            if data == '[DONE]':
+                break
+            delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+            if delta:
+                yield delta
 
-    # Determine if we should use Local TinyStories
-    use_local_tinystories = (provider == 'tinystories')
-    local_pipe = get_tinystories() if use_local_tinystories else None
+# provider -> (streaming function, env var holding its key)
+STREAMING_PROVIDERS = {
+    'gemini': (stream_with_gemini, 'GOOGLE_API_KEY'),
+    'openai': (stream_with_openai, 'OPENAI_API_KEY'),
+    'groq': (stream_with_groq, 'GROQ_API_KEY'),
+}
+
+# One call returns the story and its quiz, so opening the quiz needs no second LLM round trip
+COMBINED_GENERATION = os.getenv('COMBINED_STORY_GENERATION', 'true').lower() == 'true'
+
+QUIZ_QUESTION_COUNT = 5
+
+# Same question shape as quiz._generate_ai_questions
+QUIZ_ITEM_SCHEMA = '''{"question": "...", "options": ["Choice A", "Choice B", "Choice C", "Choice D"], "correct_answer": "Choice A", "hint": "Think about the beginning of the story.", "explanation": "Yes! The answer is Choice A because..."}'''
 
-    # Construct Prompt
+QUIZ_RULES = f'''
+    Quiz rules (ages 4-8): EXACTLY {QUIZ_QUESTION_COUNT} multiple-choice questions directly about events,
+    characters or words in THIS story, with 4 choices each (one clearly correct, three plausible but
+    wrong), very simple language, one question about the title or main character and one about the moral.
+'''
+
+def build_story_prompts(topic, length='short', target_language='en', tone='default', with_quiz=None):
+    """
+    Return (system_prompt, user_prompt) for a story about `topic`. with_quiz
+    (default COMBINED_GENERATION) also asks for the quiz questions.
+    """
+    with_quiz = COMBINED_GENERATION if with_quiz is None else with_quiz
+    quiz_json = f', "questions": [{QUIZ_ITEM_SCHEMA}]' if with_quiz else ''
+    quiz_json_rules = f"{QUIZ_RULES}    The quiz is in English." if with_quiz else ''
+    # No "VALID JSON" here: that phrase switches Gemini to JSON output for the whole answer
+    quiz_section = f'''QUIZ:
+    {{"questions": [{QUIZ_ITEM_SCHEMA}, ...]}}
+    {QUIZ_RULES}    The QUIZ section is a single JSON object and comes last.''' if with_quiz else ''
     word_count = "50-60" if length == 'short' else "100-120" if length == 'medium' else "150-180"
 
     tone_instruction = ""
@@ -246,8 +371,9 @@ def generate_story_text(topic, length='short', target_language='en'):
             ],
             "vocab": {{ "word": "simple definition" }},
             "moral": "English moral",
-            "translated_moral": "{target_language} moral"
+            "translated_moral": "{target_language} moral"{quiz_json}
         }}
+        {quiz_json_rules}
         """
         user_prompt = f"Write a bilingual story about {topic} in English and {target_language}."
         
@@ -319,11 +445,169 @@ def generate_story_text(topic, length='short', target_language='en'):
     - [Word 2]: [Very simple definition]
     MORAL:
     [One very simple, natural sentence.]
+    {quiz_section}
 
     {tone_instruction}
     Target word count: {word_count} words.
     """
         user_prompt = f"Write a story about: {topic}"
+    return system_prompt, user_prompt
+
+class StoryStreamParser:
+    """
+    Incremental parser for the TITLE:/CONTENT:/VOCAB:/MORAL:/QUIZ: story format.
+    feed() takes text as it streams in and returns the events it completes:
+    ('title', str) once the title line ends and ('sentence', str) for every
+    sentence of CONTENT, split exactly like story_sentences rows are.
+    """
+
+    HEADERS = ('TITLE:', 'CONTENT:', 'VOCAB:', 'MORAL:', 'QUIZ:')
+
+    def __init__(self):
+        self.title = "A Story for Omar"
+        self.content_parts = []
+        self.vocab = {}
+        self.moral = "Be good and kind."
+        self.sentences = []
+        self.quiz_parts = []
+        self._section = None
+        self._line = ''
+        self._consumed = 0
+        self._pending = ''
+
+    def feed(self, chunk):
+        events = []
+        self._line += chunk
+        while '\n' in self._line:
+            line, self._line = self._line.split('\n', 1)
+            events += self._end_line(line)
+            self._consumed = 0
+        events += self._consume_partial()
+        return events
+
+    def close(self):
+        """Flush whatever is left once the stream ends"""
+        events = self._end_line(self._line)
+        self._line = ''
+        self._consumed = 0
+        return events + self._flush_sentences(final=True)
+
+    def result(self):
+        """(title, content, moral, vocab, None, quiz_questions) like generate_story_text"""
+        return (self.title, "\n\n".join(self.content_parts), self.moral or "Be good and kind.", self.vocab, None,
+                parse_quiz_questions("\n".join(self.quiz_parts)))
+
+    def _consume_partial(self):
+        # Mid-line content is released early unless the line may still turn into a header
+        if self._section != 'content':
+            return []
+        text = self._line.lstrip() if self._consumed == 0 else self._line[self._consumed:]
+        if self._consumed == 0:
+            if not text or any(h.startswith(text[:len(h)]) for h in self.HEADERS):
+                return []
+            self._start_paragraph()
+        self._consumed = len(self._line)
+        self._pending += text
+        return self._flush_sentences()
+
+    def _start_paragraph(self):
+        if self.content_parts or self._pending:
+            self._pending += "\n\n"
+
+    def _end_line(self, raw):
+        tail = raw[self._consumed:]
+        line = raw.strip()
+        if self._consumed:
+            self._pending += tail
+            self.content_parts.append(line)
+            return self._flush_sentences()
+        if not line:
+            return []
+
+        events = []
+        if line.startswith("TITLE:"):
+            self.title = line.replace("TITLE:", "").strip()
+            self._section = 'content'
+            events.append(('title', self.title))
+        elif line.startswith("CONTENT:"):
+            self._section = 'content'
+        elif line.startswith("VOCAB:"):
+            events += self._flush_sentences(final=True)
+            self._section = 'vocab'
+        elif line.startswith("MORAL:"):
+            events += self._flush_sentences(final=True)
+            self.moral = line.replace("MORAL:", "").strip()
+            self._section = 'moral'
+        elif line.startswith("QUIZ:"):
+            events += self._flush_sentences(final=True)
+            self.quiz_parts.append(line.replace("QUIZ:", "").strip())
+            self._section = 'quiz'
+        elif self._section == 'content':
+            self._start_paragraph()
+            self._pending += line
+            self.content_parts.append(line)
+            events += self._flush_sentences()
+        elif self._section == 'vocab':
+            if ':' in line:
+                key, val = line.split(':', 1)
+                self.vocab[key.strip().lstrip('- ').strip()] = val.strip()
+        elif self._section == 'moral':
+            self.moral = f"{self.moral} {line}" if self.moral else line
+        elif self._section == 'quiz':
+            self.quiz_parts.append(line)
+        return events
+
+    def _flush_sentences(self, final=False):
+        events = []
+        while '.' in self._pending:
+            piece, self._pending = self._pending.split('.', 1)
+            events += self._sentence(piece)
+        if final:
+            events += self._sentence(self._pending)
+            self._pending = ''
+        return events
+
+    def _sentence(self, piece):
+        piece = piece.strip()
+        if not piece:
+            return []
+        self.sentences.append(piece + '.')
+        return [('sentence', piece + '.')]
+
+def parse_quiz_questions(text):
+    """Well-formed questions from a combined response's quiz JSON, or None if it had no usable quiz"""
+    data = parse_llm_json(text, lists=('questions',), required=('questions',))
+    return data['questions'] if data else None
+
+def quiz_from_metadata(metadata):
+    """Quiz questions from extract_metadata_and_questions' mcqs and moral questions"""
+    questions = (metadata.get('mcqs') or []) + (metadata.get('moral_questions') or [])
+    return questions or None
+
+@llm_telemetry.call_site(llm_telemetry.STORY_TEXT)
+def generate_story_text(topic, length='short', target_language='en'):
+    """
+    Generate story text using configured provider.
+    Returns (title, content, moral, vocab, translation_data, quiz_questions) or None.
+    translation_data is a dict or None if english only. quiz_questions is the
+    story's quiz from the same response (combined mode), or None.
+    """
+    provider, model_id = get_llm_provider()
+    tone = get_story_tone()
+    
+    if provider == 'default':
+        return None
+
+    # Detect mismatch: TinyStories can't do translated text properly
+    if provider == 'tinystories' and target_language and target_language != 'en':
+        print("TinyStories requested but doesn't support bilingual. Falling back to Abacus.")
+        provider = 'abacus' 
+
+    # Determine if we should use Local TinyStories
+    use_local_tinystories = (provider == 'tinystories')
+    local_pipe = get_tinystories() if use_local_tinystories else None
+
+    system_prompt, user_prompt = build_story_prompts(topic, length, target_language, tone)
     
     # Try Local TinyStories for English first
     if local_pipe and use_local_tinystories:
@@ -331,7 +615,7 @@ def generate_story_text(topic, length='short', target_language='en'):
             print(f"DEBUG: Generating English story using Local TinyStories-33M...")
             
             # TinyStories works best completing a sentence
-            prompt = f"Once upon a time, there was a {topic}."
+            prompt = tinystories_engine.story_prompt(topic)
             
             # The length setting shouldn't cut off TinyStories mid-sentence
             # Set a high enough max tokens to let the model generate the full story naturally
@@ -353,75 +637,49 @@ def generate_story_text(topic, length='short', target_language='en'):
                 # Vocab is returned as a list of dicts, format into dict to match signature
                 vocab_list = metadata.get('vocab', [])
                 vocab = {v.get('word', ''): v.get('meaning', '') for v in vocab_list if v.get('word')}
+                # The metadata call already wrote the questions; they become the quiz
+                questions = quiz_from_metadata(metadata)
             else:
                 moral = "Always be kind and good."
                 vocab = {}
+                questions = None
             
-            return title, content, moral, vocab, None
+            return title, content, moral, vocab, None, questions
             
         except Exception as e:
             print(f"Local TinyStories generation failed: {e}. Falling back to Cloud LLM...")
             # Fall through to Cloud LLM
     
+    # Configured provider first; if it fails, the other configured providers by observed health
     response_text = None
-    
-    if provider == 'gemini':
-        key = os.environ.get('GOOGLE_API_KEY')
-        if key: 
-            try:
-                # Add JSON constraint for bilingual
-                if target_language and target_language != 'en':
-                    # Temporary configure for JSON?
-                    # `generate_with_gemini` treats it as text. 
-                    # We can instruct it in prompt (already did).
-                    pass
-                response_text = generate_with_gemini(system_prompt, user_prompt, key)
-            except Exception as e:
-                print(f"Gemini generation failed: {e}")
-            
-    elif provider == 'openai':
-        key = os.environ.get('OPENAI_API_KEY')
-        if key:
-            try:
-                response_text = generate_with_openai(system_prompt, user_prompt, key, model_id=model_id)
-            except Exception as e:
-                print(f"OpenAI generation failed: {e}")
-    elif provider == 'groq':
-        key = os.environ.get('GROQ_API_KEY')
-        if key:
-            try:
-                response_text = generate_with_groq(system_prompt, user_prompt, key, model_id=model_id)
-            except Exception as e:
-                print(f"Groq generation failed: {e}")
-    elif provider == 'abacus':
-        key = os.environ.get('ABACUS_API_KEY') or os.environ.get('ABACUS_AI_API_KEY')
-        if key:
-            try:
-                response_text = generate_with_abacus(system_prompt, user_prompt, key, model_id=model_id)
-            except Exception as e:
-                print(f"Abacus generation failed: {e}")
-                
+    for name in configured_providers(provider):
+        if deadline.expired():
+            print("DEBUG: Story deadline reached, leaving it to the template generator")
+            break
+        generate_fn, key = provider_generator(name)
+        try:
+            # Gemini walks its own model list; the others take the model from settings
+            response_text = generate_fn(system_prompt, user_prompt, key,
+                                        model_id=model_id if name == provider and name != 'gemini' else None,
+                                        cache_bypass=True)
+        except Exception as e:
+            print(f"{name} generation failed: {e}")
+        if response_text:
+            break
+
     if response_text:
         # Bilingual JSON Parsing
         if target_language and target_language != 'en':
             try:
-                import json
                 print(f"DEBUG: Parsing Bilingual JSON for {target_language}...")
-                
-                # Robust JSON extraction
-                clean_text = response_text.strip()
-                start_idx = clean_text.find('{')
-                end_idx = clean_text.rfind('}')
-                
-                if start_idx != -1 and end_idx != -1:
-                    clean_text = clean_text[start_idx:end_idx+1]
-                else:
-                    print("DEBUG: No JSON braces found in response")
-                    # Fallback to simple markdown cleanup just in case
-                    clean_text = response_text.replace('```json', '').replace('```', '').strip()
-
-                data = json.loads(clean_text)
-                
+
+                # Tolerant parse: a fenced, commented or truncated answer keeps its complete sentences
+                data = parse_llm_json(response_text, lists=('sentences', 'questions'), required=('sentences',))
+                if data is None:
+                    logger.error("JSON Parsing Error for Bilingual: no usable sentences")
+                    logger.error(f"Raw response was: {response_text}")
+                    return None
+
                 title = data.get('title', 'A Story')
                 translated_title = data.get('translated_title', '')
                 
@@ -440,80 +698,103 @@ def generate_story_text(topic, length='short', target_language='en'):
                 }
                 
                 logger.info(f"DEBUG: JSON Parsing Successful. Title: {title}")
-                return title, full_content, moral, vocab, translation_data
+                return title, full_content, moral, vocab, translation_data, data.get('questions') or None
                 
             except Exception as e:
                 logger.error(f"JSON Parsing Error for Bilingual: {e}")
                 logger.error(f"Raw response was: {response_text}")
                 return None
 
-        # Text Parsing (Legacy)
+        # Text Parsing (TITLE:/CONTENT:/VOCAB:/MORAL:/QUIZ:)
         try:
             logger.info("DEBUG: Parsing Standard Text Response...")
-            lines = response_text.split('\n')
-            title = "A Story for Omar"
-            content_parts = []
-            vocab = {}
-            moral = "Be good and kind."
-            
-            section = None
-            for line in lines:
-                line = line.strip()
-                if not line: continue
-                
-                if line.startswith("TITLE:"):
-                    title = line.replace("TITLE:", "").strip()
-                    section = 'content' 
-                elif line.startswith("CONTENT:"):
-                    section = 'content'
-                elif line.startswith("VOCAB:"):
-                    section = 'vocab'
-                elif line.startswith("MORAL:"):
-                    potential_moral = line.replace("MORAL:", "").strip()
-                    if potential_moral:
-                        moral = potential_moral
-                    else:
-                        moral = "" 
-                    section = 'moral'
-                else:
-                    if section == 'content':
-                        content_parts.append(line)
-                    elif section == 'vocab':
-                        if ':' in line:
-                            parts = line.split(':', 1)
-                            key = parts[0].strip().lstrip('- ').strip()
-                            val = parts[1].strip()
-                            vocab[key] = val
-                    elif section == 'moral':
-                        if moral:
-                            moral += " " + line
-                        else:
-                            moral = line
-            
-            content = "\n\n".join(content_parts)
-            if not moral: moral = "Be good and kind."
-            
-            return title, content, moral, vocab, None
-            
+            parser = StoryStreamParser()
+            parser.feed(response_text)
+            parser.close()
+            return parser.result()
         except Exception as e:
             print(f"Parsing Error: {e}")
-            return None 
+            return None
             
     return None
 
+def stream_story_text(topic, length='short'):
+    """
+    Stream an English story from the configured provider.
+    Returns None when the provider cannot stream (TinyStories, Abacus, no key);
+    otherwise an iterator of ('title', str) and ('sentence', str) events that
+    ends with ('result', (title, content, moral, vocab, None, quiz_questions)). The result is
+    None if the provider produced no story or the stream broke off, so the caller can fall back.
+    """
+    provider, model_id = get_llm_provider()
+    if provider not in STREAMING_PROVIDERS:
+        return None
+    stream_fn, key_name = STREAMING_PROVIDERS[provider]
+    key = os.environ.get(key_name)
+    if not key:
+        return None
+    # Same as generate_story_text: Gemini walks its own model fallback list
+    model_id = None if provider == 'gemini' else model_id
+    system_prompt, user_prompt = build_story_prompts(topic, length, 'en', get_story_tone())
+
+    def events():
+        parser = StoryStreamParser()
+        try:
+            with deadline.deadline(deadline.STORY_TEXT_DEADLINE_SEC), llm_telemetry.call_site(llm_telemetry.STORY_TEXT):
+                for chunk in stream_fn(system_prompt, user_prompt, key, model_id=model_id):
+                    yield from parser.feed(chunk)
+        except Exception as e:
+            # What arrived is only part of a story: let the caller regenerate it
+            print(f"{provider} streaming failed: {e}")
+            yield ('result', None)
+            return
+        yield from parser.close()
+        yield ('result', parser.result() if parser.content_parts else None)
+
+    return events()
+
+# provider -> env vars that may hold its API key
+PROVIDER_KEYS = {
+    'gemini': ('GOOGLE_API_KEY',),
+    'openai': ('OPENAI_API_KEY',),
+    'groq': ('GROQ_API_KEY',),
+    'abacus': ('ABACUS_API_KEY', 'ABACUS_AI_API_KEY'),
+}
+
+def provider_generator(name):
+    """(generate_with_<name>, api key) or (None, None) if unknown or not configured"""
+    fn = {
+        'gemini': generate_with_gemini,
+        'openai': generate_with_openai,
+        'groq': generate_with_groq,
+        'abacus': generate_with_abacus,
+    }.get(name)
+    key = next((os.environ[k] for k in PROVIDER_KEYS.get(name, ()) if os.environ.get(k)), None)
+    return (fn, key) if fn and key else (None, None)
+
+# Fallback order when the configured provider is unavailable
+FALLBACK_PROVIDERS = ['gemini', 'openai', 'groq', 'abacus']
+
+def configured_providers(preferred=None, candidates=FALLBACK_PROVIDERS):
+    """
+    Providers that have an API key: `preferred` first, then `candidates`,
+    reordered by the router so open circuits and unhealthy providers go last.
+    """
+    names = ([preferred] if preferred in PROVIDER_KEYS else []) + [p for p in candidates if p != preferred]
+    return router.order([p for p in names if provider_generator(p)[0]])
+
+def _parse_json_object(response_text):
+    """Metadata/question JSON of a response as a dict (repaired, malformed questions dropped), or None"""
+    data = parse_llm_json(response_text, lists=('vocab', 'mcqs', 'fill_in_blanks', 'moral_questions'))
+    if data is None and response_text:
+        print("Failed to parse extract_metadata json")
+    return data or None
+
+@llm_telemetry.call_site(llm_telemetry.METADATA)
 def extract_metadata_and_questions(story_text, provider=None):
     # Use designated provider from argument, then from DB settings
     setting_provider, setting_model = get_llm_provider() if not provider else (provider, None)
     
-    # Abacus is now primary ranking
-    providers_to_try = [
-        (provider or setting_provider, setting_model),
-        'abacus',
-        'gemini',
-        'openai',
-        'groq'
-    ]
-    
     system_prompt = """
     You are an AI teacher helping a young kid named Omar understand stories.
     Given the story text (which was generated by a small local AI and might lose context or have logic errors), extract the following and ONLY output VALID JSON:
@@ -540,53 +821,17 @@ def extract_metadata_and_questions(story_text, provider=None):
     """
     user_prompt = f"Story: {story_text}"
 
-    response_text = None
+    providers_to_try = configured_providers(provider or setting_provider)
 
-    # Try multiple providers as fallback for metadata extraction
-    providers_to_try = [provider] if provider not in ['tinystories', 'default'] else []
-    
-    # Add other available providers as fallbacks
-    if os.environ.get('GOOGLE_API_KEY') and 'gemini' not in providers_to_try:
-        providers_to_try.append('gemini')
-    if os.environ.get('GROQ_API_KEY') and 'groq' not in providers_to_try:
-        providers_to_try.append('groq')
-    if os.environ.get('OPENAI_API_KEY') and 'openai' not in providers_to_try:
-        providers_to_try.append('openai')
-
-    for p in providers_to_try:
-        try:
-            # Handle both string (fallback) and tuple (current) provider formats
-            p_name = p[0] if isinstance(p, tuple) else p
-            p_model = p[1] if isinstance(p, tuple) else None
-
-            if p_name == 'gemini':
-                key = os.environ.get('GOOGLE_API_KEY')
-                if key: response_text = generate_with_gemini(system_prompt, user_prompt, key, model_id=p_model)
-            elif p_name == 'openai':
-                key = os.environ.get('OPENAI_API_KEY')
-                if key: response_text = generate_with_openai(system_prompt, user_prompt, key, model_id=p_model)
-            elif p_name == 'groq':
-                key = os.environ.get('GROQ_API_KEY')
-                if key: response_text = generate_with_groq(system_prompt, user_prompt, key, model_id=p_model)
-            elif p_name == 'abacus':
-                key = os.environ.get('ABACUS_API_KEY')
-                if key: response_text = generate_with_abacus(system_prompt, user_prompt, key, model_id=p_model)
-                
-            if response_text:
-                break
-        except Exception as e:
-            print(f"Failed to generate metadata with {p}: {e}")
+    candidates = []
+    for p_name in providers_to_try:
+        p_model = setting_model if p_name == setting_provider and p_name != 'gemini' else None
+        generate_fn, key = provider_generator(p_name)
+        candidates.append((p_name, functools.partial(generate_fn, system_prompt, user_prompt, key,
+                                                     model_id=p_model, cache_ttl=TTL_METADATA)))
 
-    if response_text:
-        try:
-            import json
-            clean_text = response_text.strip()
-            start_idx = clean_text.find('{')
-            end_idx = clean_text.rfind('}')
-            if start_idx != -1 and end_idx != -1:
-                clean_text = clean_text[start_idx:end_idx+1]
-            return json.loads(clean_text)
-        except Exception as e:
-            print(f"Failed to parse extract_metadata json: {e}")
-            return None
-    return None
+    # Race the providers; the first response that parses as JSON wins
+    winner, metadata = hedged_first(candidates, _parse_json_object)
+    if winner:
+        print(f"DEBUG: Metadata extracted via {winner}")
+    return metadata
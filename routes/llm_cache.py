@@ -0,0 +1,151 @@
+"""
+LLM Response Cache
+Content-addressed cache under the generate_with_* helpers. A response is keyed
+by provider, model, a hash of the system prompt and the user prompt, kept in a
+bounded in-memory LRU and persisted to the llm_cache table in ost.db so it
+survives restarts and is shared between worker processes.
+"""
+
+import functools
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from database import get_db_read_context
+from write_behind import ost_writer
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 512))
+DEFAULT_TTL = int(os.getenv('LLM_CACHE_TTL_SEC', 24 * 3600))
+
+# Per-call-site TTLs (seconds)
+TTL_METADATA = 7 * 24 * 3600       # extract_metadata_and_questions: same story text, same answer
+TTL_QUIZ = 24 * 3600               # quiz._generate_ai_questions
+TTL_TINYSTORIES = 6 * 3600         # CloudTinyStories topic prompts
+
+# Expired rows are swept from disk every this many stores
+PURGE_EVERY = 200
+
+UPSERT = '''
+    INSERT OR REPLACE INTO llm_cache (key, provider, model, response, created_at, expires_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+
+def cache_key(provider, model, system_prompt, user_prompt):
+    system_hash = hashlib.sha256((system_prompt or '').encode('utf-8')).hexdigest()
+    raw = '\x1f'.join([provider, model or 'default', system_hash, user_prompt or ''])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Two-tier cache: LRU dict in front of the llm_cache table"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0}
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return entry[0]
+                del self._entries[key]
+
+        row = self._load(key, now)
+        if row is not None:
+            self._remember(key, row['response'], row['expires_at'])
+            self.stats['disk_hits'] += 1
+            return row['response']
+
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, key, provider, model, response, ttl=DEFAULT_TTL):
+        now = time.time()
+        expires_at = now + ttl
+        self._remember(key, response, expires_at)
+        self.stats['stores'] += 1
+        try:
+            # Coalesced on the key so a burst of identical stores is one row
+            ost_writer.submit(UPSERT, (key, provider, model or 'default', response, now, expires_at),
+                              key=('llm_cache', key))
+            if self.stats['stores'] % PURGE_EVERY == 0:
+                ost_writer.submit('DELETE FROM llm_cache WHERE expires_at < ?', (now,))
+        except Exception as e:
+            logger.warning(f"LLM cache persist failed: {e}")
+
+    def clear(self):
+        """Drop the memory tier and every persisted response"""
+        with self._lock:
+            self._entries.clear()
+        ost_writer.submit('DELETE FROM llm_cache', durable=True)
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        with self._lock:
+            stats['memory_entries'] = len(self._entries)
+        stats['max_entries'] = self._max_entries
+        stats['enabled'] = CACHE_ENABLED
+        return stats
+
+    def _remember(self, key, response, expires_at):
+        with self._lock:
+            self._entries[key] = (response, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, key, now):
+        try:
+            with get_db_read_context() as conn:
+                return conn.execute(
+                    'SELECT response, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?',
+                    (key, now)
+                ).fetchone()
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+
+
+llm_cache = LLMCache()
+
+
+def cached(provider):
+    """
+    Wrap a generate_with_* helper. Callers may pass cache_ttl (seconds) and
+    cache_bypass=True for generations that are meant to differ every time.
+    Empty responses (provider failures) are never cached.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(system_prompt, user_prompt, api_key, model_id=None, cache_ttl=DEFAULT_TTL, cache_bypass=False):
+            if cache_bypass or not CACHE_ENABLED or not cache_ttl:
+                llm_cache.stats['bypassed'] += 1
+                return fn(system_prompt, user_prompt, api_key, model_id=model_id)
+
+            key = cache_key(provider, model_id, system_prompt, user_prompt)
+            response = llm_cache.get(key)
+            if response is not None:
+                print(f"DEBUG: LLM cache hit ({provider})")
+                return response
+
+            response = fn(system_prompt, user_prompt, api_key, model_id=model_id)
+            if response:
+                llm_cache.put(key, provider, model_id, response, cache_ttl)
+            return response
+        return wrapper
+    return decorate
@@ -0,0 +1,93 @@
+"""
+LLM Client Registry
+Provider clients (google-genai, OpenAI, Abacus, LangChain chat models and a
+shared requests.Session) are built once per API key/model and reused, so
+calls ride on pooled keep-alive connections instead of a fresh TLS handshake.
+"""
+
+import hashlib
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 20
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _fingerprint(api_key):
+    # Registry keys carry a hash rather than the raw secret
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+
+
+def _get_or_create(cache_key, factory):
+    client = _clients.get(cache_key)
+    if client is None:
+        with _lock:
+            client = _clients.get(cache_key)
+            if client is None:
+                client = factory()
+                _clients[cache_key] = client
+                logger.debug(f"Created LLM client {cache_key[0]}")
+    return client
+
+
+def gemini_client(api_key):
+    from google import genai
+    return _get_or_create(('gemini', _fingerprint(api_key)),
+                          lambda: genai.Client(api_key=api_key))
+
+
+def openai_client(api_key=None):
+    """OpenAI client; api_key=None reads OPENAI_API_KEY like OpenAI() does"""
+    from openai import OpenAI
+    return _get_or_create(('openai', _fingerprint(api_key)),
+                          lambda: OpenAI(api_key=api_key) if api_key else OpenAI())
+
+
+def abacus_client(api_key):
+    from abacusai import ApiClient
+    return _get_or_create(('abacus', _fingerprint(api_key)),
+                          lambda: ApiClient(api_key=api_key))
+
+
+def _new_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def http_session():
+    """Shared keep-alive session for the REST providers (Groq, Imagen, HF)"""
+    return _get_or_create(('http',), _new_session)
+
+
+def langchain_chat(provider, model, api_key, temperature=0.7):
+    """Cached LangChain chat model for the chatbot ('gemini' or 'openai')"""
+    def build():
+        if provider == 'gemini':
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            return ChatGoogleGenerativeAI(model=model, google_api_key=api_key, temperature=temperature)
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=model, openai_api_key=api_key, temperature=temperature)
+    return _get_or_create(('langchain', provider, model, temperature, _fingerprint(api_key)), build)
+
+
+def reset_clients():
+    """
+    Drop every cached client so the next call rebuilds with the current keys.
+    Old clients are not closed: a request still in flight may be using one,
+    and they are released once the last reference goes away.
+    """
+    with _lock:
+        count = len(_clients)
+        _clients.clear()
+    logger.info(f"LLM client registry reset ({count} clients dropped)")
@@ -0,0 +1,270 @@
+"""
+LLM Call Telemetry
+One row per provider call in the llm_calls table: provider, model, call site,
+wall time (plus time to first token when streaming), prompt/completion tokens,
+outcome and an estimated cost. Rows go through the write-behind queue, so a
+call never waits on the insert. Token counts come from the provider's usage
+report when it sends one and are otherwise estimated with tiktoken (or about
+four characters per token when tiktoken is unavailable).
+"""
+
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+
+from database import get_db_read_context
+from write_behind import ost_writer
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_ENABLED = os.getenv('LLM_TELEMETRY_ENABLED', 'true').lower() == 'true'
+RETENTION_DAYS = int(os.getenv('LLM_TELEMETRY_RETENTION_DAYS', 30))
+# Rows older than RETENTION_DAYS are swept every this many calls
+PURGE_EVERY = 500
+DEFAULT_WINDOW_HOURS = 24
+
+# Call sites
+STORY_TEXT = 'story_text'
+METADATA = 'metadata'
+QUIZ = 'quiz'
+CHATBOT = 'chatbot'
+CLOUD_TINYSTORIES = 'cloud_tinystories'
+OTHER = 'other'
+
+# USD per million (prompt, completion) tokens, from the providers' list prices.
+# Models missing here are recorded with no cost.
+PRICES = {
+    'gemini-2.0-flash': (0.10, 0.40),
+    'gemini-1.5-flash': (0.075, 0.30),
+    'gemini-1.5-pro': (1.25, 5.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'llama3-8b-8192': (0.05, 0.08),
+    'llama3-70b-8192': (0.59, 0.79),
+}
+
+INSERT = '''
+    INSERT INTO llm_calls (created_at, provider, model, call_site, latency_ms, ttft_ms,
+                           prompt_tokens, completion_tokens, estimated, outcome, cost_usd)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_site = contextvars.ContextVar('llm_call_site', default=OTHER)
+_current = contextvars.ContextVar('llm_call', default=None)
+
+_encoding = None
+_encoding_lock = threading.Lock()
+_counter_lock = threading.Lock()
+_recorded = 0
+
+
+@contextlib.contextmanager
+def call_site(name):
+    """Tag the LLM calls made inside (also usable as a decorator). Hedged workers inherit it."""
+    token = _site.set(name)
+    try:
+        yield
+    finally:
+        _site.reset(token)
+
+
+def _encoder():
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding('cl100k_base')
+            except Exception as e:
+                # Not installed, or the BPE file cannot be fetched: fall back to characters
+                logger.info(f"tiktoken unavailable, estimating tokens from length: {e}")
+                _encoding = False
+        return _encoding or None
+
+
+def estimate_tokens(text):
+    """Token count of text: tiktoken's cl100k_base when available, else ~4 characters per token"""
+    if not text:
+        return 0
+    encoding = _encoder()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prices = PRICES.get(model)
+    if prices is None:
+        return None
+    return round((prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000, 8)
+
+
+class Call:
+    """What track() records for one call; the provider helper fills in what it knows"""
+
+    def __init__(self, provider, model, prompt, site=None):
+        self.provider = provider
+        self.model = model
+        self.prompt = prompt
+        self.site = site or _site.get()
+        self.started = time.monotonic()
+        self.ttft = None
+        self.prompt_tokens = None
+        self.completion_tokens = None
+        self.response = None
+        self.outcome = 'empty'
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.monotonic() - self.started
+
+    def finish(self, response):
+        self.response = response
+        self.outcome = 'ok' if response else 'empty'
+
+    def row(self):
+        latency = time.monotonic() - self.started
+        estimated = self.prompt_tokens is None or self.completion_tokens is None
+        if self.prompt_tokens is None:
+            self.prompt_tokens = estimate_tokens(self.prompt)
+        if self.completion_tokens is None:
+            self.completion_tokens = estimate_tokens(self.response if isinstance(self.response, str) else '')
+        return (time.time(), self.provider, self.model, self.site, round(latency * 1000),
+                round(self.ttft * 1000) if self.ttft is not None else None,
+                self.prompt_tokens, self.completion_tokens, int(estimated), self.outcome,
+                estimate_cost(self.model, self.prompt_tokens, self.completion_tokens))
+
+
+def report(model=None, prompt_tokens=None, completion_tokens=None):
+    """Called from inside a tracked provider helper with the model used and the SDK's usage numbers"""
+    call = _current.get()
+    if call is None:
+        return
+    if model:
+        call.model = model
+    if prompt_tokens is not None:
+        call.prompt_tokens = prompt_tokens
+    if completion_tokens is not None:
+        call.completion_tokens = completion_tokens
+
+
+@contextlib.contextmanager
+def track(provider, model=None, prompt='', site=None):
+    """Time the block as one call and queue its row; the block calls call.finish(response)"""
+    call = Call(provider, model, prompt, site)
+    token = _current.set(call)
+    try:
+        yield call
+    except GeneratorExit:
+        # A stream the caller stopped reading
+        call.outcome = 'cancelled'
+        raise
+    except BaseException:
+        call.outcome = 'error'
+        raise
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # A stream generator closed from another context (e.g. by the garbage collector)
+            pass
+        _record(call)
+
+
+def _record(call):
+    global _recorded
+    if not TELEMETRY_ENABLED:
+        return
+    try:
+        ost_writer.submit(INSERT, call.row())
+        with _counter_lock:
+            _recorded += 1
+            purge = _recorded % PURGE_EVERY == 0
+        if purge:
+            ost_writer.submit('DELETE FROM llm_calls WHERE created_at < ?',
+                              (time.time() - RETENTION_DAYS * 86400,))
+    except Exception as e:
+        logger.warning(f"LLM telemetry write failed: {e}")
+
+
+def metered(provider):
+    """Wrap a generate_with_* helper (innermost, so cache hits and skipped calls are not counted)"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(system_prompt, user_prompt, api_key, model_id=None):
+            with track(provider, model_id, f"{system_prompt}\n{user_prompt}") as call:
+                response = fn(system_prompt, user_prompt, api_key, model_id=model_id)
+                call.finish(response)
+            return response
+        return wrapper
+    return decorate
+
+
+def metered_stream(provider):
+    """Wrap a stream_with_* generator; also records the time to the first chunk"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(system_prompt, user_prompt, api_key, model_id=None):
+            with track(provider, model_id, f"{system_prompt}\n{user_prompt}") as call:
+                parts = []
+                for chunk in fn(system_prompt, user_prompt, api_key, model_id=model_id):
+                    call.first_token()
+                    parts.append(chunk)
+                    yield chunk
+                call.finish(''.join(parts))
+        return wrapper
+    return decorate
+
+
+def _percentile(values, q):
+    values = sorted(v for v in values if v is not None)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def snapshot(hours=DEFAULT_WINDOW_HOURS):
+    """Per call site over the last `hours`: calls, failures, p50/p95 latency and TTFT, tokens and cost"""
+    with get_db_read_context() as conn:
+        rows = conn.execute('''
+            SELECT provider, model, call_site, latency_ms, ttft_ms, prompt_tokens, completion_tokens,
+                   estimated, outcome, cost_usd
+            FROM llm_calls WHERE created_at >= ?
+        ''', (time.time() - hours * 3600,)).fetchall()
+
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row['call_site'], []).append(row)
+
+    sites = {}
+    for site, calls in sorted(grouped.items()):
+        latencies = [c['latency_ms'] for c in calls]
+        ttfts = [c['ttft_ms'] for c in calls]
+        providers = {}
+        for c in calls:
+            name = f"{c['provider']}:{c['model']}" if c['model'] else c['provider']
+            providers[name] = providers.get(name, 0) + 1
+        sites[site] = {
+            'calls': len(calls),
+            'failures': sum(1 for c in calls if c['outcome'] != 'ok'),
+            'latency_p50_ms': _percentile(latencies, 0.5),
+            'latency_p95_ms': _percentile(latencies, 0.95),
+            'ttft_p50_ms': _percentile(ttfts, 0.5),
+            'ttft_p95_ms': _percentile(ttfts, 0.95),
+            'total_sec': round(sum(latencies) / 1000, 1),
+            'prompt_tokens': sum(c['prompt_tokens'] or 0 for c in calls),
+            'completion_tokens': sum(c['completion_tokens'] or 0 for c in calls),
+            'estimated_token_calls': sum(c['estimated'] for c in calls),
+            'cost_usd': round(sum(c['cost_usd'] or 0 for c in calls), 6),
+            'providers': providers,
+        }
+    return {
+        'enabled': TELEMETRY_ENABLED,
+        'window_hours': hours,
+        'calls': len(rows),
+        'cost_usd': round(sum(site['cost_usd'] for site in sites.values()), 6),
+        'call_sites': sites,
+    }
@@ -0,0 +1,94 @@
+"""
+Metrics API Routes
+Runtime counters for the caching and provider layers
+"""
+
+from flask import Blueprint, jsonify, request
+from routes.llm_cache import llm_cache
+from routes import llm_telemetry
+from routes import hedging
+from routes.provider_router import router
+from routes import tinystories_engine
+from routes.story_pool import story_pool
+
+bp = Blueprint('metrics', __name__)
+
+
+@bp.route('/llm-cache', methods=['GET'])
+def llm_cache_metrics():
+    """Hit/miss counters for the LLM response cache"""
+    return jsonify({
+        'success': True,
+        'llm_cache': llm_cache.snapshot()
+    })
+
+
+@bp.route('/hedging', methods=['GET'])
+def hedging_metrics():
+    """How often hedged provider races launched a second provider and who won"""
+    return jsonify({
+        'success': True,
+        'hedging': hedging.snapshot()
+    })
+
+
+@bp.route('/providers', methods=['GET'])
+def provider_metrics():
+    """Rolling latency, error rate and circuit state per provider/model"""
+    return jsonify({
+        'success': True,
+        'router': router.snapshot()
+    })
+
+
+@bp.route('/tinystories', methods=['GET'])
+def tinystories_metrics():
+    """Local engine state, prefix-cache hits and micro-batching throughput/latency"""
+    return jsonify({
+        'success': True,
+        'tinystories': tinystories_engine.engine.status()
+    })
+
+
+@bp.route('/story-pool', methods=['GET'])
+def story_pool_metrics():
+    """Ready stories per combination, claim hit rate and refill lag"""
+    try:
+        return jsonify({
+            'success': True,
+            'story_pool': story_pool.snapshot()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@bp.route('/llm', methods=['GET'])
+def llm_call_metrics():
+    """Per call site: p50/p95 latency and time to first token, tokens and estimated cost (?hours=24)"""
+    try:
+        hours = request.args.get('hours', llm_telemetry.DEFAULT_WINDOW_HOURS, type=float)
+        return jsonify({
+            'success': True,
+            'llm': llm_telemetry.snapshot(hours)
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@bp.route('/llm-cache', methods=['DELETE'])
+def clear_llm_cache():
+    """Forget every cached LLM response"""
+    try:
+        llm_cache.clear()
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -0,0 +1,93 @@
+"""
+Keyset Pagination Helpers
+Shared by the list endpoints: ?limit=&after=<cursor>&fields=a,b and ?all=1
+"""
+
+import base64
+import json
+from flask import request
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PaginationError(ValueError):
+    """Bad limit, cursor or fields parameter (reported as a 400)"""
+
+
+def wants_all():
+    """Compat flag: ?all=1 returns the legacy unpaginated list"""
+    return request.args.get('all', '').lower() in ('1', 'true', 'yes')
+
+
+def encode_cursor(values):
+    """Opaque cursor for the sort key of the last row on a page"""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise PaginationError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise PaginationError('Invalid cursor')
+    return values
+
+
+def parse_fields(allowed, default=None):
+    """Validate ?fields= against the columns an endpoint exposes"""
+    raw = request.args.get('fields')
+    if not raw:
+        return list(default or allowed)
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def parse_limit():
+    raw = request.args.get('limit')
+    if raw is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def fetch_page(cursor, table, fields, keys, descending=True, where='', params=()):
+    """
+    Run one keyset page query: WHERE (keys) < cursor ORDER BY keys LIMIT n+1.
+    The sort keys are always selected so the next cursor can be built, then
+    dropped from the rows unless they were asked for.
+    """
+    limit = parse_limit()
+    after = request.args.get('after')
+
+    columns = list(fields) + [k for k in keys if k not in fields]
+    clauses = [where] if where else []
+    params = list(params)
+    if after:
+        clauses.append(f"({', '.join(keys)}) {'<' if descending else '>'} ({', '.join('?' for _ in keys)})")
+        params.extend(decode_cursor(after, len(keys)))
+
+    direction = 'DESC' if descending else 'ASC'
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += f" ORDER BY {', '.join(f'{k} {direction}' for k in keys)} LIMIT ?"
+    params.append(limit + 1)
+
+    cursor.execute(sql, params)
+    rows = cursor.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = encode_cursor([rows[-1][k] for k in keys]) if has_more else None
+    items = [{f: row[f] for f in fields} for row in rows]
+    return items, next_cursor, has_more
@@ -0,0 +1,207 @@
+"""
+Provider Router
+Tracks rolling latency and error rate per provider (and per model), opens a
+circuit breaker after consecutive failures, and orders fallback candidates by
+observed health so a provider that is down or rate-limited is skipped rather
+than retried on every request. It also remembers which Gemini model last
+worked so generate_with_gemini does not rediscover it per call.
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from routes import deadline
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = int(os.getenv('ROUTER_FAILURE_THRESHOLD', 3))
+COOLDOWN_SEC = float(os.getenv('ROUTER_COOLDOWN_SEC', 30))
+WINDOW = int(os.getenv('ROUTER_WINDOW', 50))
+# Providers failing at least this share of recent calls go behind healthy ones
+UNHEALTHY_ERROR_RATE = 0.5
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class _Health:
+    __slots__ = ('samples', 'consecutive_failures', 'state', 'opened_at', 'probing', 'calls', 'failures')
+
+    def __init__(self):
+        self.samples = deque(maxlen=WINDOW)  # (latency_sec, ok)
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.calls = 0
+        self.failures = 0
+
+    def error_rate(self):
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def p50(self):
+        latencies = sorted(latency for latency, ok in self.samples if ok)
+        return latencies[len(latencies) // 2] if latencies else None
+
+
+class ProviderRouter:
+    """Rolling health, circuit breakers and candidate ordering for outbound providers"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown_sec=COOLDOWN_SEC):
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown_sec
+        self._health = {}
+        self._working_model = {}
+        self._lock = threading.Lock()
+
+    def _get(self, provider, model):
+        key = (provider, model)
+        health = self._health.get(key)
+        if health is None:
+            health = self._health.setdefault(key, _Health())
+        return health
+
+    def available(self, provider, model=None):
+        """True unless the circuit is open and still cooling down (does not claim a probe)"""
+        health = self._health.get((provider, model))
+        if health is None or health.state == CLOSED:
+            return True
+        if health.state == HALF_OPEN:
+            return not health.probing
+        return time.monotonic() - health.opened_at >= self._cooldown
+
+    def allow(self, provider, model=None):
+        """
+        Check before calling. An open circuit past its cooldown goes half-open
+        and lets exactly one probe call through; its outcome closes or reopens it.
+        """
+        with self._lock:
+            health = self._get(provider, model)
+            if health.state == CLOSED:
+                return True
+            if health.state == OPEN and time.monotonic() - health.opened_at >= self._cooldown:
+                health.state = HALF_OPEN
+            if health.state == HALF_OPEN and not health.probing:
+                health.probing = True
+                logger.info(f"Router: probing {provider} {model or ''}".rstrip())
+                return True
+            return False
+
+    def record(self, provider, model, ok, latency):
+        with self._lock:
+            health = self._get(provider, model)
+            health.samples.append((latency, ok))
+            health.calls += 1
+            health.probing = False
+            if ok:
+                health.consecutive_failures = 0
+                if health.state != CLOSED:
+                    logger.info(f"Router: circuit closed for {provider} {model or ''}".rstrip())
+                health.state = CLOSED
+                if model:
+                    self._working_model[provider] = model
+                return
+            health.failures += 1
+            health.consecutive_failures += 1
+            if health.state == HALF_OPEN or health.consecutive_failures >= self._failure_threshold:
+                if health.state != OPEN:
+                    logger.warning(f"Router: circuit opened for {provider} {model or ''}".rstrip())
+                health.state = OPEN
+                health.opened_at = time.monotonic()
+                if model and self._working_model.get(provider) == model:
+                    del self._working_model[provider]
+
+    @contextmanager
+    def attempt(self, provider, model=None):
+        """
+        Time one call and record its outcome: an exception counts as a
+        failure (and propagates); set `call.ok = False` for soft failures.
+        """
+        call = _Attempt()
+        started = time.monotonic()
+        try:
+            yield call
+        except BaseException:
+            self.record(provider, model, False, time.monotonic() - started)
+            raise
+        self.record(provider, model, call.ok, time.monotonic() - started)
+
+    def order(self, providers):
+        """
+        Preferred (first) provider stays first while healthy. Open circuits go
+        last, unhealthy providers behind healthy ones, and fallbacks are
+        ranked by observed median latency.
+        """
+        def rank(item):
+            position, name = item
+            health = self._health.get((name, None))
+            if health is None:
+                return (False, False, position > 0, 0.0)
+            return (not self.available(name), health.error_rate() >= UNHEALTHY_ERROR_RATE,
+                    position > 0, health.p50() or 0.0)
+        return [name for _, name in sorted(enumerate(providers), key=rank)]
+
+    def model_order(self, provider, models):
+        """The model that last worked first, then the rest; open circuits last"""
+        working = self._working_model.get(provider)
+        ordered = ([working] if working in models else []) + [m for m in models if m != working]
+        return sorted(ordered, key=lambda m: not self.available(provider, m))
+
+    def snapshot(self):
+        with self._lock:
+            providers = {}
+            for (provider, model), health in self._health.items():
+                p50 = health.p50()
+                providers[f"{provider}:{model}" if model else provider] = {
+                    'state': health.state,
+                    'calls': health.calls,
+                    'failures': health.failures,
+                    'error_rate': round(health.error_rate(), 3),
+                    'p50_ms': round(p50 * 1000) if p50 is not None else None,
+                    'consecutive_failures': health.consecutive_failures
+                }
+            return {'providers': providers, 'working_models': dict(self._working_model)}
+
+    def reset(self):
+        with self._lock:
+            self._health.clear()
+            self._working_model.clear()
+
+
+class _Attempt:
+    __slots__ = ('ok',)
+
+    def __init__(self):
+        self.ok = True
+
+
+router = ProviderRouter()
+
+
+def routed(provider):
+    """
+    Wrap a generate_with_* helper: skip the call while the provider's circuit
+    is open or the request deadline has passed, and record latency and
+    outcome (None or empty text is a failure).
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(system_prompt, user_prompt, api_key, model_id=None):
+            if deadline.expired():
+                print(f"DEBUG: Skipping {provider}: request deadline exceeded")
+                return None
+            if not router.allow(provider):
+                print(f"DEBUG: Skipping {provider}: circuit open")
+                return None
+            with router.attempt(provider) as call:
+                response = fn(system_prompt, user_prompt, api_key, model_id=model_id)
+                call.ok = bool(response)
+            return response
+        return wrapper
+    return decorate
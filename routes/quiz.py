@@ -1,5 +1,9 @@
 from flask import Blueprint, jsonify, request
-from database import get_db_context
+from database import get_db_context, get_db_read_context
+from write_behind import ost_writer
+from routes import deadline
+from routes.json_repair import parse_llm_json
+from routes import llm_telemetry
 import random
 import json
 import logging
@@ -9,13 +13,36 @@ logger = logging.getLogger(__name__)
 bp = Blueprint('quiz', __name__)
 
 
-def _generate_ai_questions(story_dict):
+# Fewer usable AI questions than this and the quiz is padded with template questions
+MIN_QUESTIONS = 3
+
+
+def save_questions(cursor, story_id, questions):
+    """Insert quiz questions for a story (options shuffled); used by the quiz route and at story creation"""
+    rows = []
+    for q in questions:
+        opts = list(q.get('options', []))
+        random.shuffle(opts)
+        rows.append((story_id, q.get('question', ''), json.dumps(opts), q.get('correct_answer', ''), 'mcq',
+                     q.get('hint', 'Think carefully!'), q.get('explanation', 'Great job! 🌟')))
+    cursor.executemany('''
+        INSERT INTO quiz_questions
+        (story_id, question, options, correct_answer, question_type, hint, explanation)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+
+@llm_telemetry.call_site(llm_telemetry.QUIZ)
+def _generate_ai_questions(story_dict, regenerate=False):
     """
     Use the LLM to generate rich, story-specific quiz questions.
     Returns a list of question dicts or an empty list on failure.
+    regenerate=True skips the response cache so the user gets a new quiz.
     """
-    from routes.llm import get_llm_provider, generate_with_gemini, generate_with_openai, generate_with_groq
-    import os
+    from routes.llm import configured_providers, provider_generator
+    from routes.llm_cache import TTL_QUIZ
+    from routes.hedging import hedged_first
+    from functools import partial
 
     title = story_dict.get('title', 'this story')
     content = story_dict.get('content', '')
@@ -57,39 +84,22 @@ Story:
 """
     user_prompt = f"Generate 5 quiz questions for the story '{title}'."
 
-    # Try all available providers
-    providers_to_try = []
-    import os
-    if os.environ.get('GOOGLE_API_KEY'):
-        providers_to_try.append('gemini')
-    if os.environ.get('OPENAI_API_KEY'):
-        providers_to_try.append('openai')
-    if os.environ.get('GROQ_API_KEY'):
-        providers_to_try.append('groq')
-
-    for provider in providers_to_try:
-        try:
-            response_text = None
-            if provider == 'gemini':
-                response_text = generate_with_gemini(system_prompt, user_prompt, os.environ['GOOGLE_API_KEY'])
-            elif provider == 'openai':
-                response_text = generate_with_openai(system_prompt, user_prompt, os.environ['OPENAI_API_KEY'])
-            elif provider == 'groq':
-                response_text = generate_with_groq(system_prompt, user_prompt, os.environ['GROQ_API_KEY'])
-
-            if response_text:
-                clean = response_text.strip()
-                start = clean.find('{')
-                end = clean.rfind('}')
-                if start != -1 and end != -1:
-                    data = json.loads(clean[start:end + 1])
-                    questions = data.get('questions', [])
-                    if questions:
-                        logger.info(f"AI quiz generated {len(questions)} questions via {provider}")
-                        return questions
-        except Exception as e:
-            logger.warning(f"AI quiz generation failed with {provider}: {e}")
-
+    def parse(response_text):
+        # Repaired JSON; questions without a valid answer among their options are dropped
+        data = parse_llm_json(response_text, lists=('questions',), required=('questions',))
+        return data['questions'] if data else None
+
+    # Race the available providers; the first usable question list wins
+    candidates = []
+    for provider in configured_providers(candidates=['gemini', 'openai', 'groq']):
+        generate_fn, key = provider_generator(provider)
+        call = partial(generate_fn, system_prompt, user_prompt, key, cache_ttl=TTL_QUIZ, cache_bypass=regenerate)
+        candidates.append((provider, call))
+
+    provider, questions = hedged_first(candidates, parse)
+    if questions:
+        logger.info(f"AI quiz generated {len(questions)} questions via {provider}")
+        return questions
     return []
 
 
@@ -154,14 +164,38 @@ def _build_template_questions(story_dict):
     return questions
 
 
+def _load_questions(cursor, story_id):
+    """Saved quiz questions for a story, with options parsed"""
+    cursor.execute('''
+        SELECT id, question, options, correct_answer, question_type, hint, explanation
+        FROM quiz_questions
+        WHERE story_id = ?
+    ''', (story_id,))
+
+    questions = [dict(q) for q in cursor.fetchall()]
+
+    # Parse options (stored as JSON string)
+    for q in questions:
+        if q['options']:
+            try:
+                q['options'] = json.loads(q['options'])
+            except Exception:
+                try:
+                    q['options'] = eval(q['options'])  # backward compat
+                except Exception:
+                    q['options'] = []
+    return questions
+
+
 @bp.route('/generate/<int:story_id>', methods=['POST'])
+@deadline.with_deadline(deadline.INTERACTIVE_DEADLINE_SEC)
 def generate_quiz(story_id):
     """Generate quiz questions from a story. If regenerate=true in body, force re-generation."""
     try:
         body = request.get_json(silent=True) or {}
         force_regenerate = body.get('regenerate', False)
 
-        with get_db_context() as conn:
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
 
             # Get story details
@@ -172,76 +206,47 @@ def generate_quiz(story_id):
                 return jsonify({'success': False, 'error': 'Story not found'}), 404
 
             story_dict = dict(story)
+            questions = [] if force_regenerate else _load_questions(cursor, story_id)
+
+        if questions:
+            return jsonify({'success': True, 'questions': questions})
+
+        # === Generate New Questions ===
+        # No connection or transaction is held while the providers are called
+        generated_questions = []
 
-            # If force regenerate, delete old questions
+        # Stories written in combined mode already have their quiz; this
+        # cold path covers older stories, template stories and regeneration.
+        # Try AI generation first
+        try:
+            generated_questions.extend(_generate_ai_questions(story_dict, regenerate=force_regenerate))
+        except Exception as e:
+            logger.warning(f"AI quiz generation error: {e}")
+
+        # Pad with templates if AI didn't provide enough
+        if len(generated_questions) < MIN_QUESTIONS:
+            template_qs = _build_template_questions(story_dict)
+            # Only add template questions not already covered
+            generated_questions.extend(template_qs)
+
+        with get_db_context() as conn:
+            cursor = conn.cursor()
             if force_regenerate:
+                # Replace the old questions in the same short transaction as the save
                 cursor.execute('DELETE FROM quiz_questions WHERE story_id = ?', (story_id,))
                 logger.info(f"Deleted old quiz questions for story {story_id} (force regenerate)")
-
-            # Check if questions already exist
-            cursor.execute('SELECT COUNT(*) FROM quiz_questions WHERE story_id = ?', (story_id,))
-            existing_count = cursor.fetchone()[0]
+                existing_count = 0
+            else:
+                # A concurrent request may have saved a quiz while this one was generating
+                cursor.execute('SELECT COUNT(*) FROM quiz_questions WHERE story_id = ?', (story_id,))
+                existing_count = cursor.fetchone()[0]
 
             if existing_count == 0:
-                # === Generate New Questions ===
-                generated_questions = []
-
-                # Try AI generation first
-                try:
-                    ai_questions = _generate_ai_questions(story_dict)
-                    for q in ai_questions:
-                        generated_questions.append({
-                            'question': q.get('question', ''),
-                            'options': q.get('options', []),
-                            'correct_answer': q.get('correct_answer', ''),
-                            'hint': q.get('hint', 'Think carefully!'),
-                            'explanation': q.get('explanation', 'Great job! 🌟')
-                        })
-                except Exception as e:
-                    logger.warning(f"AI quiz generation error: {e}")
-
-                # Pad with templates if AI didn't provide enough
-                if len(generated_questions) < 3:
-                    template_qs = _build_template_questions(story_dict)
-                    # Only add template questions not already covered
-                    generated_questions.extend(template_qs)
-
-                # Save generated questions to DB
-                for q in generated_questions:
-                    opts = q.get('options', [])
-                    if isinstance(opts, list):
-                        random.shuffle(opts)
-                    cursor.execute('''
-                        INSERT INTO quiz_questions
-                        (story_id, question, options, correct_answer, question_type, hint, explanation)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (story_id, q['question'], json.dumps(opts),
-                          q['correct_answer'], 'mcq',
-                          q.get('hint', ''), q.get('explanation', '')))
-
+                save_questions(cursor, story_id, generated_questions)
                 logger.info(f"Saved {len(generated_questions)} quiz questions for story {story_id}")
+            questions = _load_questions(cursor, story_id)
 
-            # Fetch questions from DB
-            cursor.execute('''
-                SELECT id, question, options, correct_answer, question_type, hint, explanation
-                FROM quiz_questions
-                WHERE story_id = ?
-            ''', (story_id,))
-
-            questions = [dict(q) for q in cursor.fetchall()]
-
-            # Parse options (stored as JSON string)
-            for q in questions:
-                if q['options']:
-                    try:
-                        q['options'] = json.loads(q['options'])
-                    except Exception:
-                        try:
-                            q['options'] = eval(q['options'])  # backward compat
-                        except Exception:
-                            q['options'] = []
-
-            return jsonify({'success': True, 'questions': questions})
+        return jsonify({'success': True, 'questions': questions})
 
     except Exception as e:
         logger.error(f"Quiz generation error: {e}")
@@ -258,14 +263,13 @@ def record_attempt():
         attempt_number = data.get('attempt_number', 1)
         is_correct = data.get('is_correct', False)
 
-        with get_db_context() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO quiz_attempts (story_id, question_id, attempt_number, is_correct)
-                VALUES (?, ?, ?, ?)
-            ''', (story_id, question_id, attempt_number, is_correct))
+        # Fire-and-forget: rapid answer taps are batched into one commit
+        ost_writer.submit('''
+            INSERT INTO quiz_attempts (story_id, question_id, attempt_number, is_correct)
+            VALUES (?, ?, ?, ?)
+        ''', (story_id, question_id, attempt_number, is_correct))
 
-            return jsonify({'success': True, 'message': 'Attempt recorded!'})
+        return jsonify({'success': True, 'message': 'Attempt recorded!'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -287,14 +291,13 @@ def submit_quiz():
         if details:
             details_str = json.dumps(details)
 
-        with get_db_context() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO user_progress 
-                (story_id, activity_type, score, points_earned, points_possible, session_duration_sec, details)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (story_id, activity_type, score, points_earned, points_possible, duration, details_str))
+        # Durable: achievements and the dashboard read this row straight after
+        ost_writer.submit('''
+            INSERT INTO user_progress 
+            (story_id, activity_type, score, points_earned, points_possible, session_duration_sec, details)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (story_id, activity_type, score, points_earned, points_possible, duration, details_str), durable=True)
 
-            return jsonify({'success': True, 'message': 'Progress saved!'})
+        return jsonify({'success': True, 'message': 'Progress saved!'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
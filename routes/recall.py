@@ -4,7 +4,8 @@ Handles spaced repetition and writing exercises
 """
 
 from flask import Blueprint, jsonify, request
-from database import get_db_context
+from database import get_db_read_context
+from routes.story_pool import unpooled
 from datetime import datetime, timedelta
 import random
 
@@ -14,15 +15,15 @@ bp = Blueprint('recall', __name__)
 def get_due_stories():
     """Get stories due for review (read more than 24h ago)"""
     try:
-        with get_db_context() as conn:
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
             
             # Simple logic: stories read > 24 hours ago OR never reviewed
             # For now, let's just get stories read and sort by last_read ASC
-            cursor.execute('''
+            cursor.execute(f'''
                 SELECT id, title, theme, image_category, last_read
                 FROM stories
-                WHERE last_read IS NOT NULL
+                WHERE last_read IS NOT NULL AND {unpooled()}
                 ORDER BY last_read ASC
                 LIMIT 3
             ''')
@@ -87,7 +88,7 @@ def get_due_stories():
 def get_writing_prompt(story_id):
     """Get a writing prompt for a story"""
     try:
-        with get_db_context() as conn:
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT title, content, theme, moral, image_category FROM stories WHERE id = ?', (story_id,))
             story = cursor.fetchone()
@@ -201,7 +202,7 @@ def get_daily_progress():
         # Also use space instead of T for lexicographical comparison safety
         today_start = datetime.utcnow().strftime('%Y-%m-%d 00:00:00')
         
-        with get_db_context() as conn:
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
             
             # 1. Read a Story
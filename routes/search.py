@@ -0,0 +1,132 @@
+"""
+Search API Routes
+Full-text search over stories, story sentences and TinyStories (SQLite FTS5)
+"""
+
+from flask import Blueprint, jsonify, request
+from database import get_db_read_context
+from tinystories_db import get_ts_read_context
+from routes.story_pool import unpooled
+import html
+import re
+
+bp = Blueprint('search', __name__)
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+MAX_TERMS = 8
+
+# Private-use markers survive html.escape, then become <mark> tags
+_OPEN, _CLOSE = '\x02', '\x03'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(q):
+    """Turn free text into an FTS5 query: every word quoted, prefix-matched and ANDed"""
+    terms = _TOKEN_RE.findall(q or '')[:MAX_TERMS]
+    return ' '.join(f'"{t}"*' for t in terms)
+
+
+def _highlight(text):
+    if text is None:
+        return None
+    return html.escape(text).replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+
+
+def search_stories(cursor, match, limit):
+    cursor.execute(f'''
+        SELECT s.id, s.title,
+               highlight(stories_fts, 0, '{_OPEN}', '{_CLOSE}') AS title_html,
+               snippet(stories_fts, -1, '{_OPEN}', '{_CLOSE}', '…', 12) AS snippet,
+               bm25(stories_fts, 10.0, 1.0, 2.0) AS rank
+        FROM stories_fts
+        JOIN stories s ON s.id = stories_fts.rowid
+        WHERE stories_fts MATCH ? AND {unpooled('s')}
+        ORDER BY rank
+        LIMIT ?
+    ''', (match, limit))
+    return [{
+        'story_id': row['id'],
+        'title': row['title'],
+        'title_html': _highlight(row['title_html']),
+        'snippet': _highlight(row['snippet']),
+        'rank': row['rank']
+    } for row in cursor.fetchall()]
+
+
+def search_sentences(cursor, match, limit):
+    cursor.execute(f'''
+        SELECT ss.story_id, ss.sentence_order, s.title,
+               snippet(story_sentences_fts, -1, '{_OPEN}', '{_CLOSE}', '…', 16) AS snippet,
+               bm25(story_sentences_fts) AS rank
+        FROM story_sentences_fts
+        JOIN story_sentences ss ON ss.id = story_sentences_fts.rowid
+        JOIN stories s ON s.id = ss.story_id
+        WHERE story_sentences_fts MATCH ? AND {unpooled('s')}
+        ORDER BY rank
+        LIMIT ?
+    ''', (match, limit))
+    return [{
+        'story_id': row['story_id'],
+        'sentence_order': row['sentence_order'],
+        'title': row['title'],
+        'snippet': _highlight(row['snippet']),
+        'rank': row['rank']
+    } for row in cursor.fetchall()]
+
+
+def search_tinystories(cursor, match, limit):
+    cursor.execute(f'''
+        SELECT t.id, t.title, t.image_url,
+               highlight(tinystories_fts, 0, '{_OPEN}', '{_CLOSE}') AS title_html,
+               snippet(tinystories_fts, 1, '{_OPEN}', '{_CLOSE}', '…', 12) AS snippet,
+               bm25(tinystories_fts, 10.0, 1.0) AS rank
+        FROM tinystories_fts
+        JOIN tinystories t ON t.id = tinystories_fts.rowid
+        WHERE tinystories_fts MATCH ?
+        ORDER BY rank
+        LIMIT ?
+    ''', (match, limit))
+    return [{
+        'story_id': row['id'],
+        'title': row['title'],
+        'title_html': _highlight(row['title_html']),
+        'image_url': row['image_url'],
+        'snippet': _highlight(row['snippet']),
+        'rank': row['rank']
+    } for row in cursor.fetchall()]
+
+
+@bp.route('', methods=['GET'])
+def search():
+    """Ranked search: ?q=words[&limit=20][&types=stories,sentences,tinystories]"""
+    q = request.args.get('q', '')
+    match = build_match_query(q)
+    if not match:
+        return jsonify({'success': False, 'error': 'Query parameter q is required'}), 400
+
+    limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+    types = request.args.get('types', 'stories,sentences,tinystories').split(',')
+
+    try:
+        results = {}
+        with get_db_read_context() as conn:
+            cursor = conn.cursor()
+            if 'stories' in types:
+                results['stories'] = search_stories(cursor, match, limit)
+            if 'sentences' in types:
+                results['sentences'] = search_sentences(cursor, match, limit)
+        if 'tinystories' in types:
+            with get_ts_read_context() as conn:
+                results['tinystories'] = search_tinystories(conn.cursor(), match, limit)
+
+        return jsonify({
+            'success': True,
+            'query': q,
+            'results': results
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -5,10 +5,104 @@ Manage application settings and provider configuration
 
 from flask import Blueprint, jsonify, request
 from database import get_db_context
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+import threading
+import time
 import os
+from routes.llm_clients import reset_clients
 
 bp = Blueprint('settings', __name__)
 
+# How often (seconds) a worker re-checks the shared version counter.
+# Writes made by this process invalidate the cache immediately.
+SETTINGS_CHECK_INTERVAL = float(os.getenv('SETTINGS_CHECK_INTERVAL', 1.0))
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Typed view of the settings table"""
+    llm_provider: str = 'default'
+    story_tone: str = 'default'
+    tts_provider: str = 'default'
+    voice_preset: str = 'default'
+    reader_layout: str = 'classic'
+
+    @property
+    def llm(self):
+        """Split 'provider:model' into (provider, model) or (provider, None)"""
+        if ':' in self.llm_provider:
+            provider, model = self.llm_provider.split(':', 1)
+            return provider, model
+        return self.llm_provider, None
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    """One consistent read of the settings table; replaced whole, never edited"""
+    values: MappingProxyType
+    settings: Settings
+    version: int
+    checked_at: float
+
+
+_cache_lock = threading.Lock()
+# Readers take this reference once; reloads and invalidation swap it atomically
+_snapshot = None
+
+
+def _read_version(cursor):
+    cursor.execute('SELECT version FROM settings_version WHERE id = 1')
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def _fresh(snapshot, now):
+    return snapshot is not None and now - snapshot.checked_at < SETTINGS_CHECK_INTERVAL
+
+
+def _load_settings():
+    """Return the cached settings snapshot, reloading when another worker bumped the version"""
+    global _snapshot
+    now = time.monotonic()
+    snapshot = _snapshot
+    if _fresh(snapshot, now):
+        return snapshot
+
+    with _cache_lock:
+        snapshot = _snapshot
+        if _fresh(snapshot, now):
+            return snapshot
+        with get_db_context() as conn:
+            cursor = conn.cursor()
+            version = _read_version(cursor)
+            if snapshot is None or version != snapshot.version:
+                cursor.execute('SELECT key, value FROM settings')
+                values = {row['key']: row['value'] for row in cursor.fetchall()}
+                fields = {k: v for k, v in values.items() if k in Settings.__dataclass_fields__}
+                snapshot = _Snapshot(MappingProxyType(values), Settings(**fields), version, now)
+            else:
+                snapshot = replace(snapshot, checked_at=now)
+        _snapshot = snapshot
+    return snapshot
+
+
+def current_settings():
+    """Get the typed, cached settings"""
+    return _load_settings().settings
+
+
+def get_setting(key, default=None):
+    """Get one raw setting value from the cache, or default if the row is missing"""
+    return _load_settings().values.get(key, default)
+
+
+def invalidate_settings_cache():
+    """Force the next settings read in this process to go back to the database"""
+    global _snapshot
+    with _cache_lock:
+        _snapshot = None
+
 def get_available_providers():
     """Check environment for available API keys"""
     providers = {
@@ -39,27 +133,22 @@ def get_available_providers():
 def get_settings():
     """Get current settings and available providers"""
     try:
-        with get_db_context() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT key, value FROM settings')
-            rows = cursor.fetchall()
-            
-            settings = {row['key']: row['value'] for row in rows}
-            
-            api_keys = {
-                'google': os.environ.get('GOOGLE_API_KEY', ''),
-                'openai': os.environ.get('OPENAI_API_KEY', ''),
-                'groq': os.environ.get('GROQ_API_KEY', ''),
-                'abacus': os.environ.get('ABACUS_API_KEY', '') or os.environ.get('ABACUS_AI_API_KEY', ''),
-                'hf_token': os.environ.get('HF_TOKEN', '') or os.environ.get('HUGGINGFACE_API_KEY', '')
-            }
-            
-            return jsonify({
-                'success': True,
-                'settings': settings,
-                'available_providers': get_available_providers(),
-                'api_keys': api_keys
-            })
+        settings = dict(_load_settings().values)
+        
+        api_keys = {
+            'google': os.environ.get('GOOGLE_API_KEY', ''),
+            'openai': os.environ.get('OPENAI_API_KEY', ''),
+            'groq': os.environ.get('GROQ_API_KEY', ''),
+            'abacus': os.environ.get('ABACUS_API_KEY', '') or os.environ.get('ABACUS_AI_API_KEY', ''),
+            'hf_token': os.environ.get('HF_TOKEN', '') or os.environ.get('HUGGINGFACE_API_KEY', '')
+        }
+        
+        return jsonify({
+            'success': True,
+            'settings': settings,
+            'available_providers': get_available_providers(),
+            'api_keys': api_keys
+        })
     except Exception as e:
         return jsonify({
             'success': False,
@@ -84,6 +173,9 @@ def update_settings():
             with get_db_context() as conn:
                 cursor = conn.cursor()
                 cursor.executemany('INSERT OR REPLACE INTO settings (value, key) VALUES (?, ?)', updates)
+                # Bump the shared counter so other workers reload on their next check
+                cursor.execute('UPDATE settings_version SET version = version + 1 WHERE id = 1')
+            invalidate_settings_cache()
                 
         # Handle API keys update in .env and os.environ
         api_keys_to_update = {}
@@ -101,6 +193,9 @@ def update_settings():
                 elif k in os.environ:
                     del os.environ[k] # Clear it if passed empty string
 
+            # Cached provider clients hold the old keys
+            reset_clients()
+
             # Update .env file
             env_path = '.env'
             env_content = ""
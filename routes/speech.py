@@ -5,10 +5,15 @@ For text-to-speech and speech-to-text functionality
 
 from flask import Blueprint, jsonify, request
 import os
+import json
+import functools
 import uuid
 import hashlib
-import asyncio
 from database import get_db_context
+from write_behind import ost_writer
+from routes.settings import current_settings
+from routes import deadline
+from routes import async_providers
 
 bp = Blueprint('speech', __name__)
 
@@ -19,32 +24,13 @@ os.makedirs(AUDIO_DIR, exist_ok=True)
 def get_tts_config():
     """Get TTS configuration from settings"""
     try:
-        config = {'provider': 'default', 'voice_preset': 'default'}
-        with get_db_context() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT key, value FROM settings WHERE key IN ('tts_provider', 'voice_preset')")
-            rows = cursor.fetchall()
-            for key, value in rows:
-                if key == 'tts_provider': config['provider'] = value
-                if key == 'voice_preset': config['voice_preset'] = value
-        return config
+        settings = current_settings()
+        return {'provider': settings.tts_provider, 'voice_preset': settings.voice_preset}
     except:
         return {'provider': 'default', 'voice_preset': 'default'}
 
-async def _gen_edge(text, voice, outfile, rate):
-    import edge_tts
-    # Edge TTS voices: en-US-AnaNeural (Child), en-US-AriaNeural (Female), en-US-GuyNeural (Male)
-    # Rate string: "+0%" or "-10%"
-    rate_str = f"{int((rate - 1.0) * 100):+d}%"
-    try:
-        communicate = edge_tts.Communicate(text, voice, rate=rate_str)
-        await communicate.save(outfile)
-    except Exception as e:
-        print(f"EdgeTTS Async Error: {e}")
-        raise
-
 def generate_edge_tts(text, voice_preset, outfile, speed, is_raw_voice=False):
-    # Map presets to Edge voices
+    # Map presets to Edge voices: en-US-AnaNeural (Child), en-US-AriaNeural (Female), en-US-GuyNeural (Male)
     voices = {
         'default': 'en-US-AnaNeural', # Child-friendly default
         'ana': 'en-US-AnaNeural',
@@ -58,34 +44,14 @@ def generate_edge_tts(text, voice_preset, outfile, speed, is_raw_voice=False):
         voice = voices.get(voice_preset, 'en-US-AnaNeural')
     
     try:
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-        if loop.is_running():
-            # If loop is already running, run in a separate thread
-            import threading
-            def run_in_thread():
-                new_loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(new_loop)
-                new_loop.run_until_complete(_gen_edge(text, voice, outfile, speed))
-                new_loop.close()
-            
-            t = threading.Thread(target=run_in_thread)
-            t.start()
-            t.join()
-        else:
-             loop.run_until_complete(_gen_edge(text, voice, outfile, speed))
+        # edge_tts is async; it runs on the shared provider loop, bounded by the request budget
+        async_providers.run(async_providers.edge_tts_save(text, voice, outfile, speed))
     except Exception as e:
         print(f"EdgeTTS Execution Failed: {e}")
         raise
 
 def generate_openai_tts(text, voice_preset, outfile, speed):
-    try:
-        from openai import OpenAI
-    except ImportError:
+    if not async_providers.openai_available():
         return False
     
     # Map presets to OpenAI voices: alloy, echo, fable, onyx, nova, shimmer
@@ -100,17 +66,11 @@ def generate_openai_tts(text, voice_preset, outfile, speed):
     key = os.environ.get('OPENAI_API_KEY')
     if not key: return False
     
-    client = OpenAI(api_key=key)
-    response = client.audio.speech.create(
-        model="tts-1",
-        voice=voice,
-        input=text,
-        speed=speed
-    )
-    response.stream_to_file(outfile)
+    async_providers.run(async_providers.openai_speech(text, voice, outfile, speed, api_key=key))
     return True
 
 @bp.route('/tts', methods=['POST'])
+@deadline.with_deadline(deadline.INTERACTIVE_DEADLINE_SEC)
 def text_to_speech():
     """Convert text to speech and return audio file path."""
     try:
@@ -159,7 +119,7 @@ def text_to_speech():
         
         if not generated:
             from gtts import gTTS
-            tts = gTTS(text=text, lang=language if language in ('en', 'hi', 'es', 'fr', 'de') else 'en', slow=(speed < 0.8))
+            tts = gTTS(text=text, lang=language if language in ('en', 'hi', 'es', 'fr', 'de') else 'en', slow=(speed < 0.8), timeout=deadline.timeout())
             tts.save(filepath)
         
         return jsonify({'success': True, 'audio_url': f'/audio/{filename}', 'message': 'Audio generated successfully'})
@@ -200,7 +160,7 @@ def generate_audio_file(story_id, text_content, speed=1.0, language='en'):
         if not generated:
             try:
                 from gtts import gTTS
-                tts = gTTS(text=text_content, lang=language, slow=(speed < 0.8))
+                tts = gTTS(text=text_content, lang=language, slow=(speed < 0.8), timeout=deadline.timeout())
                 tts.save(filepath)
                 generated = True
             except: pass
@@ -218,6 +178,7 @@ def generate_audio_file(story_id, text_content, speed=1.0, language='en'):
         return False, str(e)
 
 @bp.route('/story/<int:story_id>', methods=['POST'])
+@deadline.with_deadline(deadline.STORY_DEADLINE_SEC)
 def full_story_audio(story_id):
     try:
         data = request.get_json(silent=True) or {}
@@ -247,6 +208,12 @@ def full_story_audio(story_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 def pregenerate_sentence_audio(story_id, speed=1.0):
+    """Generate every sentence clip of a story concurrently; returns when all are done"""
+    async_providers.fan_out(sentence_audio_jobs(story_id, speed))
+
+def sentence_audio_jobs(story_id, speed=1.0):
+    """One callable per missing sentence clip (English and translated), for async_providers.fan_out"""
+    jobs = {}
     try:
         target_language = 'en'
         with get_db_context() as conn:
@@ -264,20 +231,31 @@ def pregenerate_sentence_audio(story_id, speed=1.0):
         for row in sentences_data:
             eng_text = row[0]
             trans_text = row[1]
-            if eng_text: _generate_segment(eng_text, 'en', provider, voice, speed)
+            if eng_text:
+                _add_segment_job(jobs, eng_text, 'en', provider, voice, speed)
             if trans_text and target_language != 'en':
                  lang_voice = voice
                  if target_language == 'hi': lang_voice = 'hi-IN-SwaraNeural'
                  elif target_language == 'es': lang_voice = 'es-ES-ElviraNeural'
-                 _generate_segment(trans_text, target_language, provider, lang_voice, speed, is_raw_voice=True)
+                 _add_segment_job(jobs, trans_text, target_language, provider, lang_voice, speed, is_raw_voice=True)
     except: pass
+    return list(jobs.values())
+
+def _segment_path(text, lang, provider, voice, speed):
+    input_str = f"{provider}_{voice}_{speed}_{lang}_{text}"
+    file_hash = hashlib.md5(input_str.encode('utf-8')).hexdigest()
+    return os.path.join(AUDIO_DIR, f"tts_{file_hash}.mp3")
+
+def _add_segment_job(jobs, text, lang, provider, voice, speed, is_raw_voice=False):
+    # Keyed by file, so a repeated sentence is synthesized once rather than by two racing jobs
+    filepath = _segment_path(text, lang, provider, voice, speed)
+    if filepath not in jobs and not os.path.exists(filepath):
+        jobs[filepath] = functools.partial(_generate_segment, text, lang, provider, voice, speed,
+                                           is_raw_voice=is_raw_voice)
 
 def _generate_segment(text, lang, provider, voice, speed, is_raw_voice=False):
     try:
-        input_str = f"{provider}_{voice}_{speed}_{lang}_{text}"
-        file_hash = hashlib.md5(input_str.encode('utf-8')).hexdigest()
-        filename = f"tts_{file_hash}.mp3"
-        filepath = os.path.join(AUDIO_DIR, filename)
+        filepath = _segment_path(text, lang, provider, voice, speed)
         if os.path.exists(filepath): return
 
         if provider == 'edge_tts':
@@ -287,7 +265,7 @@ def _generate_segment(text, lang, provider, voice, speed, is_raw_voice=False):
         
         if not os.path.exists(filepath):
              from gtts import gTTS
-             tts = gTTS(text=text, lang=lang, slow=(speed < 0.8))
+             tts = gTTS(text=text, lang=lang, slow=(speed < 0.8), timeout=deadline.timeout())
              tts.save(filepath)
     except: pass
 
@@ -319,11 +297,8 @@ def evaluate_speech():
 
         if accuracy >= 70:
             try:
-                import json
-                from database import get_db_context
                 details = json.dumps({"expected": expected_text, "spoken": spoken_text})
-                with get_db_context() as conn:
-                    conn.execute('INSERT INTO user_progress (story_id, activity_type, score, details) VALUES (?, ?, ?, ?)', (0, 'practice', accuracy, details))
+                ost_writer.submit('INSERT INTO user_progress (story_id, activity_type, score, details) VALUES (?, ?, ?, ?)', (0, 'practice', accuracy, details))
             except: pass
         
         return jsonify({
@@ -3,29 +3,50 @@ Stories API Routes
 """
 
 from flask import Blueprint, jsonify, request
-from database import get_db_context
+from database import get_db_context, get_db_read_context
+from write_behind import ost_writer
+from routes.pagination import PaginationError, fetch_page, parse_fields, wants_all
+from routes.story_pool import unpooled
 from datetime import datetime
 
 bp = Blueprint('stories', __name__)
 
+STORY_LIST_FIELDS = ['id', 'title', 'theme', 'difficulty_level', 'image_category',
+                     'created_at', 'last_read']
+
 @bp.route('', methods=['GET'])
 def get_stories():
-    """Get all stories"""
+    """List stories, newest first (keyset paginated; ?all=1 for the full list)"""
     try:
-        with get_db_context() as conn:
+        fields = parse_fields(STORY_LIST_FIELDS)
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, title, theme, difficulty_level, image_category, 
-                       created_at, last_read
-                FROM stories
-                ORDER BY created_at DESC
-            ''')
-            stories = cursor.fetchall()
-            
+            if wants_all():
+                cursor.execute(f'''
+                    SELECT {', '.join(fields)}
+                    FROM stories
+                    WHERE {unpooled()}
+                    ORDER BY created_at DESC
+                ''')
+                return jsonify({
+                    'success': True,
+                    'stories': [dict(story) for story in cursor.fetchall()]
+                })
+
+            stories, next_cursor, has_more = fetch_page(
+                cursor, 'stories', fields, ('created_at', 'id'), where=unpooled())
+
             return jsonify({
                 'success': True,
-                'stories': [dict(story) for story in stories]
+                'stories': stories,
+                'next_cursor': next_cursor,
+                'has_more': has_more
             })
+    except PaginationError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -36,32 +57,19 @@ def get_stories():
 def get_story(story_id):
     """Get a specific story with sentences"""
     try:
-        with get_db_context() as conn:
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
             
             # Get story details
-            try:
-                cursor.execute('''
-                    SELECT id, title, content, moral, theme, difficulty_level, 
-                           image_category, vocab_json, created_at, last_read,
-                           translated_title, target_language, audio_speed
-                    FROM stories
-                    WHERE id = ?
-                ''', (story_id,))
-            except Exception:
-                cursor.execute('''
-                    SELECT id, title, content, moral, theme, difficulty_level, 
-                           image_category, vocab_json, created_at, last_read,
-                           translated_title, target_language
-                    FROM stories
-                    WHERE id = ?
-                ''', (story_id,))
+            cursor.execute('''
+                SELECT id, title, content, moral, theme, difficulty_level, 
+                       image_category, vocab_json, created_at, last_read,
+                       translated_title, target_language, audio_speed
+                FROM stories
+                WHERE id = ?
+            ''', (story_id,))
             story = cursor.fetchone()
-            if story:
-                story_dict = dict(story)
-                story_dict.setdefault('audio_speed', None)
-            else:
-                story_dict = None
+            story_dict = dict(story) if story else None
             
             if not story_dict:
                 return jsonify({
@@ -78,12 +86,13 @@ def get_story(story_id):
             ''', (story_id,))
             sentences = cursor.fetchall()
             
-            # Update last_read timestamp
-            cursor.execute('''
+            # Update last_read timestamp off the request path; repeat reads of
+            # the same story before the next flush collapse into one UPDATE
+            ost_writer.submit('''
                 UPDATE stories
                 SET last_read = ?
                 WHERE id = ?
-            ''', (datetime.now(), story_id))
+            ''', (datetime.now(), story_id), key=('stories.last_read', story_id))
             
             story_dict['sentences'] = [dict(s) for s in sentences]
             
@@ -118,6 +127,7 @@ def delete_stories_batch():
             
             # Delete sentences
             cursor.execute(f'DELETE FROM story_sentences WHERE story_id IN ({placeholders})', story_ids)
+            cursor.execute(f'DELETE FROM story_pool WHERE story_id IN ({placeholders})', story_ids)
             
             # Delete stories
             cursor.execute(f'DELETE FROM stories WHERE id IN ({placeholders})', story_ids)
@@ -165,6 +175,7 @@ def delete_story(story_id):
             
             # Delete sentences first
             cursor.execute('DELETE FROM story_sentences WHERE story_id = ?', (story_id,))
+            cursor.execute('DELETE FROM story_pool WHERE story_id = ?', (story_id,))
             
             # Delete story
             cursor.execute('DELETE FROM stories WHERE id = ?', (story_id,))
@@ -214,13 +225,14 @@ def delete_story(story_id):
 def get_random_sentence():
     """Get a random sentence for practice from story library"""
     try:
-        with get_db_context() as conn:
+        with get_db_read_context() as conn:
             cursor = conn.cursor()
             
             # Get a random sentence from story_sentences table
-            cursor.execute('''
+            cursor.execute(f'''
                 SELECT sentence_text 
                 FROM story_sentences 
+                WHERE {unpooled('story_sentences', 'story_id')}
                 ORDER BY RANDOM() 
                 LIMIT 1
             ''')
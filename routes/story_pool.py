@@ -0,0 +1,282 @@
+"""
+Ready-Story Pool
+Keeps a few fully built stories (text, sentences, audio and images) per
+(language, length, tone, layout, speed) so /api/generator/random can hand one
+over with a single DELETE ... RETURNING instead of a full generation round
+trip. A background replenisher refills a combination after each claim; a
+build slot row in story_pool_builds makes sure only one process (or thread)
+builds for a combination at a time. Pooled stories are hidden from the
+library until they are claimed, and builds that never finish are deleted.
+Off unless STORY_POOL_DEPTH is set.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from database import get_db_context, get_db_read_context
+from routes import deadline
+
+logger = logging.getLogger(__name__)
+
+# Ready stories to keep per combination; 0 (the default) turns the pool off
+POOL_DEPTH = int(os.getenv('STORY_POOL_DEPTH', 0))
+# Combinations to fill at startup, "language:length:speed" comma-separated (e.g. "en:short:0.8")
+WARM = os.getenv('STORY_POOL_WARM', '')
+# Re-check the pool this often even without a claim, and back off this long after a failed build
+IDLE_CHECK_SEC = 60
+FAILURE_BACKOFF_SEC = 30
+LAG_WINDOW = 100
+# A build slot (and its half-built story) older than this belongs to a build that died
+BUILD_LEASE_SEC = 2 * deadline.STORY_DEADLINE_SEC
+
+CLAIM = '''
+    DELETE FROM story_pool
+    WHERE story_id = (
+        SELECT story_id FROM story_pool
+        WHERE pool_key = ? AND ready_at IS NOT NULL
+        ORDER BY ready_at
+        LIMIT 1
+    )
+    RETURNING story_id
+'''
+
+# Take the build slot for a key unless another live build holds it
+CLAIM_SLOT = '''
+    INSERT INTO story_pool_builds (pool_key, owner, started_at) VALUES (?, ?, ?)
+    ON CONFLICT (pool_key) DO UPDATE SET owner = excluded.owner, started_at = excluded.started_at
+    WHERE story_pool_builds.started_at < ?
+    RETURNING owner
+'''
+
+
+def unpooled(alias='stories', column='id'):
+    """SQL condition: the story `{alias}.{column}` refers to is not sitting unclaimed (or half built) in the pool"""
+    return f'NOT EXISTS (SELECT 1 FROM story_pool pooled WHERE pooled.story_id = {alias}.{column})'
+
+
+def pool_key(language, length, speed, tone, layout):
+    return f"{language}|{length}|{tone}|{layout}|{float(speed):.2f}"
+
+
+def current_variant():
+    """Tone and reader layout change what a built story looks like, so they are part of the key"""
+    from routes.llm import get_story_tone
+    from routes.settings import current_settings
+    try:
+        layout = current_settings().reader_layout
+    except Exception:
+        layout = 'classic'
+    return get_story_tone(), layout
+
+
+def add_pending(cursor, story_id, key):
+    """Called inside the story's INSERT transaction, so it is never visible unpooled"""
+    cursor.execute('INSERT INTO story_pool (story_id, pool_key, created_at) VALUES (?, ?, ?)',
+                   (story_id, key, time.time()))
+
+
+def mark_ready(story_id):
+    with get_db_context() as conn:
+        conn.execute('UPDATE story_pool SET ready_at = ? WHERE story_id = ?', (time.time(), story_id))
+
+
+def discard_stories(cursor, story_ids):
+    """Delete pooled stories that never became ready, with everything saved for them"""
+    if not story_ids:
+        return
+    placeholders = ', '.join('?' * len(story_ids))
+    for table in ('story_sentences', 'quiz_questions', 'story_pool'):
+        cursor.execute(f'DELETE FROM {table} WHERE story_id IN ({placeholders})', story_ids)
+    cursor.execute(f'DELETE FROM stories WHERE id IN ({placeholders})', story_ids)
+
+
+def _default_builder(language, length, speed, key):
+    from routes.generator import build_pooled_story
+    return build_pooled_story(language, length, speed, key)
+
+
+class StoryPool:
+    """Claims pooled stories and runs the background replenisher"""
+
+    def __init__(self, depth=POOL_DEPTH, builder=_default_builder):
+        self.depth = depth
+        self._builder = builder
+        self._wanted = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        # Claim times per key still waiting for their replacement
+        self._refills = {}
+        self._lags = deque(maxlen=LAG_WINDOW)
+        self.stats = {'hits': 0, 'misses': 0, 'builds': 0, 'build_failures': 0, 'build_sec': 0.0}
+
+    @property
+    def enabled(self):
+        return self.depth > 0
+
+    def want(self, language, length, speed):
+        """Keep this combination filled from now on"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._wanted.setdefault((language, length, float(speed)), True)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='story-pool', daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def claim(self, language, length, speed):
+        """
+        Take the oldest ready story for this combination, or None. The story
+        is moved to the top of the library and a refill is queued either way.
+        """
+        if not self.enabled:
+            return None
+        key = pool_key(language, length, speed, *current_variant())
+        with get_db_context() as conn:
+            claimed = conn.execute(CLAIM, (key,)).fetchall()
+            story = None
+            if claimed:
+                story = conn.execute('''
+                    UPDATE stories SET created_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                    RETURNING id, title, vocab_json
+                ''', (claimed[0][0],)).fetchall()
+        with self._lock:
+            if story:
+                self.stats['hits'] += 1
+                self._refills.setdefault(key, deque()).append(time.monotonic())
+            else:
+                self.stats['misses'] += 1
+        self.want(language, length, speed)
+        return dict(story[0]) if story else None
+
+    def replenish(self):
+        """Build stories until every wanted combination is at depth (replenisher thread, tests)"""
+        while True:
+            slot = self._claim_slot()
+            if slot is None:
+                return True
+            if not self._build(*slot):
+                return False
+
+    def _claim_slot(self):
+        """
+        The first wanted combination below depth whose build slot this process
+        could take, or None. The slot is taken before the count is read, in the
+        same write transaction, so a build finishing elsewhere cannot be missed.
+        """
+        tone, layout = current_variant()
+        with self._lock:
+            wanted = list(self._wanted)
+        for language, length, speed in wanted:
+            key = pool_key(language, length, speed, tone, layout)
+            owner, now = uuid.uuid4().hex, time.time()
+            with get_db_context() as conn:
+                if not conn.execute(CLAIM_SLOT, (key, owner, now, now - BUILD_LEASE_SEC)).fetchall():
+                    continue
+                count = conn.execute('SELECT COUNT(*) FROM story_pool WHERE pool_key = ?', (key,)).fetchone()[0]
+                if count < self.depth:
+                    return language, length, speed, key, owner, now
+                conn.execute('DELETE FROM story_pool_builds WHERE pool_key = ? AND owner = ?', (key, owner))
+        return None
+
+    def _build(self, language, length, speed, key, owner, slot_started):
+        started = time.monotonic()
+        try:
+            with deadline.deadline(deadline.STORY_DEADLINE_SEC):
+                story_id = self._builder(language, length, speed, key)
+        except Exception as e:
+            self.stats['build_failures'] += 1
+            logger.exception(f"Story pool build for {key} failed: {e}")
+            self._release_slot(key, owner, discard_since=slot_started)
+            return False
+        self._release_slot(key, owner)
+        finished = time.monotonic()
+        with self._lock:
+            self.stats['builds'] += 1
+            self.stats['build_sec'] += finished - started
+            waiting = self._refills.get(key)
+            if waiting:
+                self._lags.append(finished - waiting.popleft())
+        logger.info(f"Story pool: story {story_id} ready for {key} in {finished - started:.1f}s")
+        return True
+
+    def _release_slot(self, key, owner, discard_since=None):
+        """Free the build slot; after a failed build also delete the story it left half built"""
+        try:
+            with get_db_context() as conn:
+                cursor = conn.cursor()
+                if discard_since is not None:
+                    cursor.execute('''
+                        SELECT story_id FROM story_pool
+                        WHERE pool_key = ? AND ready_at IS NULL AND created_at >= ?
+                    ''', (key, discard_since))
+                    discard_stories(cursor, [row[0] for row in cursor.fetchall()])
+                cursor.execute('DELETE FROM story_pool_builds WHERE pool_key = ? AND owner = ?', (key, owner))
+        except Exception as e:
+            logger.warning(f"Story pool could not release the build slot for {key}: {e}")
+
+    def _run(self):
+        while True:
+            self.discard_orphans()
+            if self.replenish():
+                self._wake.wait(IDLE_CHECK_SEC)
+            else:
+                self._wake.wait(FAILURE_BACKOFF_SEC)
+            self._wake.clear()
+
+    def discard_orphans(self):
+        """Builds cut short by a crash or restart never became ready; delete those stories"""
+        stale = time.time() - BUILD_LEASE_SEC
+        try:
+            with get_db_context() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT story_id FROM story_pool WHERE ready_at IS NULL AND created_at < ?', (stale,))
+                discard_stories(cursor, [row[0] for row in cursor.fetchall()])
+        except Exception as e:
+            logger.warning(f"Story pool cleanup failed: {e}")
+
+    def snapshot(self):
+        with get_db_read_context() as conn:
+            rows = conn.execute('''
+                SELECT pool_key, COUNT(ready_at) AS ready, COUNT(*) - COUNT(ready_at) AS building
+                FROM story_pool GROUP BY pool_key
+            ''').fetchall()
+        with self._lock:
+            stats = dict(self.stats)
+            lags = sorted(self._lags)
+            wanted = [f"{language}:{length}:{speed}" for language, length, speed in self._wanted]
+        claims = stats['hits'] + stats['misses']
+        builds = stats.pop('build_sec')
+        return {
+            'enabled': self.enabled,
+            'depth_target': self.depth,
+            'pools': {row['pool_key']: {'ready': row['ready'], 'building': row['building']} for row in rows},
+            'wanted': wanted,
+            **stats,
+            'hit_rate': round(stats['hits'] / claims, 3) if claims else 0.0,
+            'avg_build_sec': round(builds / stats['builds'], 2) if stats['builds'] else None,
+            'refill_lag_p50_sec': round(lags[len(lags) // 2], 2) if lags else None,
+            'refill_lag_max_sec': round(lags[-1], 2) if lags else None
+        }
+
+
+story_pool = StoryPool()
+
+
+def warm():
+    """Called at app startup: start filling the STORY_POOL_WARM combinations"""
+    if not WARM or multiprocessing.parent_process() is not None:
+        return
+    for spec in WARM.split(','):
+        try:
+            language, length, speed = spec.strip().split(':')
+            story_pool.want(language, length, float(speed))
+        except ValueError:
+            logger.warning(f"Ignoring STORY_POOL_WARM entry '{spec}' (expected language:length:speed)")
@@ -1,17 +1,67 @@
 from flask import Blueprint, jsonify, request
 import json
+import functools
 import threading
 import os
 import random
-from tinystories_db import get_ts_db_context
+from tinystories_db import get_ts_db_context, get_ts_read_context
+from routes.pagination import PaginationError, fetch_page, parse_fields, wants_all
 from routes.llm import get_tinystories, extract_metadata_and_questions
+from routes.tinystories_engine import story_prompt
 from routes.generator import RANDOM_TOPICS
 from routes.images import generate_image_hf, generate_image_openai, generate_image_google, IMAGE_DIR
 from routes.speech import generate_audio_file
+from routes import async_providers, deadline
 
 bp = Blueprint('tinystories', __name__)
 
+def _image_job(sid, t, c):
+    filename = f"tinystory_{sid}.png"
+    filepath = os.path.join(IMAGE_DIR, filename)
+    prompt = f"Children's story book illustration about: {t}. Beautiful watercolor, simple, bright. Context: {c[:200]}"
+    public_url = f"/images/stories/{filename}"
+    image_success = False
+
+    try:
+        if generate_image_hf(prompt, filepath): image_success = True
+    except Exception as e: print(f"TS Image HF Gen Failed: {e}")
+
+    if not image_success and os.environ.get('OPENAI_API_KEY'):
+        try:
+            if generate_image_openai(prompt, filepath): image_success = True
+        except Exception as e: print(f"TS Image OpenAI Gen Failed: {e}")
+
+    if not image_success and os.environ.get('GOOGLE_API_KEY'):
+        try:
+            if generate_image_google(prompt, filepath): image_success = True
+        except Exception as e: print(f"TS Image Google Gen Failed: {e}")
+
+    if image_success:
+        try:
+            with get_ts_db_context() as conn:
+                conn.execute("UPDATE tinystories SET image_url = ? WHERE id = ?", (public_url, sid))
+        except Exception as e:
+            print(f"TS Image DB Update Failed: {e}")
+
+def _audio_job(sid, c, spd):
+    try:
+        # Use a unique prefix to avoid ID collisions in global audio cache
+        success, result = generate_audio_file(f"ts_story_{sid}", c, speed=spd, language='en')
+        if success:
+            with get_ts_db_context() as conn:
+                conn.execute("UPDATE tinystories SET audio_url = ? WHERE id = ?", (result, sid))
+    except Exception as e:
+        print(f"TS Audio Gen Failed: {e}")
+
+def background_assets(sid, t, c, spd):
+    """Image and audio for a TinyStories story, generated concurrently"""
+    async_providers.fan_out([
+        functools.partial(_image_job, sid, t, c),
+        functools.partial(_audio_job, sid, c, spd),
+    ])
+
 @bp.route('/generate', methods=['POST'])
+@deadline.with_deadline(deadline.STORY_DEADLINE_SEC)
 def generate():
     data = request.json or {}
     topic = data.get('topic', 'a friendly dog')
@@ -24,7 +74,7 @@ def generate():
     if not local_pipe:
         return jsonify({"success": False, "error": "TinyStories local model not loaded."}), 500
 
-    prompt = f"Once upon a time, there was a {topic}."
+    prompt = story_prompt(topic)
     # Set a high enough max tokens to let the model generate the full story naturally
     max_new_tokens = 400
     try:
@@ -81,46 +131,8 @@ def generate():
                                 occurrence_count = occurrence_count + 1
                         ''', (word, meaning))
 
-        def background_assets(sid, t, c, spd):
-            # Image
-            filename = f"tinystory_{sid}.png"
-            filepath = os.path.join(IMAGE_DIR, filename)
-            prompt = f"Children's story book illustration about: {t}. Beautiful watercolor, simple, bright. Context: {c[:200]}"
-            public_url = f"/images/stories/{filename}"
-            image_success = False
-
-            try:
-                if generate_image_hf(prompt, filepath): image_success = True
-            except Exception as e: print(f"TS Image HF Gen Failed: {e}")
-
-            if not image_success and os.environ.get('OPENAI_API_KEY'):
-                try:
-                    if generate_image_openai(prompt, filepath): image_success = True
-                except Exception as e: print(f"TS Image OpenAI Gen Failed: {e}")
-                
-            if not image_success and os.environ.get('GOOGLE_API_KEY'):
-                try:
-                    if generate_image_google(prompt, filepath): image_success = True
-                except Exception as e: print(f"TS Image Google Gen Failed: {e}")
-
-            if image_success:
-                try:
-                    with get_ts_db_context() as conn:
-                        conn.execute("UPDATE tinystories SET image_url = ? WHERE id = ?", (public_url, sid))
-                except Exception as e:
-                    print(f"TS Image DB Update Failed: {e}")
-                
-            # Audio
-            try:
-                # Use a unique prefix to avoid ID collisions in global audio cache
-                success, result = generate_audio_file(f"ts_story_{sid}", c, speed=spd, language='en')
-                if success:
-                    with get_ts_db_context() as conn:
-                        conn.execute("UPDATE tinystories SET audio_url = ? WHERE id = ?", (result, sid))
-            except Exception as e:
-                print(f"TS Audio Gen Failed: {e}")
-        
-        threading.Thread(target=background_assets, args=(story_id, topic, content, speed)).start()
+        threading.Thread(target=deadline.propagate(background_assets), args=(story_id, topic, content, speed),
+                         daemon=True).start()
             
         return jsonify({
             "success": True,
@@ -132,21 +144,28 @@ def generate():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+TS_LIST_FIELDS = ['id', 'title', 'image_url', 'created_at']
+
 @bp.route('/', methods=['GET'])
 def list_stories():
     try:
-        with get_ts_db_context() as conn:
+        fields = parse_fields(TS_LIST_FIELDS)
+        with get_ts_read_context() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT id, title, image_url, created_at FROM tinystories ORDER BY id DESC')
-            stories = [dict(row) for row in cursor.fetchall()]
-        return jsonify({"success": True, "stories": stories})
+            if wants_all():
+                cursor.execute(f'SELECT {", ".join(fields)} FROM tinystories ORDER BY id DESC')
+                return jsonify({"success": True, "stories": [dict(row) for row in cursor.fetchall()]})
+            stories, next_cursor, has_more = fetch_page(cursor, 'tinystories', fields, ('id',))
+        return jsonify({"success": True, "stories": stories, "next_cursor": next_cursor, "has_more": has_more})
+    except PaginationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
 @bp.route('/<int:story_id>', methods=['GET'])
 def get_story(story_id):
     try:
-        with get_ts_db_context() as conn:
+        with get_ts_read_context() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM tinystories WHERE id = ?', (story_id,))
             row = cursor.fetchone()
@@ -165,6 +184,7 @@ def get_story(story_id):
          return jsonify({"success": False, "error": str(e)}), 500
 
 @bp.route('/assets/<int:story_id>', methods=['POST'])
+@deadline.with_deadline(deadline.STORY_DEADLINE_SEC)
 def generate_assets(story_id):
     try:
         with get_ts_db_context() as conn:
@@ -178,45 +198,8 @@ def generate_assets(story_id):
             content = row['content']
             speed = row['audio_speed'] or 0.8
             
-        def background_assets(sid, t, c, spd):
-            # Image
-            filename = f"tinystory_{sid}.png"
-            filepath = os.path.join(IMAGE_DIR, filename)
-            prompt = f"Children's story book illustration about: {t}. Beautiful watercolor, simple, bright. Context: {c[:200]}"
-            public_url = f"/images/stories/{filename}"
-            image_success = False
-
-            try:
-                if generate_image_hf(prompt, filepath): image_success = True
-            except Exception as e: print(f"TS Image HF Gen Failed: {e}")
-
-            if not image_success and os.environ.get('OPENAI_API_KEY'):
-                try:
-                    if generate_image_openai(prompt, filepath): image_success = True
-                except Exception as e: print(f"TS Image OpenAI Gen Failed: {e}")
-                
-            if not image_success and os.environ.get('GOOGLE_API_KEY'):
-                try:
-                    if generate_image_google(prompt, filepath): image_success = True
-                except Exception as e: print(f"TS Image Google Gen Failed: {e}")
-
-            if image_success:
-                try:
-                    with get_ts_db_context() as conn:
-                        conn.execute("UPDATE tinystories SET image_url = ? WHERE id = ?", (public_url, sid))
-                except Exception as e:
-                    print(f"TS Image DB Update Failed: {e}")
-                
-            # Audio
-            try:
-                success, result = generate_audio_file(f"ts_story_{sid}", c, speed=spd, language='en')
-                if success:
-                    with get_ts_db_context() as conn:
-                        conn.execute("UPDATE tinystories SET audio_url = ? WHERE id = ?", (result, sid))
-            except Exception as e:
-                print(f"TS Audio Gen Failed: {e}")
-        
-        threading.Thread(target=background_assets, args=(story_id, title, content, speed)).start()
+        threading.Thread(target=deadline.propagate(background_assets), args=(story_id, title, content, speed),
+                         daemon=True).start()
         return jsonify({"success": True, "message": "Asset generation started in background."})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -275,7 +258,7 @@ def get_scramble_sentences(story_id):
         chunk_sizes = {'easy': 4, 'medium': 6, 'hard': 100}  # 100 = full sentence
         chunk_size = chunk_sizes.get(difficulty, 4)
         
-        with get_ts_db_context() as conn:
+        with get_ts_read_context() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT title, content FROM tinystories WHERE id = ?', (story_id,))
             row = cursor.fetchone()
@@ -337,14 +320,21 @@ def get_adaptive_scramble():
 
 
 
+VOCAB_FIELDS = ['id', 'word', 'meaning', 'status', 'last_seen', 'occurrence_count']
+
 @bp.route('/vocabulary', methods=['GET'])
 def list_vocabulary():
     try:
-        with get_ts_db_context() as conn:
+        fields = parse_fields(VOCAB_FIELDS)
+        with get_ts_read_context() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM vocabulary_progress ORDER BY last_seen DESC')
-            vocab = [dict(row) for row in cursor.fetchall()]
-        return jsonify({"success": True, "vocabulary": vocab})
+            if wants_all():
+                cursor.execute(f'SELECT {", ".join(fields)} FROM vocabulary_progress ORDER BY last_seen DESC')
+                return jsonify({"success": True, "vocabulary": [dict(row) for row in cursor.fetchall()]})
+            vocab, next_cursor, has_more = fetch_page(cursor, 'vocabulary_progress', fields, ('last_seen', 'id'))
+        return jsonify({"success": True, "vocabulary": vocab, "next_cursor": next_cursor, "has_more": has_more})
+    except PaginationError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
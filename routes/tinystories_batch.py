@@ -0,0 +1,305 @@
+"""
+Micro-batched TinyStories Inference
+A dedicated worker process owns the local model. Requests from Flask threads
+go onto a queue; the worker gathers whatever arrives within a short window
+(up to a maximum batch size), runs it as one left-padded batch through
+generate() and sends each story back, where it resolves the caller's future.
+One process with one torch thread pool replaces many request threads
+contending for the GIL and oversubscribing cores.
+"""
+
+import atexit
+import importlib
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH = int(os.getenv('TINYSTORIES_MAX_BATCH', 8))
+MAX_WAIT_MS = float(os.getenv('TINYSTORIES_MAX_WAIT_MS', 25))
+# How long the worker may take to load the model before the engine gives up
+START_TIMEOUT_SEC = float(os.getenv('TINYSTORIES_WORKER_START_SEC', 600))
+
+# Rolling windows for the metrics
+LATENCY_WINDOW = 500
+THROUGHPUT_WINDOW_SEC = 60
+
+DEFAULT_FACTORY = 'routes.tinystories_batch:model_generator'
+
+
+def gather_batch(requests, max_batch, max_wait):
+    """
+    Block for the first request, then take whatever else arrives within
+    max_wait seconds, up to max_batch. Returns None on the shutdown sentinel.
+    """
+    first = requests.get()
+    if first is None:
+        return None
+    batch = [first]
+    until = time.monotonic() + max_wait
+    while len(batch) < max_batch:
+        left = until - time.monotonic()
+        if left <= 0:
+            break
+        try:
+            item = requests.get(timeout=left)
+        except queue.Empty:
+            break
+        if item is None:
+            # Finish this batch, then stop
+            requests.put(None)
+            break
+        batch.append(item)
+    return batch
+
+
+def group_requests(batch):
+    """Requests can only share a generate() call when their sampling settings match"""
+    groups = {}
+    for request_id, prompt, params in batch:
+        key = (params.get('do_sample', True), params.get('temperature', 0.7), params.get('repetition_penalty', 1.1))
+        groups.setdefault(key, []).append((request_id, prompt, params.get('max_new_tokens', 400)))
+    return groups
+
+
+def model_generator(config):
+    """Load the model in the worker; returns generate_batch(prompts, max_new_tokens, **sampling)"""
+    import torch
+    from routes.tinystories_engine import TOP_K, load_pipeline
+
+    pipe = load_pipeline(config['model_name'], config['backend'])
+    torch.set_num_threads(config['threads'])
+    model, tokenizer = pipe.model, pipe.tokenizer
+    # Decoder-only models continue from the right edge, so pad on the left
+    tokenizer.padding_side = 'left'
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    eos = tokenizer.eos_token_id
+
+    def generate_batch(prompts, max_new_tokens, do_sample=True, temperature=0.7, repetition_penalty=1.1):
+        encoded = tokenizer(prompts, return_tensors='pt', padding=True)
+        sampling = {'temperature': temperature, 'top_k': TOP_K} if do_sample else {}
+        with torch.no_grad():
+            output = model.generate(**encoded, max_new_tokens=max(max_new_tokens), do_sample=do_sample,
+                                    repetition_penalty=repetition_penalty, pad_token_id=eos, **sampling)
+        width = encoded['input_ids'].shape[1]
+        texts, tokens = [], 0
+        for row, (prompt, limit) in enumerate(zip(prompts, max_new_tokens)):
+            new_ids = output[row, width:width + limit].tolist()
+            if eos in new_ids:
+                new_ids = new_ids[:new_ids.index(eos)]
+            tokens += len(new_ids)
+            texts.append(prompt + tokenizer.decode(new_ids, skip_special_tokens=True))
+        return texts, tokens
+
+    return generate_batch
+
+
+def _load_factory(path):
+    module, name = path.split(':')
+    return getattr(importlib.import_module(module), name)
+
+
+def _worker_main(requests, results, config):
+    """Worker process loop: load, report ready, then serve batches until the sentinel"""
+    try:
+        generate_batch = _load_factory(config['factory'])(config)
+    except Exception as e:
+        results.put(('failed', None, str(e), None))
+        return
+    results.put(('ready', None, None, None))
+
+    max_wait = config['max_wait_ms'] / 1000.0
+    while True:
+        batch = gather_batch(requests, config['max_batch'], max_wait)
+        if batch is None:
+            return
+        for (do_sample, temperature, repetition_penalty), items in group_requests(batch).items():
+            started = time.perf_counter()
+            try:
+                texts, tokens = generate_batch([prompt for _, prompt, _ in items], [limit for _, _, limit in items],
+                                               do_sample=do_sample, temperature=temperature,
+                                               repetition_penalty=repetition_penalty)
+            except Exception as e:
+                for request_id, _, _ in items:
+                    results.put(('error', request_id, str(e), None))
+                continue
+            results.put(('batch', None, None, {'size': len(items), 'sec': time.perf_counter() - started,
+                                                'tokens': tokens}))
+            for (request_id, _, _), text in zip(items, texts):
+                results.put(('done', request_id, text, None))
+
+
+class BatchStats:
+    """Throughput and latency counters kept on the Flask side"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.completed = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.largest_batch = 0
+        self.tokens = 0
+        self.busy_sec = 0.0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._finished = deque()
+
+    def submitted(self):
+        with self._lock:
+            self.requests += 1
+
+    def batch(self, info):
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += info['size']
+            self.largest_batch = max(self.largest_batch, info['size'])
+            self.tokens += info['tokens']
+            self.busy_sec += info['sec']
+
+    def finished(self, latency, ok):
+        now = time.monotonic()
+        with self._lock:
+            if not ok:
+                self.errors += 1
+                return
+            self.completed += 1
+            self._latencies.append(latency)
+            self._finished.append(now)
+            while self._finished and now - self._finished[0] > THROUGHPUT_WINDOW_SEC:
+                self._finished.popleft()
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            recent = [t for t in self._finished if time.monotonic() - t <= THROUGHPUT_WINDOW_SEC]
+
+            def percentile(q):
+                return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000) if latencies else None
+            return {
+                'requests': self.requests,
+                'completed': self.completed,
+                'errors': self.errors,
+                'batches': self.batches,
+                'avg_batch_size': round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+                'largest_batch': self.largest_batch,
+                'latency_p50_ms': percentile(0.5),
+                'latency_p95_ms': percentile(0.95),
+                'stories_per_sec': round(len(recent) / THROUGHPUT_WINDOW_SEC, 3),
+                'tokens_per_sec': round(self.tokens / self.busy_sec, 1) if self.busy_sec else 0.0
+            }
+
+
+class BatchedInference:
+    """Flask-side handle on the worker process: submit() returns a Future"""
+
+    def __init__(self, model_name, backend, threads, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS,
+                 factory=DEFAULT_FACTORY):
+        self.config = {'model_name': model_name, 'backend': backend, 'threads': threads,
+                       'max_batch': max_batch, 'max_wait_ms': max_wait_ms, 'factory': factory}
+        # spawn, not fork: the parent already runs threads and may hold torch state
+        self._ctx = multiprocessing.get_context('spawn')
+        self._requests = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        self._process = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self.error = None
+        self.stats = BatchStats()
+
+    def start(self, timeout=START_TIMEOUT_SEC):
+        """Start the worker and block until its model is loaded"""
+        self._process = self._ctx.Process(target=_worker_main, args=(self._requests, self._results, self.config),
+                                          name='tinystories-worker', daemon=True)
+        self._process.start()
+        threading.Thread(target=self._listen, name='tinystories-results', daemon=True).start()
+        atexit.register(self.stop)
+        if not self._ready.wait(timeout):
+            self.error = self.error or f'worker did not start within {timeout}s'
+        if self.error:
+            self.stop()
+            raise RuntimeError(f'TinyStories worker failed to start: {self.error}')
+
+    @property
+    def alive(self):
+        return self._process is not None and self._process.is_alive() and self.error is None
+
+    def submit(self, prompt, max_new_tokens=400, do_sample=True, temperature=0.7, repetition_penalty=1.1):
+        if not self.alive:
+            raise RuntimeError(f'TinyStories worker is not running ({self.error or "stopped"})')
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            self._pending[request_id] = (future, time.monotonic())
+        self.stats.submitted()
+        self._requests.put((request_id, prompt, {'max_new_tokens': max_new_tokens, 'do_sample': do_sample,
+                                                 'temperature': temperature,
+                                                 'repetition_penalty': repetition_penalty}))
+        return future
+
+    def _listen(self):
+        while True:
+            try:
+                kind, request_id, payload, info = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    self._fail_pending(self.error or 'worker exited')
+                    self._ready.set()
+                    return
+                continue
+            except (EOFError, OSError):
+                self._fail_pending('worker connection closed')
+                return
+
+            if kind == 'ready':
+                self._ready.set()
+            elif kind == 'failed':
+                self.error = payload
+                self._ready.set()
+                self._fail_pending(payload)
+                return
+            elif kind == 'batch':
+                self.stats.batch(info)
+            else:
+                with self._lock:
+                    future, submitted = self._pending.pop(request_id, (None, None))
+                if future is None:
+                    continue
+                self.stats.finished(time.monotonic() - submitted, kind == 'done')
+                if kind == 'done':
+                    future.set_result(payload)
+                else:
+                    future.set_exception(RuntimeError(payload))
+
+    def _fail_pending(self, reason):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if self.error is None:
+            self.error = reason
+        for future, _ in pending.values():
+            future.set_exception(RuntimeError(f'TinyStories worker: {reason}'))
+
+    def stop(self):
+        if self._process is None or not self._process.is_alive():
+            return
+        self._requests.put(None)
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+
+    def snapshot(self):
+        stats = self.stats.snapshot()
+        with self._lock:
+            stats['in_flight'] = len(self._pending)
+        stats.update(max_batch=self.config['max_batch'], max_wait_ms=self.config['max_wait_ms'], alive=self.alive)
+        return stats
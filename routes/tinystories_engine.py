@@ -0,0 +1,314 @@
+"""
+Local TinyStories Engine
+Owns the in-process TinyStories-33M pipeline (stock fp32, int8-quantized or
+ONNX Runtime, see TINYSTORIES_BACKEND). The model is loaded exactly once
+on a background thread (at startup when TINYSTORIES_PRELOAD is set), warmed up
+with a short generation and pinned to a fixed number of torch threads. Until
+it is ready, callers use the cloud stand-in instead of waiting for the load.
+With TINYSTORIES_BATCHING the model lives in a micro-batching worker process
+instead (routes/tinystories_batch.py) and the engine forwards to it.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from routes import deadline
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = os.getenv('TINYSTORIES_MODEL', 'roneneldan/TinyStories-33M')
+# Local generation is only used when the cloud stand-in is switched off
+LOCAL_ENABLED = os.getenv('USE_CLOUD_TINYSTORIES', 'true').lower() != 'true'
+PRELOAD = os.getenv('TINYSTORIES_PRELOAD', 'false').lower() == 'true'
+NUM_THREADS = int(os.getenv('TINYSTORIES_THREADS', min(4, os.cpu_count() or 1)))
+# Serve generations from a micro-batching worker process (see tinystories_batch)
+BATCHING = os.getenv('TINYSTORIES_BATCHING', 'false').lower() == 'true'
+GENERATE_TIMEOUT_SEC = float(os.getenv('TINYSTORIES_GENERATE_TIMEOUT_SEC', 300))
+
+# 'pipeline' (stock fp32, the default), or opt in to 'int8' (dynamic quantization of
+# the Linear layers) or 'onnx' (ONNX Runtime export, cached under ONNX_DIR; needs
+# optimum[onnxruntime]). The faster backends can change the generated text slightly.
+BACKENDS = ('pipeline', 'int8', 'onnx')
+BACKEND = os.getenv('TINYSTORIES_BACKEND', 'pipeline').lower()
+ONNX_DIR = os.getenv('TINYSTORIES_ONNX_DIR', os.path.join('models', 'tinystories-33m-onnx'))
+
+# Local prompts are built from these fixed openings; their keys/values are
+# computed once at load time so a request only prefills its own topic tail
+STORY_PROMPT = "Once upon a time, there was a {topic}."
+PROMPT_PREFIXES = ("Once upon a time, there was a",)
+
+WARMUP_PROMPT = STORY_PROMPT.format(topic='little dog')
+WARMUP_TOKENS = 16
+# Sampling defaults of the transformers pipeline, kept for the cached loop
+TOP_K = 50
+
+IDLE, LOADING, WARMING, READY, FAILED = 'idle', 'loading', 'warming', 'ready', 'failed'
+
+
+def _int8_model(model_name):
+    import torch
+    from transformers import AutoModelForCausalLM
+    model = AutoModelForCausalLM.from_pretrained(model_name)
+    model.eval()
+    # Weights stored as int8, activations quantized on the fly: GPT-Neo is mostly Linear matmuls
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _onnx_model(model_name, onnx_dir=ONNX_DIR):
+    """Export once to onnx_dir, then load the cached artifact on later starts"""
+    from optimum.onnxruntime import ORTModelForCausalLM
+    if os.path.exists(os.path.join(onnx_dir, 'config.json')):
+        return ORTModelForCausalLM.from_pretrained(onnx_dir, use_cache=True)
+    print(f"Exporting {model_name} to ONNX ({onnx_dir}); later starts reuse the export...")
+    model = ORTModelForCausalLM.from_pretrained(model_name, export=True, use_cache=True)
+    model.save_pretrained(onnx_dir)
+    return model
+
+
+def resolve_backend(backend):
+    """Unknown names get the stock pipeline; onnx falls back to int8 without the ONNX Runtime extras"""
+    if backend not in BACKENDS:
+        logger.warning(f"Unknown TINYSTORIES_BACKEND '{backend}', using the stock pipeline")
+        return 'pipeline'
+    if backend == 'onnx':
+        try:
+            import optimum.onnxruntime  # noqa: F401
+        except ImportError:
+            logger.warning("optimum[onnxruntime] not installed, using the int8 backend instead")
+            return 'int8'
+    return backend
+
+
+def load_pipeline(model_name, backend=None):
+    import torch
+    from transformers import AutoTokenizer, pipeline
+    torch.set_num_threads(NUM_THREADS)
+    backend = resolve_backend(backend or BACKEND)
+    if backend == 'pipeline':
+        return pipeline("text-generation", model=model_name, device="cpu")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = _int8_model(model_name) if backend == 'int8' else _onnx_model(model_name)
+    return pipeline("text-generation", model=model, tokenizer=tokenizer, device="cpu")
+
+
+def story_prompt(topic):
+    return STORY_PROMPT.format(topic=topic)
+
+
+def match_prefix(ids, prefixes):
+    """
+    Longest cached prefix whose token ids start `ids` and leave at least one
+    token to feed. Comparing ids (not text) keeps BPE merges across the
+    boundary from silently reusing the wrong cache.
+    """
+    best = None
+    for prefix_ids in prefixes:
+        n = len(prefix_ids)
+        if n < len(ids) and tuple(ids[:n]) == prefix_ids and (best is None or n > len(best)):
+            best = prefix_ids
+    return best
+
+
+class PrefixCache:
+    """past_key_values for the fixed prompt openings of a torch causal LM"""
+
+    def __init__(self, model, tokenizer, prefixes=PROMPT_PREFIXES):
+        import torch
+        self._model = model
+        self._tokenizer = tokenizer
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+        with torch.no_grad():
+            for text in prefixes:
+                ids = tokenizer(text, return_tensors='pt')['input_ids']
+                out = model(input_ids=ids, use_cache=True)
+                self._entries[tuple(ids[0].tolist())] = out.past_key_values
+
+    @staticmethod
+    def supports(pipe):
+        try:
+            import torch
+        except ImportError:
+            return False
+        return isinstance(getattr(pipe, 'model', None), torch.nn.Module) and getattr(pipe, 'tokenizer', None) is not None
+
+    def generate(self, prompt, max_new_tokens=400, do_sample=True, temperature=0.7, repetition_penalty=1.1):
+        """Sample a continuation of prompt; returns the full text like the pipeline"""
+        import torch
+        from transformers import (LogitsProcessorList, RepetitionPenaltyLogitsProcessor,
+                                  TemperatureLogitsWarper, TopKLogitsWarper)
+
+        ids = self._tokenizer(prompt, return_tensors='pt')['input_ids']
+        prefix = match_prefix(ids[0].tolist(), self._entries)
+        if prefix is None:
+            self.misses += 1
+            past, feed = None, ids
+        else:
+            self.hits += 1
+            self.saved_tokens += len(prefix)
+            past, feed = _fork(self._entries[prefix]), ids[:, len(prefix):]
+
+        processors = LogitsProcessorList()
+        if repetition_penalty and repetition_penalty != 1.0:
+            processors.append(RepetitionPenaltyLogitsProcessor(repetition_penalty))
+        if do_sample:
+            processors.append(TemperatureLogitsWarper(temperature))
+            processors.append(TopKLogitsWarper(TOP_K))
+
+        eos = self._tokenizer.eos_token_id
+        generated = ids
+        with torch.no_grad():
+            for _ in range(max_new_tokens):
+                out = self._model(input_ids=feed, past_key_values=past, use_cache=True)
+                past = out.past_key_values
+                scores = processors(generated, out.logits[:, -1, :])
+                if do_sample:
+                    next_id = torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1)
+                else:
+                    next_id = scores.argmax(dim=-1, keepdim=True)
+                generated = torch.cat([generated, next_id], dim=-1)
+                if next_id.item() == eos:
+                    break
+                feed = next_id
+        return self._tokenizer.decode(generated[0], skip_special_tokens=True)
+
+    def stats(self):
+        return {'prefixes': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                'saved_prefill_tokens': self.saved_tokens}
+
+
+def _fork(past):
+    # Legacy tuple caches are only ever concatenated onto, so sharing is safe;
+    # Cache objects grow in place and need a private copy per request
+    if isinstance(past, tuple):
+        return past
+    import copy
+    return copy.deepcopy(past)
+
+
+class TinyStoriesEngine:
+    """Single-flight background load and warm-up of the local pipeline"""
+
+    def __init__(self, model_name=MODEL_NAME, backend=BACKEND, loader=load_pipeline, batching=BATCHING):
+        self.model_name = model_name
+        self.backend = backend
+        self.batching = batching
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        self._pipe = None
+        self._prefix_cache = None
+        self._batcher = None
+        self.state = IDLE
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+
+    def start(self):
+        """Begin loading in the background. Returns False if a load was already started."""
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self.state = LOADING
+            self._thread = threading.Thread(target=self._load, name='tinystories-load', daemon=True)
+            self._thread.start()
+            return True
+
+    def _load(self):
+        try:
+            started = time.monotonic()
+            self.backend = resolve_backend(self.backend)
+            print(f"Loading {self.model_name} locally ({self.backend} backend, background)...")
+            if self.batching:
+                from routes.tinystories_batch import BatchedInference
+                batcher = BatchedInference(self.model_name, self.backend, NUM_THREADS)
+                batcher.start()
+                self._batcher = batcher
+            else:
+                pipe = self._loader(self.model_name, self.backend)
+            self.load_seconds = time.monotonic() - started
+
+            # The first generation pays for lazy weight init and kernel selection
+            self.state = WARMING
+            started = time.monotonic()
+            if not self.batching:
+                if PrefixCache.supports(pipe):
+                    self._prefix_cache = PrefixCache(pipe.model, pipe.tokenizer)
+                self._pipe = pipe
+            self._generate(WARMUP_PROMPT, max_new_tokens=WARMUP_TOKENS, do_sample=False)
+            self.warmup_seconds = time.monotonic() - started
+
+            self.state = READY
+            logger.info(f"TinyStories ready: load {self.load_seconds:.1f}s, warm-up {self.warmup_seconds:.1f}s")
+        except Exception as e:
+            self.error = str(e)
+            self.state = FAILED
+            logger.error(f"Failed to load local TinyStories: {e}")
+        finally:
+            self._done.set()
+
+    def _generate(self, prompt, **kwargs):
+        if self._batcher is not None:
+            return self._batcher.submit(prompt, **kwargs).result(timeout=deadline.seconds(GENERATE_TIMEOUT_SEC))
+        if self._prefix_cache is not None:
+            return self._prefix_cache.generate(prompt, **kwargs)
+        # ONNX models (and test doubles) go through the plain pipeline
+        return self._pipe(prompt, **kwargs)[0]['generated_text']
+
+    def generate(self, prompt, max_new_tokens=400, do_sample=True, temperature=0.7, repetition_penalty=1.1):
+        """Full text (prompt + continuation), reusing the cached prompt prefix when one matches"""
+        if not self.ready:
+            raise RuntimeError(f"TinyStories engine is not ready ({self.state})")
+        return self._generate(prompt, max_new_tokens=max_new_tokens, do_sample=do_sample,
+                              temperature=temperature, repetition_penalty=repetition_penalty)
+
+    def __call__(self, prompt, **kwargs):
+        """Same call and output shape as the transformers pipeline (and CloudTinyStories)"""
+        return [{"generated_text": self.generate(prompt, **kwargs)}]
+
+    @property
+    def ready(self):
+        return self.state == READY and (self._batcher is None or self._batcher.alive)
+
+    @property
+    def pipe(self):
+        """The warmed-up in-process pipeline, or None while it is not ready (or batching)"""
+        return self._pipe if self.state == READY else None
+
+    def wait(self, timeout=None):
+        """Start the load if needed and block until it finishes (CLI and tests)"""
+        self.start()
+        self._done.wait(timeout)
+        return self.pipe
+
+    def status(self):
+        return {
+            'enabled': LOCAL_ENABLED,
+            'state': self.state,
+            'ready': self.ready,
+            'model': self.model_name,
+            'backend': self.backend,
+            'threads': NUM_THREADS,
+            'load_ms': round(self.load_seconds * 1000) if self.load_seconds is not None else None,
+            'warmup_ms': round(self.warmup_seconds * 1000) if self.warmup_seconds is not None else None,
+            'error': self.error,
+            'prefix_cache': self._prefix_cache.stats() if self._prefix_cache else None,
+            'batching': self._batcher.snapshot() if self._batcher else None
+        }
+
+
+engine = TinyStoriesEngine()
+
+
+def preload():
+    """Called at app startup: start the background load when opted in"""
+    # Spawned worker processes re-import the app module; only the parent loads
+    if LOCAL_ENABLED and PRELOAD and multiprocessing.parent_process() is None:
+        engine.start()
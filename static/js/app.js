@@ -18,6 +18,8 @@ const state = {
     currentUtterance: null,
     isSelectMode: false,
     selectedStories: new Set(),
+    storyList: [],             // library stories loaded so far
+    storiesCursor: null,       // next_cursor for the library, null once everything is shown
     readerLayout: 'classic',  // 'classic' | 'step_by_step'
     stepByStepIndex: 0,
     stepByStepLanguage: 'en',  // 'en' | target_language (e.g. 'hi') for step-by-step narration
@@ -38,6 +40,32 @@ const state = {
     dashboardCharts: {} // chart objects
 };
 
+// List endpoints are keyset paginated: fetch a page, then follow next_cursor.
+// (?all=1 is kept on the server only for outside callers.)
+const PAGE_SIZE = 24;
+const MAX_PAGE_SIZE = 200;
+
+async function fetchPage(path, key, after = null, limit = PAGE_SIZE) {
+    let url = `${API_BASE}${path}${path.includes('?') ? '&' : '?'}limit=${limit}`;
+    if (after) url += `&after=${encodeURIComponent(after)}`;
+    const response = await fetch(url);
+    const data = await response.json();
+    if (!data.success) throw new Error(data.error || `Failed to load ${path}`);
+    return { items: data[key] || [], nextCursor: data.next_cursor };
+}
+
+// For views that need the whole set (counts, lookups): full pages until the end
+async function fetchAllPages(path, key) {
+    const items = [];
+    let after = null;
+    do {
+        const page = await fetchPage(path, key, after, MAX_PAGE_SIZE);
+        items.push(...page.items);
+        after = page.nextCursor;
+    } while (after);
+    return items;
+}
+
 // ... (lines 20-186)
 
 function displayStory(story) {
@@ -282,14 +310,10 @@ function initializeStoriesPage() {
 async function loadStories() {
     try {
         showLoading();
-        const response = await fetch(`${API_BASE}/stories`);
-        const data = await response.json();
-
-        if (data.success) {
-            displayStories(data.stories);
-        } else {
-            showError('Failed to load stories');
-        }
+        const page = await fetchPage('/stories', 'stories');
+        state.storyList = page.items;
+        state.storiesCursor = page.nextCursor;
+        displayStories(state.storyList);
     } catch (error) {
         console.error('Error loading stories:', error);
         showError('Failed to load stories');
@@ -298,6 +322,19 @@ async function loadStories() {
     }
 }
 
+async function loadMoreStories() {
+    if (!state.storiesCursor) return;
+    try {
+        const page = await fetchPage('/stories', 'stories', state.storiesCursor);
+        state.storyList = state.storyList.concat(page.items);
+        state.storiesCursor = page.nextCursor;
+        displayStories(state.storyList);
+    } catch (error) {
+        console.error('Error loading more stories:', error);
+        showError('Failed to load more stories');
+    }
+}
+
 function displayStories(stories) {
     const container = document.getElementById('stories-list');
 
@@ -315,7 +352,10 @@ function displayStories(stories) {
             <span class="story-card-theme">${story.theme || 'General'}</span>
             ${story.moral ? '<span style="font-size: 0.8rem; color: var(--success-color);">🌟</span>' : ''}
         </div>
-    `).join('');
+    `).join('') + (state.storiesCursor
+        ? '<button id="load-more-stories" class="control-btn" style="grid-column: 1/-1;">Load more stories</button>'
+        : '');
+    document.getElementById('load-more-stories')?.addEventListener('click', loadMoreStories);
 
     // Add click handlers
     container.querySelectorAll('.story-card').forEach(card => {
@@ -1855,33 +1895,44 @@ function launchConfetti(container) {
     }
 }
 
-async function loadQuizStories() {
+async function loadQuizStories(after = null) {
     try {
         const container = document.getElementById('quiz-stories-list');
-        container.innerHTML = '<p class="text-center">Loading stories...</p>';
-
-        const response = await fetch(`${API_BASE}/stories`);
-        const data = await response.json();
-
-        if (data.success) {
-            if (data.stories.length === 0) {
-                container.innerHTML = '<p class="text-center">No stories available. Create one first!</p>';
-                return;
-            }
+        if (!after) container.innerHTML = '<p class="text-center">Loading stories...</p>';
 
-            container.innerHTML = data.stories.map(story => `
-                <div class="story-card" data-quiz-story-id="${story.id}">
-                    <div class="story-card-icon">🎯</div>
-                    <h3>${story.title}</h3>
-                    <span class="story-card-theme">${story.theme || 'General'}</span>
-                </div>
-            `).join('');
+        const page = await fetchPage('/stories', 'stories', after);
+        if (!after && page.items.length === 0) {
+            container.innerHTML = '<p class="text-center">No stories available. Create one first!</p>';
+            return;
+        }
 
-            // Add click handlers
-            container.querySelectorAll('.story-card').forEach(card => {
-                card.addEventListener('click', () => startQuiz(card.dataset.quizStoryId));
-            });
+        const cards = page.items.map(story => `
+            <div class="story-card" data-quiz-story-id="${story.id}">
+                <div class="story-card-icon">🎯</div>
+                <h3>${story.title}</h3>
+                <span class="story-card-theme">${story.theme || 'General'}</span>
+            </div>
+        `).join('');
+        if (after) {
+            container.querySelector('.load-more-quiz-stories')?.remove();
+            container.insertAdjacentHTML('beforeend', cards);
+        } else {
+            container.innerHTML = cards;
         }
+        if (page.nextCursor) {
+            container.insertAdjacentHTML('beforeend', `
+                <button class="control-btn load-more-quiz-stories" style="grid-column: 1/-1;"
+                        data-after="${page.nextCursor}">Load more stories</button>
+            `);
+        }
+
+        // One delegated handler covers cards added by "Load more"
+        container.onclick = (e) => {
+            const more = e.target.closest('.load-more-quiz-stories');
+            if (more) return loadQuizStories(more.dataset.after);
+            const card = e.target.closest('[data-quiz-story-id]');
+            if (card) startQuiz(card.dataset.quizStoryId);
+        };
     } catch (error) {
         console.error('Error loading quiz stories:', error);
     }
@@ -2442,14 +2493,20 @@ async function sendBuddyMessage() {
 async function loadBuddyHistory() {
     const container = document.getElementById('buddy-messages');
     try {
-        const response = await fetch(`${API_BASE}/chatbot/history`);
-        const data = await response.json();
-        if (data.success && data.messages.length > 0) {
-            container.innerHTML = '';
-            data.messages.forEach(m => {
+        // Oldest first, one page at a time, so the start of the chat shows right away
+        let after = null;
+        let cleared = false;
+        do {
+            const page = await fetchPage('/chatbot/history?fields=role,content', 'messages', after, MAX_PAGE_SIZE);
+            if (page.items.length > 0 && !cleared) {
+                container.innerHTML = '';
+                cleared = true;
+            }
+            page.items.forEach(m => {
                 appendChatMessage(m.role === 'user' ? 'omar' : 'buddy', m.content);
             });
-        }
+            after = page.nextCursor;
+        } while (after);
     } catch (err) {
         console.error(err);
     }
@@ -2574,13 +2631,8 @@ async function generateTopicStory() {
         const languageSelect = document.getElementById('gen-language');
         const language = languageSelect ? languageSelect.value : 'en';
 
-        const response = await fetch(`${API_BASE}/generator/topic`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ topic, length, speed, language })
-        });
-
-        const data = await response.json();
+        // Stream the story so sentences show up while the rest is still being written
+        const data = await streamTopicStory({ topic, length, speed, language });
 
         if (data.success) {
             // Clear the input
@@ -2603,10 +2655,73 @@ async function generateTopicStory() {
         console.error('Error generating topic story:', error);
         showError('Failed to generate story');
     } finally {
+        const preview = document.getElementById('loading-preview');
+        if (preview) {
+            preview.innerHTML = '';
+            preview.classList.add('hidden');
+        }
         hideLoading();
     }
 }
 
+/**
+ * POST to /generator/topic/stream and render title/sentences into the loading
+ * overlay as Server-Sent Events arrive. Resolves with the `done` (or `error`) payload.
+ */
+async function streamTopicStory(body) {
+    const preview = document.getElementById('loading-preview');
+    preview?.classList.remove('hidden');
+
+    const response = await fetch(`${API_BASE}/generator/topic/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    if (!response.ok || !response.body) {
+        return await response.json();
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = { success: false, error: 'Story stream ended early' };
+
+    const handle = (event, data) => {
+        if (event === 'title' && preview) {
+            preview.innerHTML = '';
+            const h = document.createElement('h3');
+            h.textContent = data.title;
+            preview.appendChild(h);
+        } else if (event === 'sentence' && preview) {
+            const p = document.createElement('p');
+            p.textContent = data.text;
+            preview.appendChild(p);
+            preview.scrollTop = preview.scrollHeight;
+        } else if (event === 'done' || event === 'error') {
+            result = data;
+        }
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let split;
+        while ((split = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, split);
+            buffer = buffer.slice(split + 2);
+            let event = 'message';
+            let data = '';
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            if (data) handle(event, JSON.parse(data));
+        }
+    }
+    return result;
+}
+
 // ===================================
 // Recall & Writing Page
 // ===================================
@@ -2712,12 +2827,11 @@ async function loadScrambleStoriesForPicker() {
     grid.innerHTML = '';
 
     try {
-        const res = await fetch(`${API_BASE}/tinystories/`);
-        const data = await res.json();
+        const stories = await fetchAllPages('/tinystories/?fields=id,title', 'stories');
 
-        if (data.success && data.stories && data.stories.length > 0) {
+        if (stories.length > 0) {
             if (loading) loading.classList.add('hidden');
-            grid.innerHTML = data.stories.map(s => `
+            grid.innerHTML = stories.map(s => `
                 <div class="scramble-choice-card" data-id="${s.id}">
                     <div class="story-icon">🧩</div>
                     <h4>${s.title}</h4>
@@ -2934,11 +3048,10 @@ async function loadScrambleStoriesPicker() {
 
     try {
         // Fetch from TinyStories
-        const response = await fetch(`${API_BASE}/tinystories/`);
-        const data = await response.json();
+        const stories = await fetchAllPages('/tinystories/?fields=id,title', 'stories');
 
-        if (data.success && data.stories && data.stories.length > 0) {
-            grid.innerHTML = data.stories.map(s => `
+        if (stories.length > 0) {
+            grid.innerHTML = stories.map(s => `
                 <div class="story-card scramble-pick-card" data-story-id="${s.id}" style="cursor:pointer;">
                     <div class="story-card-icon">🧩</div>
                     <h3>${s.title}</h3>
@@ -3386,44 +3499,39 @@ function initializeTinyStoriesPage() {
 async function loadTinyStories() {
     try {
         // Fetch progress stats
-        fetch(`${API_BASE}/tinystories/vocabulary`)
-            .then(res => res.json())
-            .then(data => {
-                if (data.success) {
-                    const total = data.vocabulary.length;
-                    const learned = data.vocabulary.filter(i => i.status === 'mastered').length;
-                    document.getElementById('ts-learned-count').innerText = learned;
-                    document.getElementById('ts-seen-count').innerText = total;
-                    document.getElementById('ts-progress-container').style.display = total > 0 ? 'flex' : 'none';
-                }
-            });
+        fetchAllPages('/tinystories/vocabulary?fields=id,status', 'vocabulary')
+            .then(vocabulary => {
+                const total = vocabulary.length;
+                const learned = vocabulary.filter(i => i.status === 'mastered').length;
+                document.getElementById('ts-learned-count').innerText = learned;
+                document.getElementById('ts-seen-count').innerText = total;
+                document.getElementById('ts-progress-container').style.display = total > 0 ? 'flex' : 'none';
+            })
+            .catch(e => console.error(e));
 
-        const response = await fetch(`${API_BASE}/tinystories/`);
-        const data = await response.json();
+        const stories = await fetchAllPages('/tinystories/?fields=id,title,image_url', 'stories');
         const container = document.getElementById('ts-list');
 
-        if (data.success) {
-            if (data.stories.length === 0) {
-                container.innerHTML = '<p class="text-center">No stories yet. Generate one!</p>';
-                return;
-            }
+        if (stories.length === 0) {
+            container.innerHTML = '<p class="text-center">No stories yet. Generate one!</p>';
+            return;
+        }
 
-            container.innerHTML = data.stories.map(story => `
-                <div class="story-card" data-id="${story.id}">
-                    <div class="story-card-img-container">
-                        ${story.image_url
-                    ? `<img src="${story.image_url}" class="story-thumbnail" alt="${story.title}">`
-                    : `<div class="story-card-icon">🧸</div>`
-                }
-                    </div>
-                    <h3>${story.title}</h3>
+        container.innerHTML = stories.map(story => `
+            <div class="story-card" data-id="${story.id}">
+                <div class="story-card-img-container">
+                    ${story.image_url
+                ? `<img src="${story.image_url}" class="story-thumbnail" alt="${story.title}">`
+                : `<div class="story-card-icon">🧸</div>`
+            }
                 </div>
-            `).join('');
+                <h3>${story.title}</h3>
+            </div>
+        `).join('');
 
-            container.querySelectorAll('.story-card').forEach(c => {
-                c.addEventListener('click', () => loadTinyStoryDetail(c.dataset.id));
-            });
-        }
+        container.querySelectorAll('.story-card').forEach(c => {
+            c.addEventListener('click', () => loadTinyStoryDetail(c.dataset.id));
+        });
     } catch (e) {
         console.error(e);
     }
@@ -3545,9 +3653,8 @@ async function loadTinyStoryDetail(id) {
             const vocabContainer = document.getElementById('ts-vocab-list');
             if (story.vocab && story.vocab.length) {
                 // Fetch current vocab progress to show badges
-                const vResponse = await fetch(`${API_BASE}/tinystories/vocabulary`);
-                const vData = await vResponse.json();
-                const masteredWords = (vData.vocabulary || [])
+                const vocabulary = await fetchAllPages('/tinystories/vocabulary?fields=id,word,status', 'vocabulary');
+                const masteredWords = vocabulary
                     .filter(item => item.status === 'mastered')
                     .map(item => item.word.toLowerCase());
 
@@ -3936,13 +4043,9 @@ function initializeVocabularyPage() {
 
 async function loadVocabularyPage() {
     try {
-        const response = await fetch(`${API_BASE}/tinystories/vocabulary`);
-        const data = await response.json();
-        if (data.success) {
-            vocabList = data.vocabulary || [];
-            updateVocabCounters();
-            renderVocabGrid();
-        }
+        vocabList = await fetchAllPages('/tinystories/vocabulary', 'vocabulary');
+        updateVocabCounters();
+        renderVocabGrid();
     } catch (e) {
         console.error('Failed to load vocabulary', e);
     }
@@ -0,0 +1,17 @@
+import os
+import sys
+
+# Make the top-level modules (database, tinystories_db, routes) importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_databases(tmp_path, monkeypatch):
+    """Point both database files at tmp_path so tests never touch the checked-in ones"""
+    import database
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'ost.db'))
+    monkeypatch.setattr(database, 'TS_DATABASE', str(tmp_path / 'tinystories.db'))
+    yield
+    database.close_connections()
@@ -0,0 +1,87 @@
+"""
+Async provider layer: the sync facade, bounded fan-out, and story assets finishing in about the slowest call.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from routes import async_providers, deadline, generator, speech
+import routes.images as images
+
+
+def test_run_returns_the_result_with_the_callers_deadline():
+    async def remaining():
+        await asyncio.sleep(0)
+        return deadline.remaining()
+
+    assert async_providers.run(remaining()) is None
+    with deadline.deadline(5):
+        assert 0 < async_providers.run(remaining()) <= 5
+
+
+def test_run_gives_up_at_the_deadline():
+    with deadline.deadline(0.1):
+        with pytest.raises(deadline.DeadlineExceeded):
+            async_providers.run(asyncio.sleep(5))
+
+
+def test_fan_out_overlaps_jobs_under_the_limit():
+    lock = threading.Lock()
+    active = [0, 0]   # current, peak
+
+    def blocking():
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.2)
+        with lock:
+            active[0] -= 1
+        return 'thread'
+
+    async def native():
+        await asyncio.sleep(0.2)
+        return 'async'
+
+    def broken():
+        raise ValueError('no audio')
+
+    started = time.monotonic()
+    results = async_providers.fan_out([blocking, native, broken, blocking, blocking], limit=3)
+    elapsed = time.monotonic() - started
+
+    assert results[:2] == ['thread', 'async'] and isinstance(results[2], ValueError)
+    assert results[3:] == ['thread', 'thread']
+    assert active[1] <= 3
+    # Two waves of 0.2s at limit 3, not five calls in a row
+    assert elapsed < 0.6
+
+
+def test_story_assets_take_about_the_slowest_call(monkeypatch, tmp_path):
+    monkeypatch.setattr(generator, 'current_settings', lambda: type('S', (), {'reader_layout': 'step_by_step'})())
+    monkeypatch.setattr(speech, 'AUDIO_DIR', str(tmp_path))
+
+    def slow(result):
+        def call(*args, **kwargs):
+            time.sleep(0.2)
+            return result
+        return call
+
+    monkeypatch.setattr(images, 'generate_and_save_sentence_image', slow((True, '/images/x.png')))
+    monkeypatch.setattr(speech, 'generate_audio_file', slow((True, '/audio/x.mp3')))
+    monkeypatch.setattr(speech, '_generate_segment', slow(None))
+    monkeypatch.setattr(speech, 'sentence_audio_jobs',
+                        lambda story_id, speed: [lambda: speech._generate_segment('One.', 'en', 'gtts', 'v', speed)] * 3)
+
+    events = []
+    started = time.monotonic()
+    generator._generate_story_assets(1, 'Title', 'One. Two. Three.', 'One. Two. Three.', 'Uno. Dos. Tres.',
+                                     ['One.', 'Two.', 'Three.'], 'es', 0.8,
+                                     on_event=lambda name, data: events.append(data['type']))
+    elapsed = time.monotonic() - started
+
+    # 3 images + 2 full-story clips + 3 sentence clips, 0.2s each: sequential would be 1.6s
+    assert elapsed < 0.7
+    assert sorted(events) == ['audio', 'audio', 'sentence_audio', 'sentence_image', 'sentence_image',
+                              'sentence_image']
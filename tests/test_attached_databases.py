@@ -0,0 +1,118 @@
+"""
+ost.db connections attach tinystories.db as `ts`: cross-file queries are plain
+SQL and, in attach mode, TinyStories work shares the ost.db transaction.
+"""
+
+import sqlite3
+import threading
+
+import pytest
+import database
+import tinystories_db
+
+
+@pytest.fixture
+def dbs(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'ost.db'))
+    monkeypatch.setattr(database, 'TS_DATABASE', str(tmp_path / 'tinystories.db'))
+    database.close_connections()
+    tinystories_db.init_ts_db()
+    database.init_db()
+    yield
+    database.close_connections()
+
+
+def test_cross_database_count(dbs):
+    with tinystories_db.get_ts_db_context() as conn:
+        conn.executemany("INSERT INTO vocabulary_progress (word, status) VALUES (?, ?)",
+                         [('brave', 'mastered'), ('gentle', 'new')])
+    with database.get_db_context() as conn:
+        row = conn.execute('''
+            SELECT (SELECT COUNT(*) FROM ts.vocabulary_progress WHERE status = 'mastered'),
+                   (SELECT COUNT(*) FROM stories)
+        ''').fetchone()
+    assert row[0] == 1 and row[1] > 0
+
+
+def test_attach_mode_shares_one_transaction(dbs, monkeypatch):
+    monkeypatch.setattr(database, 'DB_MODE', 'attach')
+    with pytest.raises(RuntimeError):
+        with database.get_db_context() as conn:
+            conn.execute("INSERT INTO stories (title, content) VALUES ('Rolled back', 'x')")
+            with tinystories_db.get_ts_db_context() as ts_conn:
+                assert ts_conn is conn
+                ts_conn.execute("INSERT INTO vocabulary_progress (word) VALUES ('lost')")
+            raise RuntimeError('abort both')
+
+    with database.get_db_context() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM stories WHERE title = 'Rolled back'").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM ts.vocabulary_progress WHERE word = 'lost'").fetchone()[0] == 0
+
+
+def test_separate_mode_uses_own_connection(dbs, monkeypatch):
+    monkeypatch.setattr(database, 'DB_MODE', 'separate')
+    with tinystories_db.get_ts_db_context() as conn:
+        assert conn is not database.get_db()
+        conn.execute("INSERT INTO vocabulary_progress (word) VALUES ('kept')")
+    with database.get_db_context() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM ts.vocabulary_progress").fetchone()[0] == 1
+
+
+def test_read_connection_is_read_only(dbs):
+    with database.get_db_read_context() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM ts.vocabulary_progress').fetchone()[0] == 0
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO stories (title, content) VALUES ('nope', 'x')")
+    assert database.get_read_connection(database.DATABASE) is not database.get_db()
+
+
+def _in_thread(fn):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_connections_are_reused_across_threads_and_not_held(dbs):
+    def write():
+        with database.get_db_context() as conn:
+            return conn
+
+    first = _in_thread(write)
+    # The finished thread kept nothing; the next thread gets the same connection back
+    assert _in_thread(write) is first
+    with database.get_db_read_context() as conn:
+        conn.execute('SELECT COUNT(*) FROM stories').fetchone()
+        assert database._held() != {}
+    assert database._held() == {}
+
+
+def test_idle_pool_is_bounded(dbs, monkeypatch):
+    monkeypatch.setattr(database, 'POOL_SIZE', 1)
+    inside = threading.Barrier(3)
+
+    def read():
+        with database.get_db_read_context() as conn:
+            conn.execute('SELECT COUNT(*) FROM stories').fetchone()
+            inside.wait(timeout=5)
+            return conn
+
+    threads = [threading.Thread(target=read) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(database._idle[('ro', database.DATABASE)]) == 1
+
+
+def test_context_leaves_a_bare_connection_with_the_thread(dbs):
+    bare = database.get_db()
+    with database.get_db_context() as conn:
+        assert conn is bare
+    # Another thread must not be handed the connection the get_db() caller still uses
+    assert database._held()[database.DATABASE] is bare
+    assert bare not in database._idle.get(database.DATABASE, [])
+    assert _in_thread(database.get_db) is not bare
+    database.release_connections()
+    assert bare in database._idle[database.DATABASE]
@@ -0,0 +1,111 @@
+"""
+Combined generation: one provider response carries the story and its quiz, which is saved with the story.
+"""
+
+import json
+
+import pytest
+import database
+from routes import generator, llm, quiz
+from routes.llm import StoryStreamParser
+
+QUESTIONS = [
+    {"question": f"Question {n}?", "options": ["Red", "Blue", "Green", "Pink"], "correct_answer": "Red",
+     "hint": "Look at the swing.", "explanation": "Yes! It was red."}
+    for n in range(5)
+]
+
+STORY = f"""TITLE: Rohan and the Red Swing
+CONTENT:
+Rohan goes to the park. He sees a red swing.
+VOCAB:
+- Swing: a seat that moves
+MORAL:
+Play gently.
+QUIZ:
+{{"questions": {json.dumps(QUESTIONS[:4])[:-1]},
+{json.dumps(QUESTIONS[4])}, {{"question": "No answer?", "options": ["A", "B"]}}]}}
+"""
+
+
+def test_parser_reads_the_quiz_section():
+    parser = StoryStreamParser()
+    for i in range(0, len(STORY), 5):
+        parser.feed(STORY[i:i + 5])
+    parser.close()
+    title, content, moral, vocab, translation_data, questions = parser.result()
+    assert moral == 'Play gently.' and 'QUIZ' not in content
+    # The malformed question is dropped
+    assert questions == QUESTIONS
+
+
+def test_prompt_asks_for_the_quiz_only_in_combined_mode():
+    system_prompt, _ = llm.build_story_prompts('a red swing', with_quiz=True)
+    assert 'QUIZ:' in system_prompt and 'VALID JSON' not in system_prompt
+    assert 'QUIZ:' not in llm.build_story_prompts('a red swing', with_quiz=False)[0]
+    bilingual, _ = llm.build_story_prompts('a red swing', target_language='hi', with_quiz=True)
+    assert '"questions"' in bilingual
+
+
+@pytest.fixture
+def one_provider(monkeypatch):
+    database.init_db()
+    calls = []
+
+    def generate(system_prompt, user_prompt, api_key, model_id=None, **kwargs):
+        calls.append(user_prompt)
+        return STORY
+
+    monkeypatch.setattr(llm, 'get_llm_provider', lambda: ('openai', None))
+    monkeypatch.setattr(llm, 'configured_providers', lambda *args, **kwargs: ['openai'])
+    monkeypatch.setattr(llm, 'provider_generator', lambda name: (generate, 'key'))
+    monkeypatch.setattr(generator, '_generate_story_assets', lambda *args, **kwargs: None)
+    return calls
+
+
+def test_quiz_is_saved_with_the_story_and_opens_without_a_call(one_provider, monkeypatch):
+    from app import app
+    client = app.test_client()
+    body = client.post('/api/generator/topic', json={'topic': 'a red swing'}).get_json()
+    assert body['success'] and len(one_provider) == 1
+
+    def no_second_call(story_dict):
+        raise AssertionError('quiz should come from the database')
+    monkeypatch.setattr(quiz, '_generate_ai_questions', no_second_call)
+
+    questions = client.post(f"/api/quiz/generate/{body['story_id']}", json={}).get_json()['questions']
+    assert [q['question'] for q in questions] == [q['question'] for q in QUESTIONS]
+    assert all(sorted(q['options']) == ['Blue', 'Green', 'Pink', 'Red'] for q in questions)
+    assert len(one_provider) == 1
+
+
+def test_template_stories_keep_the_lazy_quiz(monkeypatch):
+    database.init_db()
+    monkeypatch.setattr(llm, 'get_llm_provider', lambda: ('default', None))
+    title, content, moral, vocab, translation_data, questions = generator.generate_story_content('a red ball')
+    assert content and questions is None
+
+
+def test_regenerate_holds_no_write_lock_during_the_llm_call(one_provider, monkeypatch):
+    import sqlite3
+    from app import app
+    client = app.test_client()
+    story_id = client.post('/api/generator/topic', json={'topic': 'a red swing'}).get_json()['story_id']
+    locked = []
+
+    def generate(story_dict, regenerate=False):
+        other = sqlite3.connect(database.DATABASE, timeout=0)
+        try:
+            other.execute('BEGIN IMMEDIATE')
+            other.rollback()
+            locked.append(False)
+        except sqlite3.OperationalError:
+            locked.append(True)
+        finally:
+            other.close()
+        return QUESTIONS[:3]
+    monkeypatch.setattr(quiz, '_generate_ai_questions', generate)
+
+    questions = client.post(f'/api/quiz/generate/{story_id}', json={'regenerate': True}).get_json()['questions']
+    assert locked == [False]
+    assert [q['question'] for q in questions] == [q['question'] for q in QUESTIONS[:3]]
@@ -0,0 +1,86 @@
+"""
+Request deadlines: nesting tightens, spent budgets raise, worker threads inherit them.
+"""
+
+import threading
+import time
+
+import pytest
+
+from routes import deadline
+from routes.hedging import hedged_first
+
+
+def test_no_deadline_uses_plain_ceilings():
+    assert deadline.remaining() is None
+    assert deadline.seconds(10) == 10
+    assert deadline.timeout(read=20, connect=3) == (3, 20)
+
+
+def test_nested_deadline_keeps_the_tighter_one():
+    with deadline.deadline(0.5):
+        with deadline.deadline(30):
+            assert deadline.remaining() <= 0.5
+        with deadline.deadline(0.1):
+            assert deadline.remaining() <= 0.1
+        assert 0.1 < deadline.remaining() <= 0.5
+    assert deadline.remaining() is None
+
+
+def test_spent_deadline_raises():
+    with deadline.deadline(0.01):
+        time.sleep(0.02)
+        assert deadline.expired()
+        with pytest.raises(deadline.DeadlineExceeded):
+            deadline.seconds()
+
+
+def test_call_gives_up_on_a_hung_sdk():
+    release = threading.Event()
+    started = time.monotonic()
+    with deadline.deadline(0.1):
+        with pytest.raises(deadline.DeadlineExceeded):
+            deadline.call(release.wait, 5)
+    release.set()
+    assert time.monotonic() - started < 1
+
+
+def test_propagate_carries_deadline_into_thread():
+    seen = []
+    with deadline.deadline(5):
+        worker = threading.Thread(target=deadline.propagate(lambda: seen.append(deadline.remaining())))
+    worker.start()
+    worker.join()
+    assert seen and 0 < seen[0] <= 5
+
+
+def test_hedged_first_stops_at_request_deadline():
+    release = threading.Event()
+    started = time.monotonic()
+    with deadline.deadline(0.1):
+        result = hedged_first([('slow', lambda: release.wait(5) and 'ok')], lambda text: text, timeout=30)
+    release.set()
+    assert result == (None, None)
+    assert time.monotonic() - started < 1
+
+
+def test_tinystory_asset_thread_keeps_the_route_deadline(monkeypatch):
+    from app import app
+    from routes import tinystories
+    from tinystories_db import get_ts_db_context, init_ts_db
+    init_ts_db()
+    with get_ts_db_context() as conn:
+        story_id = conn.execute("INSERT INTO tinystories (title, content) VALUES ('T', 'Once.')").lastrowid
+
+    seen = []
+    done = threading.Event()
+
+    def background_assets(*args):
+        seen.append(deadline.remaining())
+        done.set()
+
+    monkeypatch.setattr(tinystories, 'background_assets', background_assets)
+    response = app.test_client().post(f'/api/tinystories/assets/{story_id}')
+    assert response.get_json()['success']
+    assert done.wait(5)
+    assert seen[0] is not None and 0 < seen[0] <= deadline.STORY_DEADLINE_SEC
@@ -0,0 +1,55 @@
+"""
+Hedged provider races: slow providers are hedged, failures fail over, budgets hold.
+"""
+
+import threading
+import time
+
+from routes.hedging import hedged_first
+
+
+def _provider(answer, delay=0.0, calls=None, name=None):
+    def call():
+        if calls is not None:
+            calls.append(name)
+        time.sleep(delay)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    return call
+
+
+def _parse(text):
+    return text if text and text.startswith('ok') else None
+
+
+def test_fast_first_provider_is_not_hedged():
+    calls = []
+    result = hedged_first([('a', _provider('ok a', calls=calls, name='a')),
+                           ('b', _provider('ok b', calls=calls, name='b'))], _parse, delay=0.5)
+    assert result == ('a', 'ok a')
+    assert calls == ['a']
+
+
+def test_slow_provider_is_hedged_and_loses():
+    release = threading.Event()
+    slow = lambda: release.wait(5) and 'ok slow'
+    started = time.monotonic()
+    result = hedged_first([('slow', slow), ('fast', _provider('ok fast'))], _parse, delay=0.05)
+    release.set()
+    assert result == ('fast', 'ok fast')
+    assert time.monotonic() - started < 1
+
+
+def test_failure_and_invalid_answers_fail_over_immediately():
+    result = hedged_first([('broken', _provider(RuntimeError('503'))),
+                           ('garbled', _provider('not json')),
+                           ('good', _provider('ok good'))], _parse, delay=5, max_attempts=3)
+    assert result == ('good', 'ok good')
+
+
+def test_budget_caps_attempts():
+    calls = []
+    candidates = [(n, _provider('nope', delay=0.05, calls=calls, name=n)) for n in 'abcd']
+    assert hedged_first(candidates, _parse, delay=0.01, max_parallel=2, max_attempts=2) == (None, None)
+    assert sorted(calls) == ['a', 'b']
@@ -0,0 +1,92 @@
+"""
+Tolerant LLM JSON parsing: repairs, truncation recovery, chunked feeding and shape validation.
+"""
+
+import pytest
+
+from routes.json_repair import JSONRepairer, parse_json, parse_llm_json, repair_json
+
+MCQ = '{"question": "Who ran?", "options": ["Rohan", "Mia"], "correct_answer": "Rohan"}'
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('```json\n{"a": [1, 2,], "b": "x"}\n```\nHope this helps!', {'a': [1, 2], 'b': 'x'}),
+    ('{"a": 1, // a note\n "b": /* inline */ 2}', {'a': 1, 'b': 2}),
+    ('{"a": 1,, "b": 2,}', {'a': 1, 'b': 2}),
+    ('{"a": "line one\nline two"}', {'a': 'line one\nline two'}),
+    ('{"a": True, "b": None}', {'a': True, 'b': None}),
+    ('{"items": [{"x": 1}\n{"x": 2}]}', {'items': [{'x': 1}, {'x': 2}]}),
+    ('Sure! {"k": "v"} and also {"z": 1}', {'k': 'v'}),
+])
+def test_repairs(raw, expected):
+    assert parse_json(raw) == expected
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('{"a": 1, "b": "trunc', {'a': 1, 'b': 'trunc'}),
+    ('{"a": 1, "b"', {'a': 1, 'b': None}),
+    ('{"a": 1, "b":', {'a': 1, 'b': None}),
+    ('{"a": 1, "b": tru', {'a': 1, 'b': None}),
+    ('{"a": tru', {'a': None}),
+    ('{"a": [1, -', {'a': [1, None]}),
+    ('{"a": 1, "b', {'a': 1}),
+    ('{"a": {"b": [1, 2', {'a': {'b': [1, 2]}}),
+])
+def test_truncated_input_is_closed(raw, expected):
+    assert parse_json(raw) == expected
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('Here you go [JSON below]:\n{"a":1}', {'a': 1}),
+    ('Note: [1] see below\n```json\n{"questions": []}\n```', {'questions': []}),
+    ('Use {curly} braces? Sure: {"a": 1}', {'a': 1}),
+    ('{not json at all}\n{"a": 1}', {'a': 1}),
+])
+def test_brackets_in_chatter_are_skipped(raw, expected):
+    assert parse_json(raw) == expected
+    assert parse_json(repair_json(raw)) == expected
+
+
+def test_list_after_bracketed_chatter():
+    assert parse_json('See [the list below]:\n[1, 2]', expect=list) == [1, 2]
+    # Nothing cleaner follows: the quoted words are better than nothing
+    assert parse_json('[JSON below]', expect=list) == ['JSON', 'below']
+
+
+def test_no_json_returns_none():
+    assert parse_json('Sorry, I cannot help with that.') is None
+    assert parse_json('[1, 2]') is None
+    assert parse_json('[1, 2]', expect=list) == [1, 2]
+
+
+def test_chunked_feed_matches_whole_text():
+    raw = '```json\n{"mcqs": [' + MCQ + ', ' + MCQ + '], "moral": "Be kind", // done\n}```'
+    for size in (1, 2, 5, 17):
+        repairer = JSONRepairer()
+        for i in range(0, len(raw), size):
+            repairer.feed(raw[i:i + size])
+        assert repairer.repaired() == repair_json(raw)
+    assert parse_json(raw)['moral'] == 'Be kind'
+
+
+def test_truncated_quiz_keeps_complete_questions():
+    raw = '{"questions": [' + MCQ + ', {"question": "Where?", "options": ["park", "zoo"], "correct_ans'
+    data = parse_llm_json(raw, lists=('questions',), required=('questions',))
+    assert data['questions'] == [parse_json(MCQ)]
+
+
+def test_shape_validation_drops_bad_items():
+    raw = '''{"mcqs": [%s, {"question": "Q", "options": ["a", "b"], "correct_answer": "c"}],
+              "fill_in_blanks": [{"sentence": "The dog was ____.", "answer": "happy", "options": ["sad", "happy"]},
+                                 {"sentence": "No options", "answer": "x"}],
+              "moral_questions": "not a list"}''' % MCQ
+    data = parse_llm_json(raw, lists=('mcqs', 'fill_in_blanks', 'moral_questions'))
+    assert len(data['mcqs']) == 1 and len(data['fill_in_blanks']) == 1
+    assert data['moral_questions'] == []
+
+
+def test_required_list_must_survive():
+    raw = '{"title": "T", "sentences": [{"text": "Hi.", "translation": "Namaste."}, {"text": "Bye.", "transl'
+    data = parse_llm_json(raw, lists=('sentences',), required=('sentences',))
+    assert data['sentences'] == [{'text': 'Hi.', 'translation': 'Namaste.'}]
+    assert parse_llm_json('{"title": "T", "sentences": []}', lists=('sentences',), required=('sentences',)) is None
@@ -0,0 +1,93 @@
+"""
+LLM response cache: content-addressed keys, memory and disk tiers, TTL and bypass.
+"""
+
+import pytest
+import database
+from routes.llm_cache import LLMCache, cache_key, cached, llm_cache
+from write_behind import ost_writer
+
+
+@pytest.fixture
+def provider_calls():
+    database.init_db()
+    llm_cache.clear()
+    calls = []
+
+    @cached('fake')
+    def generate(system_prompt, user_prompt, api_key, model_id=None):
+        calls.append(user_prompt)
+        return f"answer to {user_prompt}"
+
+    yield generate, calls
+    ost_writer.flush(timeout=5)
+
+
+def test_key_depends_on_every_part():
+    base = cache_key('gemini', None, 'system', 'user')
+    assert base == cache_key('gemini', None, 'system', 'user')
+    assert base != cache_key('openai', None, 'system', 'user')
+    assert base != cache_key('gemini', 'gemini-2.0-flash', 'system', 'user')
+    assert base != cache_key('gemini', None, 'other system', 'user')
+    assert base != cache_key('gemini', None, 'system', 'other user')
+
+
+def test_repeat_call_is_served_from_memory(provider_calls):
+    generate, calls = provider_calls
+    assert generate('sys', 'a cat', 'key') == generate('sys', 'a cat', 'key')
+    assert calls == ['a cat']
+
+
+def test_bypass_always_calls_provider(provider_calls):
+    generate, calls = provider_calls
+    generate('sys', 'a dog', 'key', cache_bypass=True)
+    generate('sys', 'a dog', 'key', cache_bypass=True)
+    assert calls == ['a dog', 'a dog']
+
+
+def test_disk_tier_survives_a_new_process(provider_calls):
+    generate, calls = provider_calls
+    generate('sys', 'a fox', 'key')
+    ost_writer.flush(timeout=5)
+    fresh = LLMCache()
+    assert fresh.get(cache_key('fake', None, 'sys', 'a fox')) == 'answer to a fox'
+    assert fresh.stats['disk_hits'] == 1
+
+
+def test_expired_and_evicted_entries_miss():
+    database.init_db()
+    cache = LLMCache(max_entries=2)
+    cache.put('old', 'fake', None, 'stale', ttl=-1)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, 'fake', None, key)
+    ost_writer.flush(timeout=5)
+    assert cache.get('old') is None
+    assert cache.snapshot()['memory_entries'] == 2
+    assert cache.get('a') == 'a' and cache.stats['disk_hits'] == 1
+
+
+def test_quiz_regenerate_skips_the_cache(monkeypatch):
+    import json
+    from app import app
+    from routes import llm
+    database.init_db()
+    llm_cache.clear()
+    calls = []
+
+    @cached('fake')
+    def generate(system_prompt, user_prompt, api_key, model_id=None):
+        calls.append(user_prompt)
+        return json.dumps({'questions': [{'question': f'Question {len(calls)}?', 'options': ['Red', 'Blue'],
+                                          'correct_answer': 'Red'}]})
+
+    monkeypatch.setattr(llm, 'configured_providers', lambda *args, **kwargs: ['gemini'])
+    monkeypatch.setattr(llm, 'provider_generator', lambda name: (generate, 'key'))
+    with database.get_db_read_context() as conn:
+        story_id = conn.execute('SELECT id FROM stories ORDER BY id LIMIT 1').fetchone()[0]
+
+    client = app.test_client()
+    questions = [client.post(f'/api/quiz/generate/{story_id}', json={'regenerate': True}).get_json()['questions']
+                 for _ in range(2)]
+    assert len(calls) == 2
+    assert 'Question 2?' in [q['question'] for q in questions[1]]
+    ost_writer.flush(timeout=5)
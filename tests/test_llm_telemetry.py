@@ -0,0 +1,128 @@
+"""
+LLM call telemetry: one ledger row per provider call, tagged by call site, with tokens, cost and percentiles.
+"""
+
+import time
+
+import pytest
+import database
+from routes import llm_telemetry
+from routes.hedging import hedged_first
+from routes.llm_cache import cached, llm_cache
+from routes.llm_telemetry import call_site, metered, metered_stream
+from routes.provider_router import routed
+from write_behind import ost_writer
+
+
+@pytest.fixture(autouse=True)
+def ledger():
+    database.init_db()
+    llm_cache.clear()
+    yield
+    ost_writer.flush(timeout=5)
+
+
+def _rows():
+    ost_writer.flush(timeout=5)
+    with database.get_db_read_context() as conn:
+        return [dict(row) for row in conn.execute('SELECT * FROM llm_calls ORDER BY id')]
+
+
+def test_reported_usage_is_recorded_with_cost():
+    @metered('openai')
+    def generate(system_prompt, user_prompt, api_key, model_id=None):
+        llm_telemetry.report(model='gpt-4o-mini', prompt_tokens=1000, completion_tokens=2000)
+        return 'a story'
+
+    with call_site(llm_telemetry.STORY_TEXT):
+        assert generate('system', 'user', 'key') == 'a story'
+
+    [row] = _rows()
+    assert (row['provider'], row['model'], row['call_site'], row['outcome']) == \
+        ('openai', 'gpt-4o-mini', 'story_text', 'ok')
+    assert (row['prompt_tokens'], row['completion_tokens'], row['estimated']) == (1000, 2000, 0)
+    assert row['cost_usd'] == pytest.approx((1000 * 0.15 + 2000 * 0.60) / 1_000_000)
+    assert row['ttft_ms'] is None
+
+
+def test_unreported_usage_is_estimated_and_failures_are_kept():
+    @metered('abacus')
+    def generate(system_prompt, user_prompt, api_key, model_id=None):
+        if user_prompt == 'boom':
+            raise RuntimeError('provider down')
+        return None if user_prompt == 'nothing' else 'word ' * 40
+
+    generate('system', 'user', 'key', model_id='abacus-chat-v1')
+    generate('system', 'nothing', 'key')
+    with pytest.raises(RuntimeError):
+        generate('system', 'boom', 'key')
+
+    ok, empty, error = _rows()
+    assert ok['estimated'] == 1 and ok['completion_tokens'] > 0 and ok['cost_usd'] is None
+    assert ok['call_site'] == 'other'
+    assert (empty['outcome'], empty['completion_tokens']) == ('empty', 0)
+    assert error['outcome'] == 'error'
+
+
+def test_estimate_tokens_falls_back_to_length(monkeypatch):
+    monkeypatch.setattr(llm_telemetry, '_encoding', False)
+    assert llm_telemetry.estimate_tokens('') == 0
+    assert llm_telemetry.estimate_tokens('abcd' * 10) == 10
+
+
+def test_cache_hits_and_skipped_calls_are_not_counted():
+    @cached('fake')
+    @routed('fake')
+    @metered('fake')
+    def generate(system_prompt, user_prompt, api_key, model_id=None):
+        return 'cached answer'
+
+    generate('system', 'same question', 'key')
+    generate('system', 'same question', 'key')
+    assert len(_rows()) == 1
+
+
+def test_hedged_workers_keep_the_call_site():
+    @metered('gemini')
+    def generate(system_prompt, user_prompt, api_key, model_id=None):
+        return '{"questions": []}'
+
+    with call_site(llm_telemetry.QUIZ):
+        name, _ = hedged_first([('gemini', lambda: generate('s', 'u', 'k'))], lambda text: text)
+    assert name == 'gemini'
+    assert [row['call_site'] for row in _rows()] == ['quiz']
+
+
+def test_stream_records_time_to_first_token():
+    @metered_stream('groq')
+    def stream(system_prompt, user_prompt, api_key, model_id=None):
+        time.sleep(0.02)
+        yield 'Once upon '
+        time.sleep(0.05)
+        yield 'a time.'
+
+    assert ''.join(stream('system', 'user', 'key', model_id='llama3-8b-8192')) == 'Once upon a time.'
+    [row] = _rows()
+    assert row['outcome'] == 'ok' and row['model'] == 'llama3-8b-8192'
+    assert 20 <= row['ttft_ms'] < row['latency_ms']
+
+
+def test_metrics_endpoint_reports_percentiles_per_call_site():
+    from app import app
+    for site, latencies in (('metadata', range(10, 110, 10)), ('quiz', [5])):
+        for latency in latencies:
+            ost_writer.submit(llm_telemetry.INSERT, (time.time(), 'gemini', 'gemini-2.0-flash', site, latency,
+                                                     None, 100, 50, 0, 'ok', 0.00003))
+    # Outside the window
+    ost_writer.submit(llm_telemetry.INSERT, (time.time() - 3 * 86400, 'gemini', None, 'quiz', 9999,
+                                             None, 1, 1, 1, 'error', None))
+    ost_writer.flush(timeout=5)
+
+    body = app.test_client().get('/api/metrics/llm').get_json()
+    assert body['success']
+    sites = body['llm']['call_sites']
+    assert sites['metadata']['calls'] == 10
+    assert (sites['metadata']['latency_p50_ms'], sites['metadata']['latency_p95_ms']) == (60, 100)
+    assert (sites['quiz']['calls'], sites['quiz']['failures'], sites['quiz']['latency_p95_ms']) == (1, 0, 5)
+    assert sites['metadata']['providers'] == {'gemini:gemini-2.0-flash': 10}
+    assert body['llm']['cost_usd'] == pytest.approx(11 * 0.00003)
@@ -0,0 +1,51 @@
+"""
+Schema migration checks: a fresh database and one created by an older
+release must end up with the same columns, and re-running is a no-op.
+"""
+
+import sqlite3
+
+import database
+
+
+def _columns(path):
+    conn = sqlite3.connect(path)
+    tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    schema = {t: sorted(r[1] for r in conn.execute(f'PRAGMA table_info({t})')) for t in tables}
+    conn.close()
+    return schema
+
+
+def test_legacy_and_fresh_databases_converge(tmp_path):
+    fresh = str(tmp_path / 'fresh.db')
+    legacy = str(tmp_path / 'legacy.db')
+
+    # An older release: stories without the later columns, progress without scoring
+    conn = sqlite3.connect(legacy)
+    conn.execute('''CREATE TABLE stories (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL,
+                    content TEXT NOT NULL, theme TEXT, difficulty_level TEXT DEFAULT 'easy',
+                    image_category TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_read TIMESTAMP, moral TEXT)''')
+    conn.execute('''CREATE TABLE user_progress (id INTEGER PRIMARY KEY AUTOINCREMENT, story_id INTEGER NOT NULL,
+                    activity_type TEXT NOT NULL, score REAL, notes TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    conn.commit()
+    conn.close()
+
+    for path in (fresh, legacy):
+        assert database.run_migrations(database.get_connection(path), database.MIGRATIONS) > 0
+        assert database.run_migrations(database.get_connection(path), database.MIGRATIONS) == 0
+    database.close_connections()
+
+    assert _columns(fresh) == _columns(legacy)
+    assert 'audio_speed' in _columns(fresh)['stories']
+    assert 'translated_text' in _columns(fresh)['story_sentences']
+
+
+def test_first_pooled_connection_bootstraps_both_files():
+    conn = database.get_db()
+    version = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0]
+    assert version == database.MIGRATIONS[-1][0]
+    assert conn.execute('SELECT COUNT(*) FROM stories').fetchone()[0] > 0
+    assert conn.execute('SELECT COUNT(*) FROM achievements').fetchone()[0] > 0
+    assert conn.execute('SELECT COUNT(*) FROM ts.vocabulary_progress').fetchone()[0] == 0
@@ -0,0 +1,63 @@
+"""
+Provider router: circuit breaking, half-open probes, health ordering and model memory.
+"""
+
+import time
+
+import pytest
+from routes.provider_router import ProviderRouter, OPEN, CLOSED
+
+
+@pytest.fixture
+def router():
+    return ProviderRouter(failure_threshold=2, cooldown_sec=0.05)
+
+
+def _fail(router, provider, model=None, times=1):
+    for _ in range(times):
+        with pytest.raises(RuntimeError):
+            with router.attempt(provider, model):
+                raise RuntimeError('429')
+
+
+def test_circuit_opens_after_consecutive_failures(router):
+    _fail(router, 'openai')
+    assert router.allow('openai')
+    _fail(router, 'openai')
+    assert router.snapshot()['providers']['openai']['state'] == OPEN
+    assert not router.allow('openai')
+
+
+def test_half_open_lets_one_probe_through(router):
+    _fail(router, 'groq', times=2)
+    time.sleep(0.06)
+    assert router.allow('groq')
+    assert not router.allow('groq')  # second caller waits for the probe
+    with router.attempt('groq'):
+        pass
+    assert router.snapshot()['providers']['groq']['state'] == CLOSED
+    assert router.allow('groq')
+
+
+def test_order_keeps_preferred_unless_unhealthy(router):
+    router.record('gemini', None, True, 2.0)
+    router.record('groq', None, True, 0.3)
+    assert router.order(['openai', 'gemini', 'groq']) == ['openai', 'groq', 'gemini']
+    _fail(router, 'openai', times=2)
+    assert router.order(['openai', 'gemini', 'groq']) == ['groq', 'gemini', 'openai']
+
+
+def test_soft_failure_counts(router):
+    for _ in range(2):
+        with router.attempt('abacus') as call:
+            call.ok = False
+    assert not router.available('abacus')
+
+
+def test_remembers_working_model(router):
+    models = ['gemini-2.0-flash', 'gemini-1.5-flash', 'gemini-1.5-pro']
+    _fail(router, 'gemini', 'gemini-2.0-flash', times=2)
+    with router.attempt('gemini', 'gemini-1.5-flash'):
+        pass
+    assert router.model_order('gemini', models) == ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-2.0-flash']
+    assert router.snapshot()['working_models'] == {'gemini': 'gemini-1.5-flash'}
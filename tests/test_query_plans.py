@@ -0,0 +1,126 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot route queries.
+Each query must be answered from its managed index rather than a full table
+scan or a temporary sort.
+"""
+
+import importlib
+
+import pytest
+import database
+
+# (description, sql, params, expected index) - SQL mirrors the route handlers
+OST_QUERIES = [
+    ('stories.get_stories',
+     'SELECT id, title FROM stories WHERE NOT EXISTS (SELECT 1 FROM story_pool pooled WHERE pooled.story_id = stories.id) '
+     'ORDER BY created_at DESC', (),
+     'idx_stories_created_at'),
+    ('stories.get_stories page',
+     'SELECT id, title, created_at FROM stories '
+     'WHERE NOT EXISTS (SELECT 1 FROM story_pool pooled WHERE pooled.story_id = stories.id) AND (created_at, id) < (?, ?) '
+     'ORDER BY created_at DESC, id DESC LIMIT ?',
+     ('2026-01-01 00:00:00', 10, 51),
+     'idx_stories_created_at'),
+    ('stories.get_story sentences',
+     'SELECT sentence_order, sentence_text FROM story_sentences WHERE story_id = ? ORDER BY sentence_order', (1,),
+     'idx_story_sentences_story_order'),
+    ('recall.get_due_stories',
+     'SELECT id, title FROM stories WHERE last_read IS NOT NULL '
+     'AND NOT EXISTS (SELECT 1 FROM story_pool pooled WHERE pooled.story_id = stories.id) '
+     'ORDER BY last_read ASC LIMIT 3', (),
+     'idx_stories_last_read'),
+    ('recall.get_daily_progress',
+     "SELECT COUNT(*) FROM user_progress WHERE activity_type = 'practice' AND created_at >= ?", ('2026-01-01 00:00:00',),
+     'idx_user_progress_activity_created'),
+    ('recall.get_daily_progress chat',
+     "SELECT COUNT(*) FROM chatbot_messages WHERE role = 'user' AND created_at >= ?", ('2026-01-01 00:00:00',),
+     'idx_chatbot_messages_role_created'),
+    ('achievements.check_achievements',
+     'SELECT COUNT(*) FROM user_progress WHERE activity_type = ?', ('story_read',),
+     'idx_user_progress_activity_created'),
+    ('dashboard.get_dashboard_summary mastered',
+     'SELECT COUNT(DISTINCT story_id) FROM user_progress WHERE score >= 80 '
+     'AND NOT EXISTS (SELECT 1 FROM story_pool pooled WHERE pooled.story_id = user_progress.story_id)', (),
+     'idx_user_progress_score_story'),
+    ('dashboard.get_chart_data',
+     "SELECT AVG(score) FROM user_progress WHERE activity_type = 'quiz' AND created_at >= ? AND created_at < ?",
+     ('2026-01-01', '2026-01-02'),
+     'idx_user_progress_activity_created'),
+    ('dashboard.get_chart_data completions',
+     'SELECT COUNT(*) FROM user_progress WHERE created_at >= ? AND created_at < ?', ('2026-01-01', '2026-01-02'),
+     'idx_user_progress_created'),
+    ('dashboard.get_session_history',
+     '''SELECT p.created_at, s.title, p.activity_type, p.score
+        FROM user_progress p JOIN stories s ON p.story_id = s.id
+        WHERE NOT EXISTS (SELECT 1 FROM story_pool pooled WHERE pooled.story_id = s.id)
+        ORDER BY p.created_at DESC LIMIT 20''', (),
+     'idx_user_progress_created'),
+    ('chatbot.get_history',
+     'SELECT role, content, created_at FROM chatbot_messages WHERE session_id = ? ORDER BY id ASC', ('omar_default',),
+     'idx_chatbot_messages_session'),
+    ('chatbot.get_history page',
+     'SELECT id, role, content FROM chatbot_messages WHERE session_id = ? AND (id) > (?) ORDER BY id ASC LIMIT ?',
+     ('omar_default', 100, 51),
+     'idx_chatbot_messages_session'),
+    ('chatbot.get_buddy_memory',
+     'SELECT role, content FROM chatbot_messages WHERE session_id = ? ORDER BY id DESC LIMIT 10', ('omar_default',),
+     'idx_chatbot_messages_session'),
+    ('quiz.generate_quiz',
+     'SELECT id, question, options FROM quiz_questions WHERE story_id = ?', (1,),
+     'idx_quiz_questions_story'),
+    ('quiz attempts by story',
+     'SELECT COUNT(*) FROM quiz_attempts WHERE story_id = ?', (1,),
+     'idx_quiz_attempts_story'),
+    ('metrics.llm_call_metrics',
+     'SELECT provider, call_site, latency_ms FROM llm_calls WHERE created_at >= ?', (0.0,),
+     'idx_llm_calls_created'),
+    ('chatmode.get_history',
+     'SELECT prompt, category FROM chatmode_history ORDER BY created_at DESC LIMIT ?', (10,),
+     'idx_chatmode_history_created'),
+]
+
+TS_QUERIES = [
+    ('tinystories.list_vocabulary',
+     'SELECT * FROM vocabulary_progress ORDER BY last_seen DESC', (),
+     'idx_vocabulary_progress_last_seen'),
+    ('tinystories.list_vocabulary page',
+     'SELECT id, word FROM vocabulary_progress WHERE (last_seen, id) < (?, ?) ORDER BY last_seen DESC, id DESC LIMIT ?',
+     ('2026-01-01 00:00:00', 10, 51),
+     'idx_vocabulary_progress_last_seen'),
+]
+
+
+def _plan(conn, sql, params):
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()]
+
+
+def _assert_uses_index(conn, name, sql, params, index):
+    plan = _plan(conn, sql, params)
+    assert any(index in step for step in plan), f'{name} does not use {index}: {plan}'
+    assert not any('TEMP B-TREE FOR ORDER BY' in step for step in plan), f'{name} sorts in a temp b-tree: {plan}'
+
+
+@pytest.fixture
+def ost_conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'ost.db'))
+    database.init_db()
+    yield database.get_db()
+    database.close_connections()
+
+
+@pytest.mark.parametrize('name, sql, params, index', OST_QUERIES, ids=[q[0] for q in OST_QUERIES])
+def test_ost_queries_use_indexes(ost_conn, name, sql, params, index):
+    _assert_uses_index(ost_conn, name, sql, params, index)
+
+
+@pytest.mark.parametrize('name, sql, params, index', TS_QUERIES, ids=[q[0] for q in TS_QUERIES])
+def test_tinystories_queries_use_indexes(tmp_path, monkeypatch, name, sql, params, index):
+    # tinystories_db initialises relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    tinystories_db = importlib.import_module('tinystories_db')
+    monkeypatch.setattr(database, 'TS_DATABASE', str(tmp_path / 'tinystories.db'))
+    tinystories_db.init_ts_db()
+    try:
+        _assert_uses_index(tinystories_db.get_ts_db(), name, sql, params, index)
+    finally:
+        database.close_connections()
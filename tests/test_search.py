@@ -0,0 +1,47 @@
+"""
+Full-text search index: triggers keep the FTS5 tables in step with the base tables.
+"""
+
+import pytest
+import database
+from routes.search import build_match_query, search_stories, search_sentences
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'ost.db'))
+    database.init_db()
+    yield database.get_db()
+    database.close_connections()
+
+
+def test_build_match_query_quotes_and_prefixes():
+    assert build_match_query('black an') == '"black"* "an"*'
+    assert build_match_query('") OR (*') == '"OR"*'
+    assert build_match_query('  ') == ''
+
+
+def test_index_follows_insert_update_delete(conn):
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO stories (title, content) VALUES ('The Zebrafish', 'A zebrafish swims.')")
+    story_id = cursor.lastrowid
+    cursor.execute("INSERT INTO story_sentences (story_id, sentence_order, sentence_text) VALUES (?, 0, 'A zebrafish swims.')",
+                   (story_id,))
+    conn.commit()
+
+    match = build_match_query('zebra')
+    assert [r['story_id'] for r in search_stories(cursor, match, 10)] == [story_id]
+    assert [r['story_id'] for r in search_sentences(cursor, match, 10)] == [story_id]
+    assert '<mark>Zebrafish</mark>' in search_stories(cursor, match, 10)[0]['title_html']
+
+    cursor.execute("UPDATE stories SET title = 'The Goldfish', content = 'A goldfish swims.' WHERE id = ?", (story_id,))
+    conn.commit()
+    assert search_stories(cursor, match, 10) == []
+    assert [r['story_id'] for r in search_stories(cursor, build_match_query('gold'), 10)] == [story_id]
+
+    cursor.execute('DELETE FROM story_sentences WHERE story_id = ?', (story_id,))
+    cursor.execute('DELETE FROM stories WHERE id = ?', (story_id,))
+    conn.commit()
+    assert search_stories(cursor, build_match_query('gold'), 10) == []
+    assert search_sentences(cursor, match, 10) == []
+    cursor.execute("INSERT INTO stories_fts (stories_fts) VALUES ('integrity-check')")
@@ -0,0 +1,42 @@
+"""
+Settings cache: readers get one consistent snapshot that invalidation never edits under them.
+"""
+
+import threading
+
+import database
+from routes import settings
+
+
+def test_snapshot_survives_invalidation():
+    database.init_db()
+    snapshot = settings._load_settings()
+    settings.invalidate_settings_cache()
+    assert snapshot.values.get('reader_layout') == snapshot.settings.reader_layout
+    assert settings._load_settings() is not snapshot
+
+
+def test_reads_race_invalidation_without_errors(monkeypatch):
+    database.init_db()
+    monkeypatch.setattr(settings, 'SETTINGS_CHECK_INTERVAL', 0.0)
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                settings.get_setting('llm_provider')
+                settings.current_settings()
+            except Exception as e:
+                errors.append(e)
+        database.close_connections()
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for _ in range(200):
+        settings.invalidate_settings_cache()
+    stop.set()
+    for thread in readers:
+        thread.join()
+    assert errors == []
@@ -0,0 +1,171 @@
+"""
+Ready-story pool: pooled stories stay hidden until claimed, claims are one-shot, /random serves from the pool.
+"""
+
+import json
+import time
+
+import pytest
+import database
+from routes import generator, story_pool as story_pool_module
+from routes.story_pool import StoryPool
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """A pool whose builder saves template stories without audio or images"""
+    monkeypatch.setattr(generator, '_generate_story_assets', lambda *args, **kwargs: None)
+    monkeypatch.setattr(generator.llm, 'get_llm_provider', lambda: ('default', None))
+    pool = StoryPool(depth=2, builder=generator.build_pooled_story)
+    monkeypatch.setattr(generator, 'story_pool', pool)
+    # Register demand without starting the background thread
+    monkeypatch.setattr(pool, '_thread', object())
+    return pool
+
+
+def _visible_ids(client):
+    return {s['id'] for s in client.get('/api/stories?all=1').get_json()['stories']}
+
+
+def test_replenish_fills_to_depth_and_hides_pooled_stories(pool):
+    from app import app
+    client = app.test_client()
+    before = _visible_ids(client)
+
+    pool.want('en', 'short', 0.8)
+    assert pool.replenish()
+    snapshot = pool.snapshot()
+    [(key, counts)] = snapshot['pools'].items()
+    assert key.startswith('en|short|') and key.endswith('|0.80')
+    assert counts == {'ready': 2, 'building': 0}
+    assert _visible_ids(client) == before
+
+
+def test_claim_is_one_shot_and_reveals_the_story(pool):
+    from app import app
+    client = app.test_client()
+    pool.want('en', 'short', 0.8)
+    pool.replenish()
+
+    first = pool.claim('en', 'short', 0.8)
+    second = pool.claim('en', 'short', 0.8)
+    assert first and second and first['id'] != second['id']
+    assert pool.claim('en', 'short', 0.8) is None
+    assert pool.claim('hi', 'short', 0.8) is None
+    assert {first['id'], second['id']} <= _visible_ids(client)
+
+    snapshot = pool.snapshot()
+    assert snapshot['hits'] == 2 and snapshot['misses'] == 2 and snapshot['hit_rate'] == 0.5
+
+
+def test_unready_stories_are_not_claimable(pool):
+    key = story_pool_module.pool_key('en', 'short', 0.8, *story_pool_module.current_variant())
+    with database.get_db_context() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO stories (title, content) VALUES ('Half built', 'Text.')")
+        story_pool_module.add_pending(cursor, cursor.lastrowid, key)
+    assert pool.claim('en', 'short', 0.8) is None
+
+
+def test_random_endpoint_serves_from_pool(pool):
+    from app import app
+    pool.want('en', 'short', 0.8)
+    pool.replenish()
+
+    started = time.monotonic()
+    response = app.test_client().post('/api/generator/random', json={'length': 'short', 'speed': 0.8, 'language': 'en'})
+    elapsed = time.monotonic() - started
+    body = response.get_json()
+    assert response.status_code == 201 and body['success']
+    assert elapsed < 0.1
+    with database.get_db_context() as conn:
+        row = conn.execute('SELECT title, vocab_json FROM stories WHERE id = ?', (body['story_id'],)).fetchone()
+    assert body['title'] == row['title'] and body['vocab'] == json.loads(row['vocab_json'])
+
+
+def _half_built(key, created_at):
+    with database.get_db_context() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO stories (title, content) VALUES ('Half built', 'Text.')")
+        story_id = cursor.lastrowid
+        story_pool_module.add_pending(cursor, story_id, key)
+        cursor.execute('UPDATE story_pool SET created_at = ? WHERE story_id = ?', (created_at, story_id))
+    return story_id
+
+
+def test_pool_is_off_by_default():
+    assert StoryPool(depth=0).claim('en', 'short', 0.8) is None
+    assert not StoryPool(depth=0).snapshot()['enabled']
+
+
+def test_live_build_slot_elsewhere_blocks_a_second_build(pool):
+    key = story_pool_module.pool_key('en', 'short', 0.8, *story_pool_module.current_variant())
+    with database.get_db_context() as conn:
+        conn.execute('INSERT INTO story_pool_builds (pool_key, owner, started_at) VALUES (?, ?, ?)',
+                     (key, 'other-worker', time.time()))
+    pool.want('en', 'short', 0.8)
+    assert pool.replenish()
+    assert pool.snapshot()['pools'] == {}
+
+    # The other worker died: its slot expires and this one takes over
+    with database.get_db_context() as conn:
+        conn.execute('UPDATE story_pool_builds SET started_at = ?', (time.time() - 2 * story_pool_module.BUILD_LEASE_SEC,))
+    assert pool.replenish()
+    assert pool.snapshot()['pools'][key] == {'ready': 2, 'building': 0}
+    with database.get_db_read_context() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM story_pool_builds').fetchone()[0] == 0
+
+
+def test_failed_build_leaves_no_half_built_story(pool):
+    from app import app
+    client = app.test_client()
+    before = _visible_ids(client)
+
+    def broken_builder(language, length, speed, key):
+        _half_built(key, time.time())
+        raise RuntimeError('image provider down')
+
+    pool._builder = broken_builder
+    pool.want('en', 'short', 0.8)
+    assert not pool.replenish()
+    with database.get_db_read_context() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM stories WHERE title = 'Half built'").fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM story_pool_builds').fetchone()[0] == 0
+    assert _visible_ids(client) == before
+
+
+def test_orphaned_builds_are_deleted_not_shown(pool):
+    from app import app
+    client = app.test_client()
+    key = story_pool_module.pool_key('en', 'short', 0.8, *story_pool_module.current_variant())
+    orphan = _half_built(key, time.time() - 2 * story_pool_module.BUILD_LEASE_SEC)
+    building = _half_built(key, time.time())
+    assert not {orphan, building} & _visible_ids(client)
+
+    pool.discard_orphans()
+    with database.get_db_read_context() as conn:
+        remaining = {row[0] for row in conn.execute("SELECT id FROM stories WHERE title = 'Half built'")}
+    assert remaining == {building}
+    assert building not in _visible_ids(client)
+
+
+def test_pooled_stories_stay_out_of_recall_practice_and_dashboard(pool):
+    from app import app
+    client = app.test_client()
+    pool.want('en', 'short', 0.8)
+    pool.replenish()
+    with database.get_db_context() as conn:
+        pooled = [row[0] for row in conn.execute('SELECT story_id FROM story_pool')]
+        # Only pooled stories have sentences, were "read" long ago and have progress
+        conn.execute(f"DELETE FROM story_sentences WHERE story_id NOT IN ({', '.join('?' * len(pooled))})", pooled)
+        conn.execute("UPDATE stories SET last_read = '2020-01-01 00:00:00'")
+        conn.executemany("INSERT INTO user_progress (story_id, activity_type, score) VALUES (?, 'story_read', 100)",
+                         [(story_id,) for story_id in pooled])
+
+    assert not {s['id'] for s in client.get('/api/recall/due').get_json()['stories']} & set(pooled)
+    sentence = client.get('/api/stories/random-sentence').get_json()['sentence']
+    with database.get_db_read_context() as conn:
+        assert not conn.execute('SELECT 1 FROM story_sentences WHERE sentence_text = ?', (sentence,)).fetchall()
+    assert client.get('/api/dashboard/history').get_json()['history'] == []
+    stats = client.get('/api/dashboard/stats/summary').get_json()['stats']
+    assert stats['stories_read'] == 0 and stats['stories_mastered'] == 0
@@ -0,0 +1,98 @@
+"""
+Streaming story generation: the incremental TITLE:/CONTENT: parser and the SSE endpoint.
+"""
+
+import json
+
+import pytest
+import database
+from routes.llm import StoryStreamParser
+
+STORY = """TITLE: Rohan and the Red Swing
+CONTENT:
+Rohan goes to the park. He sees a red swing!
+He sits down and swings slowly. The air is cool
+
+The sun is warm. Rohan smiles.
+VOCAB:
+- Swing: a seat that moves
+MORAL:
+Play gently and
+have fun.
+"""
+
+
+def _parse(chunks):
+    parser = StoryStreamParser()
+    events = []
+    for chunk in chunks:
+        events += parser.feed(chunk)
+    events += parser.close()
+    return parser, events
+
+
+@pytest.mark.parametrize('size', [1, 3, 7, len(STORY)])
+def test_parser_is_chunking_independent(size):
+    parser, events = _parse([STORY[i:i + size] for i in range(0, len(STORY), size)])
+    title, content, moral, vocab, _, questions = parser.result()
+    assert events[0] == ('title', 'Rohan and the Red Swing')
+    # Sentences come out exactly as story_sentences rows are split
+    assert [e[1] for e in events[1:]] == [s.strip() + '.' for s in content.split('.') if s.strip()]
+    assert moral == 'Play gently and have fun.'
+    assert vocab == {'Swing': 'a seat that moves'}
+    assert questions is None
+
+
+def test_sentence_is_released_before_its_line_ends():
+    parser = StoryStreamParser()
+    parser.feed('TITLE: A Cat\nCONTENT:\n')
+    assert parser.feed('The cat naps. It drea') == [('sentence', 'The cat naps.')]
+
+
+def test_stream_endpoint_emits_events_in_order(monkeypatch):
+    database.init_db()
+    from app import app
+    from routes import generator
+
+    def fake_assets(story_id, *args, on_event=None, **kwargs):
+        on_event('asset', {'type': 'audio', 'ok': True, 'url': f'/audio/story_{story_id}.mp3'})
+
+    # No provider configured: the template fallback is sent as one burst
+    monkeypatch.setattr(generator, '_generate_story_assets', fake_assets)
+    monkeypatch.setattr(generator.llm, 'get_llm_provider', lambda: ('default', None))
+    response = app.test_client().post('/api/generator/topic/stream', json={'topic': 'a red ball'})
+    assert response.mimetype == 'text/event-stream'
+
+    frames = [f for f in response.get_data(as_text=True).split('\n\n') if f]
+    names = [f.split('\n')[0][len('event: '):] for f in frames]
+    assert names[0] == 'title' and names[1] == 'sentence'
+    assert names[-4:] == ['meta', 'saved', 'asset', 'done']
+    done = json.loads(frames[-1].split('\n')[1][len('data: '):])
+    with database.get_db_context() as conn:
+        saved = conn.execute('SELECT COUNT(*) FROM story_sentences WHERE story_id = ?', (done['story_id'],)).fetchone()[0]
+    assert saved == names.count('sentence')
+
+
+def test_stream_that_breaks_off_falls_back_to_a_full_story(monkeypatch):
+    database.init_db()
+    from app import app
+    from routes import generator, llm
+
+    def broken_stream(system_prompt, user_prompt, api_key, model_id=None):
+        yield STORY[:80]
+        raise ConnectionError('stream reset')
+
+    monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+    monkeypatch.setattr(llm, 'get_llm_provider', lambda: ('openai', None))
+    monkeypatch.setitem(llm.STREAMING_PROVIDERS, 'openai', (broken_stream, 'OPENAI_API_KEY'))
+    assert list(llm.stream_story_text('a red swing'))[-1] == ('result', None)
+
+    fallback = ('Rohan and the Red Swing', 'Rohan goes to the park. He swings all day.', 'Play gently.',
+                [], None, None)
+    monkeypatch.setattr(generator, 'generate_story_content', lambda *args, **kwargs: fallback)
+    monkeypatch.setattr(generator, '_generate_story_assets', lambda *args, **kwargs: None)
+    frames = app.test_client().post('/api/generator/topic/stream', json={'topic': 'a red swing'}).get_data(as_text=True)
+    done = json.loads(frames.strip().split('\n\n')[-1].split('\n')[1][len('data: '):])
+    with database.get_db_context() as conn:
+        content = conn.execute('SELECT content FROM stories WHERE id = ?', (done['story_id'],)).fetchone()[0]
+    assert content == fallback[1]
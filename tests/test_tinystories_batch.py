@@ -0,0 +1,70 @@
+"""
+Micro-batched TinyStories worker: window gathering, grouping, and a round trip through a real worker process.
+"""
+
+import queue
+from concurrent.futures import wait
+
+from routes.tinystories_batch import BatchedInference, BatchStats, gather_batch, group_requests
+
+
+def echo_generator(config):
+    """Stand-in for model_generator: no model, tags each prompt with its batch size"""
+    def generate_batch(prompts, max_new_tokens, do_sample=True, temperature=0.7, repetition_penalty=1.1):
+        return [f"{prompt} [batch of {len(prompts)}]" for prompt in prompts], sum(max_new_tokens)
+    return generate_batch
+
+
+def test_gather_batch_takes_what_arrives_within_the_window():
+    requests = queue.Queue()
+    for i in range(5):
+        requests.put((i, f'p{i}', {}))
+    assert [item[0] for item in gather_batch(requests, max_batch=3, max_wait=0.05)] == [0, 1, 2]
+    assert [item[0] for item in gather_batch(requests, max_batch=3, max_wait=0.05)] == [3, 4]
+
+
+def test_gather_batch_stops_on_sentinel():
+    requests = queue.Queue()
+    requests.put((1, 'p', {}))
+    requests.put(None)
+    assert len(gather_batch(requests, max_batch=8, max_wait=0.05)) == 1
+    assert gather_batch(requests, max_batch=8, max_wait=0.05) is None
+
+
+def test_group_requests_splits_on_sampling_settings():
+    groups = group_requests([
+        (1, 'a', {'max_new_tokens': 10}),
+        (2, 'b', {'max_new_tokens': 20}),
+        (3, 'c', {'do_sample': False}),
+    ])
+    assert groups[(True, 0.7, 1.1)] == [(1, 'a', 10), (2, 'b', 20)]
+    assert groups[(False, 0.7, 1.1)] == [(3, 'c', 400)]
+
+
+def test_batch_stats_snapshot():
+    stats = BatchStats()
+    for _ in range(4):
+        stats.submitted()
+    stats.batch({'size': 3, 'sec': 0.5, 'tokens': 300})
+    stats.batch({'size': 1, 'sec': 0.5, 'tokens': 100})
+    for latency in (0.1, 0.2, 0.3, 0.4):
+        stats.finished(latency, ok=True)
+    snapshot = stats.snapshot()
+    assert snapshot['avg_batch_size'] == 2.0 and snapshot['largest_batch'] == 3
+    assert snapshot['latency_p50_ms'] == 300 and snapshot['tokens_per_sec'] == 400.0
+
+
+def test_worker_process_batches_concurrent_requests():
+    batcher = BatchedInference('fake', 'int8', 1, max_batch=4, max_wait_ms=500,
+                               factory='test_tinystories_batch:echo_generator')
+    batcher.start(timeout=60)
+    try:
+        futures = [batcher.submit(f'story {i}', max_new_tokens=10) for i in range(4)]
+        done, _ = wait(futures, timeout=30)
+        assert len(done) == 4
+        assert [f.result() for f in futures] == [f'story {i} [batch of 4]' for i in range(4)]
+        snapshot = batcher.snapshot()
+        assert snapshot['batches'] == 1 and snapshot['completed'] == 4 and snapshot['in_flight'] == 0
+    finally:
+        batcher.stop()
+    assert not batcher.alive
@@ -0,0 +1,99 @@
+"""
+Local TinyStories engine: one background load, warm-up before ready, cloud stand-in meanwhile.
+"""
+
+import threading
+
+from routes import llm, tinystories_engine
+from routes.tinystories_engine import TinyStoriesEngine, match_prefix
+
+
+class _FakePipe:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, prompt, **kwargs):
+        self.calls.append((prompt, kwargs))
+        return [{'generated_text': prompt + ' The end.'}]
+
+
+def test_concurrent_starts_load_once_and_warm_up():
+    release = threading.Event()
+    loads = []
+    pipe = _FakePipe()
+
+    def loader(model_name, backend):
+        loads.append(model_name)
+        release.wait(5)
+        return pipe
+
+    engine = TinyStoriesEngine(loader=loader)
+    starts = []
+    threads = [threading.Thread(target=lambda: starts.append(engine.start())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert starts.count(True) == 1
+    assert engine.state == 'loading' and engine.pipe is None
+    release.set()
+    assert engine.wait(5) is pipe
+    assert loads == [engine.model_name]
+    assert len(pipe.calls) == 1 and pipe.calls[0][1]['max_new_tokens'] == tinystories_engine.WARMUP_TOKENS
+    assert engine.status()['ready'] is True
+
+
+def test_failed_load_reports_error():
+    def loader(model_name, backend):
+        raise RuntimeError('no weights')
+
+    engine = TinyStoriesEngine(loader=loader)
+    assert engine.wait(5) is None
+    status = engine.status()
+    assert status['state'] == 'failed' and status['error'] == 'no weights'
+
+
+def test_get_tinystories_uses_cloud_until_ready(monkeypatch):
+    release = threading.Event()
+    pipe = _FakePipe()
+    engine = TinyStoriesEngine(loader=lambda name, backend: release.wait(5) and pipe)
+    monkeypatch.setattr(tinystories_engine, 'LOCAL_ENABLED', True)
+    monkeypatch.setattr(tinystories_engine, 'engine', engine)
+
+    assert isinstance(llm.get_tinystories(), llm.CloudTinyStories)
+    assert engine.state == 'loading'
+    release.set()
+    engine.wait(5)
+    assert llm.get_tinystories() is engine
+    assert engine('Once upon a time, there was a cat.', max_new_tokens=8) == [
+        {'generated_text': 'Once upon a time, there was a cat. The end.'}]
+
+
+def test_backend_fallbacks(monkeypatch):
+    import builtins
+    real_import = builtins.__import__
+
+    def no_optimum(name, *args, **kwargs):
+        if name.startswith('optimum'):
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, '__import__', no_optimum)
+    assert tinystories_engine.resolve_backend('onnx') == 'int8'
+    assert tinystories_engine.resolve_backend('bogus') == 'pipeline'
+    assert tinystories_engine.resolve_backend('pipeline') == 'pipeline'
+
+
+def test_match_prefix_picks_longest_token_prefix():
+    prefixes = {(1, 2): 'short', (1, 2, 3): 'long', (9,): 'other'}
+    assert match_prefix([1, 2, 3, 4], prefixes) == (1, 2, 3)
+    assert match_prefix([1, 2, 5], prefixes) == (1, 2)
+    # The prompt must leave at least one token to feed after the prefix
+    assert match_prefix([1, 2, 3], prefixes) == (1, 2)
+    assert match_prefix([4, 1, 2], prefixes) is None
+
+
+def test_story_prompt_starts_with_a_cached_prefix():
+    prompt = tinystories_engine.story_prompt('friendly dog')
+    assert any(prompt.startswith(prefix) for prefix in tinystories_engine.PROMPT_PREFIXES)
@@ -0,0 +1,74 @@
+"""
+Write-behind queue: batching, durability and failure isolation.
+"""
+
+import threading
+
+import pytest
+import database
+from write_behind import WriteBehindQueue
+
+INSERT = 'INSERT INTO quiz_attempts (story_id, question_id, attempt_number, is_correct) VALUES (?, ?, ?, ?)'
+
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'ost.db'))
+    database.init_db()
+    writer = WriteBehindQueue(lambda: database.DATABASE, interval_ms=20, max_rows=50)
+    yield writer
+    writer.close()
+    database.close_connections()
+
+
+def _count(sql='SELECT COUNT(*) FROM quiz_attempts'):
+    with database.get_db_context() as conn:
+        return conn.execute(sql).fetchone()[0]
+
+
+def test_concurrent_inserts_are_batched(writer):
+    threads = [threading.Thread(target=writer.submit, args=(INSERT, (1, i, 1, True))) for i in range(40)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert writer.flush(timeout=5)
+    assert _count() == 40
+    assert writer.stats['rows'] == 40
+    assert writer.stats['batches'] < 40
+
+
+def test_durable_submit_is_committed_on_return(writer):
+    writer.submit(INSERT, (1, 1, 1, True), durable=True)
+    assert _count() == 1
+
+
+def test_bad_row_does_not_drop_batch(writer):
+    writer.submit(INSERT, (1, 1, 1, True))
+    with pytest.raises(Exception):
+        writer.submit('INSERT INTO no_such_table VALUES (?)', (1,), durable=True)
+    writer.submit(INSERT, (1, 2, 1, True))
+    writer.close()
+    assert _count() == 2
+    assert writer.stats['errors'] == 1
+
+
+def test_keyed_writes_coalesce(writer):
+    # Updates with the same key that arrive within one batch window collapse into one
+    update = 'UPDATE stories SET last_read = ? WHERE id = ?'
+    for stamp in ('2026-01-01', '2026-01-02', '2026-01-03'):
+        writer.submit(update, (stamp, 1), key=('stories.last_read', 1))
+    writer.flush(timeout=5)
+    with database.get_db_context() as conn:
+        assert conn.execute('SELECT last_read FROM stories WHERE id = 1').fetchone()[0] == '2026-01-03'
+    assert writer.stats['rows'] + writer.stats['coalesced'] == 3
+
+
+def test_achievement_check_counts_queued_rows():
+    from app import app
+    from write_behind import ost_writer
+    database.init_db()
+    ost_writer.submit("INSERT INTO chatbot_messages (session_id, role, content) VALUES (?, ?, ?)",
+                      ('s', 'user', 'Hello Buddy'))
+    body = app.test_client().post('/api/achievements/check', json={'activity_type': 'chat'}).get_json()
+    assert 'Say Hello' in [a['title'] for a in body['newly_unlocked']]
@@ -1,75 +1,93 @@
 import sqlite3
 import json
 from contextlib import contextmanager
-
-DATABASE = 'tinystories.db'
+import database
+from database import (get_connection, connection_context, read_context, open_connection, create_indexes,
+                      add_column, run_migrations, create_fts_index)
 
 def get_ts_db():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    if database.DB_MODE == 'attach':
+        return database.get_db()
+    return get_connection(database.TS_DATABASE)
 
 @contextmanager
 def get_ts_db_context():
-    conn = get_ts_db()
-    try:
+    """Transaction on tinystories.db - shared with ost.db in attach mode"""
+    if database.DB_MODE == 'attach':
+        context = database.get_db_context()
+    else:
+        context = connection_context(database.TS_DATABASE)
+    with context as conn:
         yield conn
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
 
-def init_ts_db():
-    with get_ts_db_context() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tinystories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                content TEXT NOT NULL,
-                moral TEXT,
-                vocab_json TEXT,
-                fill_in_blanks_json TEXT,
-                mcq_json TEXT,
-                moral_questions_json TEXT,
-                image_url TEXT,
-                audio_url TEXT,
-                audio_speed REAL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+@contextmanager
+def get_ts_read_context():
+    """Read-only scope on tinystories.db (through the attached `ts` schema in attach mode)"""
+    if database.DB_MODE == 'attach':
+        context = database.get_db_read_context()
+    else:
+        context = read_context(database.TS_DATABASE)
+    with context as conn:
+        yield conn
+
+TS_INDEXES = [
+    ('idx_vocabulary_progress_last_seen', 'vocabulary_progress', 'last_seen'),
+]
 
-        # Vocabulary progress table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS vocabulary_progress (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                word TEXT UNIQUE NOT NULL,
-                meaning TEXT,
-                status TEXT DEFAULT 'new', -- new, learning, mastered
-                last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                occurrence_count INTEGER DEFAULT 1
-            )
-        ''')
-        
-        # Add columns if they missed the creation
-        try:
-            cursor.execute("ALTER TABLE tinystories ADD COLUMN image_url TEXT")
-        except sqlite3.OperationalError:
-            pass # Column exists
-            
-        try:
-            cursor.execute("ALTER TABLE tinystories ADD COLUMN audio_url TEXT")
-        except sqlite3.OperationalError:
-            pass # Column exists
+def _create_base_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tinystories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            moral TEXT,
+            vocab_json TEXT,
+            fill_in_blanks_json TEXT,
+            mcq_json TEXT,
+            moral_questions_json TEXT,
+            image_url TEXT,
+            audio_url TEXT,
+            audio_speed REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
 
-        try:
-            cursor.execute("ALTER TABLE tinystories ADD COLUMN audio_speed REAL")
-        except sqlite3.OperationalError:
-            pass # Column exists
+    # Vocabulary progress table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS vocabulary_progress (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            word TEXT UNIQUE NOT NULL,
+            meaning TEXT,
+            status TEXT DEFAULT 'new', -- new, learning, mastered
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            occurrence_count INTEGER DEFAULT 1
+        )
+    ''')
 
-        conn.commit()
+def _add_asset_columns(cursor):
+    add_column(cursor, 'tinystories', 'image_url', 'TEXT')
+    add_column(cursor, 'tinystories', 'audio_url', 'TEXT')
+    add_column(cursor, 'tinystories', 'audio_speed', 'REAL')
 
-# Run this once on import or explicitly
-init_ts_db()
+def _create_indexes(cursor):
+    create_indexes(cursor, TS_INDEXES)
+
+def _create_search_index(cursor):
+    create_fts_index(cursor, 'tinystories_fts', 'tinystories', ['title', 'content'])
+
+# Ordered schema history for tinystories.db. Never edit a shipped step - append a new one.
+TS_MIGRATIONS = [
+    (1, 'base tables', _create_base_tables),
+    (2, 'tinystories asset columns', _add_asset_columns),
+    (3, 'managed index set', _create_indexes),
+    (4, 'full-text search index', _create_search_index),
+]
+
+def init_ts_db():
+    """Create or upgrade tinystories.db (run on first use via database.ensure_schema)"""
+    conn = open_connection(database.TS_DATABASE)
+    try:
+        run_migrations(conn, TS_MIGRATIONS)
+    finally:
+        conn.close()
+    database._bootstrapped.add(database.TS_DATABASE)
@@ -0,0 +1,162 @@
+"""
+Write-behind queue for small, hot inserts (quiz taps, progress rows, chat messages)
+Rows are handed to a background thread that commits them in batches with
+executemany, so a burst of requests shares one transaction instead of
+queueing on the SQLite write lock one commit at a time.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from itertools import groupby
+
+import database
+
+logger = logging.getLogger(__name__)
+
+# A batch is committed when it reaches FLUSH_MAX_ROWS or FLUSH_INTERVAL_MS after its first row
+FLUSH_INTERVAL_MS = float(os.getenv('WRITE_BEHIND_INTERVAL_MS', 5))
+FLUSH_MAX_ROWS = int(os.getenv('WRITE_BEHIND_MAX_ROWS', 200))
+
+
+class _Pending:
+    __slots__ = ('sql', 'params', 'done', 'error', 'key')
+
+    def __init__(self, sql, params, done=None, key=None):
+        self.sql = sql
+        self.params = params
+        self.done = done
+        self.error = None
+        self.key = key
+
+
+_STOP = _Pending(None, None)
+
+
+class WriteBehindQueue:
+    """
+    Batches INSERT/UPDATE statements for one database file.
+    submit(durable=True) blocks until the row is committed (and re-raises a
+    failure); the default returns immediately. submit(key=...) coalesces: a
+    later write with the same key replaces one that is still queued.
+    """
+
+    def __init__(self, path_getter, interval_ms=FLUSH_INTERVAL_MS, max_rows=FLUSH_MAX_ROWS):
+        self._path_getter = path_getter
+        self._interval = interval_ms / 1000
+        self._max_rows = max_rows
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._keyed = {}
+        self.stats = {'rows': 0, 'batches': 0, 'errors': 0, 'coalesced': 0}
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                # After a fork the parent's worker thread does not exist here
+                self._queue = queue.Queue()
+                self._keyed = {}
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+
+    def submit(self, sql, params=(), durable=False, key=None):
+        item = _Pending(sql, tuple(params), threading.Event() if durable else None, key)
+        self._ensure_worker()
+        if key is not None and not durable:
+            with self._lock:
+                queued = self._keyed.get(key)
+                if queued is not None:
+                    queued.sql, queued.params = item.sql, item.params
+                    self.stats['coalesced'] += 1
+                    return
+                self._keyed[key] = item
+        self._queue.put(item)
+        if durable:
+            item.done.wait()
+            if item.error is not None:
+                raise item.error
+
+    def flush(self, timeout=None):
+        """Wait until everything submitted so far is committed"""
+        if self._thread is None or self._pid != os.getpid():
+            return True
+        marker = _Pending(None, None, threading.Event())
+        self._queue.put(marker)
+        return marker.done.wait(timeout)
+
+    def close(self, timeout=5):
+        """Flush and stop the worker (registered with atexit)"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._interval
+            while batch[-1] is not _STOP and len(batch) < self._max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if batch[-1] is _STOP:
+                batch.pop()
+                running = False
+            self._write(batch)
+        database.release_connections()
+
+    def _write(self, batch):
+        with self._lock:
+            # From here on a keyed row is being written and can no longer absorb updates
+            for item in batch:
+                if item.key is not None and self._keyed.get(item.key) is item:
+                    del self._keyed[item.key]
+        rows = [item for item in batch if item.sql is not None]
+        try:
+            if rows:
+                try:
+                    with database.connection_context(self._path_getter()) as conn:
+                        # Consecutive rows for the same statement go in one executemany;
+                        # grouping only adjacent runs keeps submission order intact
+                        for sql, group in groupby(rows, key=lambda item: item.sql):
+                            conn.executemany(sql, [item.params for item in group])
+                    self.stats['batches'] += 1
+                    self.stats['rows'] += len(rows)
+                except Exception as e:
+                    logger.error(f"Write-behind batch of {len(rows)} failed, retrying row by row: {e}")
+                    self._write_each(rows)
+        finally:
+            for item in batch:
+                if item.done is not None:
+                    item.done.set()
+
+    def _write_each(self, rows):
+        # Isolate the bad row so one failure does not drop the whole batch
+        for item in rows:
+            try:
+                with database.connection_context(self._path_getter()) as conn:
+                    conn.execute(item.sql, item.params)
+                self.stats['rows'] += 1
+            except Exception as e:
+                item.error = e
+                self.stats['errors'] += 1
+                logger.error(f"Write-behind row dropped: {e}")
+
+
+# Writer for ost.db; resolves the path lazily so tests can point DATABASE elsewhere
+ost_writer = WriteBehindQueue(lambda: database.DATABASE)
+atexit.register(ost_writer.close)